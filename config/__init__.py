@@ -1,5 +1,12 @@
-# This will make sure the app is always imported when
-# Django starts so that shared_task will use this app.
-from .celery import app as celery_app
-
+# The Celery app is imported on first access rather than when Django starts:
+# web processes only need it to send a task, and importing Celery and kombu slows their boot.
+# Task modules import the app from config.celery directly, and `celery --app=config`
+# falls back to the config.celery module.
 __all__ = ('celery_app',)
+
+
+def __getattr__(name):
+    if name == 'celery_app':
+        from .celery import app
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
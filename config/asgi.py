@@ -7,10 +7,76 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 """
 
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    Django 3.2 iterates StreamingHttpResponse directly on the event loop, so an iterator that
+    blocks (a database cursor, a queue) stalls every request served by the worker.
+    Here the parts of a streaming response are pulled in a thread of its own, one thread per
+    response, so a generator that touches the ORM keeps a single connection.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode("ascii")
+            if isinstance(value, str):
+                value = value.encode("latin1")
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((b"Set-Cookie", cookie.output(header="").encode("ascii").strip()))
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        loop = asyncio.get_running_loop()
+        parts = iter(response)
+        done = object()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="streaming-response") as executor:
+            while True:
+                part = await loop.run_in_executor(executor, next, parts, done)
+                if part is done:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body"})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+django.setup(set_prefix=False)
+django_application = StreamingASGIHandler()
+
+from asgiref.wsgi import WsgiToAsgi  # noqa: E402
+from django.conf import settings  # noqa: E402
+from whitenoise import WhiteNoise  # noqa: E402
+
+
+def not_found(environ, start_response):  # noqa: U100
+    start_response("404 Not Found", [("Content-Type", "text/plain")])
+    return [b"Not Found"]
+
+
+# WhiteNoise is sync-only. As a Django middleware it would make Django 3.2 run every request,
+# the async webhook included, in the single thread_sensitive thread, one request at a time.
+# Static files are served here, before the Django application, and its middleware stays async.
+static_application = None
+if settings.STATIC_ROOT:
+    static_application = WsgiToAsgi(WhiteNoise(not_found, root=settings.STATIC_ROOT, prefix=settings.STATIC_URL))
+
+
+async def application(scope, receive, send):
+    if static_application is not None and scope["type"] == "http" and scope["path"].startswith(settings.STATIC_URL):
+        await static_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -1,7 +1,11 @@
 import os
 
 from celery import Celery
+from celery.signals import task_postrun, task_prerun, worker_init, worker_process_init
 from django.conf import settings
+
+from info.tools import db
+
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
@@ -16,6 +20,25 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+# Persistent database connections are checked before each task and released after it.
+task_prerun.connect(db.prepare_connections)
+task_postrun.connect(db.release_connections)
+
+
+def warmup_worker_process(**kwargs):  # noqa: U100
+    # Prefork children start with the parent's imports; prime per-process caches and the connection
+    # so that the first task is not a cold one.
+    if settings.WARMUP_ENABLED:
+        from info.tools.warmup import warmup
+        warmup()
+
+
+@worker_init.connect
+def connect_warmup(**kwargs):  # noqa: U100
+    # Celery's Django fixup closes inherited connections in its own worker_process_init receiver,
+    # which it connects on worker_init; connecting here runs the warmup after it.
+    worker_process_init.connect(warmup_worker_process)
+
 
 @app.task(bind=True)
 def debug_task(self):
@@ -43,10 +43,11 @@ INSTALLED_APPS = [
     "info",
 ]
 
+# Every middleware must be async-capable: one sync-only middleware makes Django run the whole chain,
+# the async webhook included, in a single thread. Static files are served in config/asgi.py.
 MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    'whitenoise.middleware.WhiteNoiseMiddleware',
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -74,6 +75,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
@@ -113,6 +115,22 @@ else:
         },
     }
 
+# Persistent connections: one per thread, reused until CONN_MAX_AGE seconds, checked before use.
+# Each option can also be given as a DATABASE_URL query parameter, e.g. ?conn_max_age=600&pool_size=10.
+_DATABASE_OPTIONS = DATABASES["default"].setdefault("OPTIONS", {})
+DATABASES["default"]["CONN_MAX_AGE"] = int(
+    _DATABASE_OPTIONS.pop("conn_max_age", os.environ.get("DATABASE_CONN_MAX_AGE", 600)),
+)
+# Connections that no request or task is using are closed after this many seconds idle, before the server
+# or a proxy drops them: when their thread gets work again, or by a background thread if it never does.
+DATABASE_CONN_MAX_IDLE = float(_DATABASE_OPTIONS.pop("conn_max_idle", os.environ.get("DATABASE_CONN_MAX_IDLE", 300)))
+# Connections idle longer than this are checked with a round trip before use.
+DATABASE_HEALTH_CHECK_INTERVAL = float(
+    _DATABASE_OPTIONS.pop("health_check_interval", os.environ.get("DATABASE_HEALTH_CHECK_INTERVAL", 10)),
+)
+# Threads running ORM code for async views, and so the limit of their connections per process.
+DATABASE_POOL_SIZE = int(_DATABASE_OPTIONS.pop("pool_size", os.environ.get("DATABASE_POOL_SIZE", 10)))
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 PHONENUMBER_DEFAULT_REGION = "RU"
 
@@ -171,10 +189,102 @@ if not REDIS_URL:
 CELERY_BROKER_URL = f"{REDIS_URL}/0"
 CELERY_BROKER_TRANSPORT_OPTION = {'visibility_timeout': 3600}
 CELERY_RESULT_BACKEND = f"{REDIS_URL}/0"
-CELERY_RESULT_PERSISTENT = True
+CELERY_RESULT_EXPIRES = int(os.environ.get("CELERY_RESULT_EXPIRES", 60 * 60))
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+# Each queue is consumed by its own worker process type, see Procfile.
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
+CELERY_TASK_ROUTES = {
+    'info.tasks.analytics_flush': {'queue': 'analytics'},
+    'info.tasks.rebuild_rollups': {'queue': 'rollups'},
+}
+
+# Cache
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": f"{REDIS_URL}/1",
+        "KEY_PREFIX": "gas_assistant",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # An unreachable Redis means a cache miss, not a server error.
+            "IGNORE_EXCEPTIONS": True,
+        },
+    },
+}
+DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS = True
+ANSWER_CACHE_TIMEOUT = int(os.environ.get("ANSWER_CACHE_TIMEOUT", 60 * 60 * 24))
+# Conversation state for follow-up questions, kept for the platform session lifetime in seconds.
+# Dialogflow contexts expire after 20 minutes of inactivity; an Alice session is shorter.
+CONVERSATION_CONTEXT_TIMEOUT = int(os.environ.get("CONVERSATION_CONTEXT_TIMEOUT", 20 * 60))
+CONVERSATION_CONTEXT_TIMEOUTS = {
+    "alice": int(os.environ.get("CONVERSATION_CONTEXT_TIMEOUT_ALICE", 5 * 60)),
+}
+# Oilfield and well lookups: per-process LRU in front of the shared cache, both keyed by the structure version.
+REFERENCE_CACHE_SIZE = int(os.environ.get("REFERENCE_CACHE_SIZE", 4096))
+REFERENCE_CACHE_TIMEOUT = int(os.environ.get("REFERENCE_CACHE_TIMEOUT", 60 * 60 * 24))
+# How often a process compares its reference data with the shared structure version, in seconds.
+REFERENCE_VERSION_CHECK_INTERVAL = float(os.environ.get("REFERENCE_VERSION_CHECK_INTERVAL", 5))
+
+# Analytics
+# Records are buffered in Redis per sink and delivered in batches by the analytics-flush beat task.
+ANALYTICS_BUFFER_URL = os.environ.get("ANALYTICS_BUFFER_URL", f"{REDIS_URL}/2")
+ANALYTICS_SINKS = os.environ.get(
+    "ANALYTICS_SINKS",
+    "info.tools.analytics.ChatbaseSink,info.tools.analytics.DatabaseSink",
+).split(",")
+ANALYTICS_DB_BATCH_SIZE = int(os.environ.get("ANALYTICS_DB_BATCH_SIZE", 1000))
+ANALYTICS_FLUSH_INTERVAL = float(os.environ.get("ANALYTICS_FLUSH_INTERVAL", 10))
+ANALYTICS_FLUSH_MAX_BATCHES = int(os.environ.get("ANALYTICS_FLUSH_MAX_BATCHES", 50))
+# Failed deliveries before a record is moved to the sink's dead-letter list, info:analytics:<sink>:dead.
+ANALYTICS_MAX_ATTEMPTS = int(os.environ.get("ANALYTICS_MAX_ATTEMPTS", 10))
+CELERY_BEAT_SCHEDULE = {
+    "analytics-flush": {
+        "task": "info.tasks.analytics_flush",
+        "schedule": ANALYTICS_FLUSH_INTERVAL,
+        "options": {"expires": ANALYTICS_FLUSH_INTERVAL},
+    },
+}
 
 # Chatbase
 CHATBASE_API_KEY = os.environ.get('CHATBASE_API_KEY')
+CHATBASE_BATCH_SIZE = int(os.environ.get("CHATBASE_BATCH_SIZE", 100))
+# Batches in flight per worker process.
+CHATBASE_CONCURRENCY = int(os.environ.get("CHATBASE_CONCURRENCY", 8))
+# Pooled Chatbase HTTP client: timeouts in seconds, retries with exponential backoff, circuit breaker.
+CHATBASE_CONNECT_TIMEOUT = float(os.environ.get("CHATBASE_CONNECT_TIMEOUT", 3.05))
+CHATBASE_READ_TIMEOUT = float(os.environ.get("CHATBASE_READ_TIMEOUT", 10))
+CHATBASE_RETRIES = int(os.environ.get("CHATBASE_RETRIES", 3))
+CHATBASE_BACKOFF_FACTOR = float(os.environ.get("CHATBASE_BACKOFF_FACTOR", 0.5))
+CHATBASE_FAILURE_THRESHOLD = int(os.environ.get("CHATBASE_FAILURE_THRESHOLD", 5))
+CHATBASE_RESET_TIMEOUT = float(os.environ.get("CHATBASE_RESET_TIMEOUT", 30))
+
+# Webhook
+# Validate only the request fields used by intent handlers and analytics; the rest is validated on first access.
+WEBHOOK_LAZY_VALIDATION = os.environ.get("WEBHOOK_LAZY_VALIDATION", "1") == "1"
+
+# Webhook capture
+# Opt-in recording of incoming webhook bodies for replay_webhooks; empty directory disables capture.
+# Personal data is replaced by keyed hashes before writing, files are rotated per process.
+WEBHOOK_CAPTURE_DIR = os.environ.get("WEBHOOK_CAPTURE_DIR", "")
+WEBHOOK_CAPTURE_MAX_BYTES = int(os.environ.get("WEBHOOK_CAPTURE_MAX_BYTES", 50 * 1024 * 1024))
+WEBHOOK_CAPTURE_BACKUPS = int(os.environ.get("WEBHOOK_CAPTURE_BACKUPS", 10))
+
+# Metrics
+# Webhook stage timings are aggregated per process and flushed to Redis, so /srv/metrics covers all workers.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_REDIS_URL = os.environ.get("METRICS_REDIS_URL", f"{REDIS_URL}/3")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Query profiling
+# Log query count, time and duplicates for every intent handler call; EXPLAIN adds a plan per SELECT.
+QUERY_PROFILING = os.environ.get("QUERY_PROFILING", "0") == "1"
+QUERY_PROFILING_EXPLAIN = os.environ.get("QUERY_PROFILING_EXPLAIN", "0") == "1"
+
+# Startup
+# After a fork, prime the reference cache and open database connections before the first request or task.
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "1") == "1"
+# Connections opened per web worker in the database thread pool; the rest are opened on demand.
+WARMUP_DB_CONNECTIONS = int(os.environ.get("WARMUP_DB_CONNECTIONS", 1))
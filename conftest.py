@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    # Тесты не требуют Redis: общий кэш заменяется кэшем в памяти процесса.
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
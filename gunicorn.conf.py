@@ -0,0 +1,24 @@
+# Gunicorn settings for the web process, see Procfile.
+# bind and workers come from the PORT and WEB_CONCURRENCY environment variables set by dokku.
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Django, the URLconf and the request models are imported once in the master process and shared
+# by the workers after fork, so a new worker starts without importing them again.
+# With preloading, HUP does not reload the code: deploys restart the container.
+preload_app = True
+
+
+def when_ready(server):  # noqa: U100
+    # The master process has loaded the application; load what the first request would otherwise load.
+    from info.tools.warmup import preload
+    preload()
+
+
+def post_fork(server, worker):  # noqa: U100
+    # Database connections are closed before fork (see info.tools.db); open them and prime
+    # the reference cache in the new worker so that its first request is not a cold one.
+    from django.conf import settings
+
+    if server.cfg.preload_app and settings.WARMUP_ENABLED:
+        from info.tools.warmup import warmup
+        warmup(threads=settings.WARMUP_DB_CONNECTIONS)
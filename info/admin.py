@@ -1,6 +1,6 @@
 from django.utils.translation import gettext_lazy as _
 from django.contrib import admin
-from .models import Incident, OilField, Well, Task, Employee, GasDisposal, Mining, Urgg
+from .models import ConversationEvent, Incident, OilField, Well, Task, Employee, GasDisposal, Mining, Urgg
 
 
 @admin.register(GasDisposal)
@@ -86,3 +86,17 @@ class EmployeeAdmin(admin.ModelAdmin):
 
     def full_name(self, obj):
         return obj.get_full_name()
+
+
+@admin.register(ConversationEvent)
+class ConversationEventAdmin(admin.ModelAdmin):
+    list_filter = ['platform', 'not_handled', 'created_at']
+    list_display = ['created_at', 'platform', 'intent', 'user_msg', 'not_handled']
+    search_fields = ['intent', 'user_id', 'session_id']
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):  # noqa: U100
+        return False
+
+    def has_change_permission(self, request, obj=None):  # noqa: U100
+        return False
@@ -5,3 +5,15 @@ from django.utils.translation import gettext_lazy as _
 class InformerConfig(AppConfig):
     name = 'info'
     verbose_name = _('Информация')
+
+    def ready(self):
+        from django.core.signals import request_finished, request_started
+
+        from . import signals  # noqa
+        from .tools import db
+        from .tools.services import intent_registry
+        intent_registry.autodiscover()
+        # Постоянные соединения с базой проверяются перед запросом и освобождаются после.
+        # Для задач Celery то же подключается в config.celery, клиент Chatbase настраивается при первой отправке.
+        request_started.connect(db.prepare_connections)
+        request_finished.connect(db.release_connections)
@@ -0,0 +1,88 @@
+import collections
+import os
+import subprocess  # noqa: S404
+import sys
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+ImportRecord = collections.namedtuple('ImportRecord', ['module', 'self_us', 'cumulative_us', 'depth'])
+
+# Что импортирует процесс до первого запроса или задачи.
+PROFILES = {
+    'web': 'import config.asgi; from info.tools.warmup import preload; preload()',
+    'worker': 'import django; django.setup(); from config.celery import app; app.loader.import_default_modules()',
+}
+
+
+def parse(lines: List[str]) -> List[ImportRecord]:
+    """
+    Разбирает вывод python -X importtime: "import time: self [us] | cumulative | imported package".
+    Вложенность модуля - отступ имени по два пробела на уровень.
+    """
+    records = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        if not self_us.strip().isdigit():
+            continue
+        module = name.rstrip()
+        stripped = module.lstrip()
+        records.append(ImportRecord(stripped, int(self_us), int(cumulative_us), (len(module) - len(stripped) - 1) // 2))
+    return records
+
+
+def measure(statement: str, python: str = sys.executable) -> List[ImportRecord]:
+    """
+    Выполняет statement в новом процессе с -X importtime и тем же окружением.
+    :raises RuntimeError: Если процесс завершился с ошибкой.
+    """
+    result = subprocess.run(  # noqa: S603
+        [python, '-X', 'importtime', '-c', statement],
+        cwd=settings.BASE_DIR,
+        env=os.environ.copy(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    lines = result.stderr.splitlines()
+    if result.returncode:
+        raise RuntimeError('\n'.join(line for line in lines if not line.startswith('import time:'))[-2000:])
+    return parse(lines)
+
+
+class ImportReport:
+    """
+    Время импорта модулей одного запуска. Время в микросекундах, как в выводе importtime.
+    """
+
+    def __init__(self, records: List[ImportRecord]):
+        self.records = records
+
+    @property
+    def total_us(self) -> int:
+        return sum(record.cumulative_us for record in self.records if record.depth == 0)
+
+    def top(self, count: int) -> List[ImportRecord]:
+        """
+        Модули с наибольшим временем импорта вместе с зависимостями.
+        """
+        return sorted(self.records, key=lambda record: record.cumulative_us, reverse=True)[:count]
+
+    def packages(self, count: Optional[int] = None) -> Dict[str, int]:
+        """
+        Собственное время импорта модулей по пакетам верхнего уровня, по убыванию.
+        """
+        totals = collections.Counter()
+        for record in self.records:
+            totals[record.module.split('.', 1)[0]] += record.self_us
+        return dict(totals.most_common(count))
+
+
+def run(profile: str, repeat: int = 1) -> ImportReport:
+    """
+    Замеряет импорт профиля repeat раз и возвращает самый быстрый запуск: он меньше всего зависит от шума.
+    """
+    reports = [ImportReport(measure(PROFILES[profile])) for _ in range(repeat)]
+    return min(reports, key=lambda report: report.total_us)
@@ -0,0 +1,147 @@
+import collections
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+import requests
+
+DEFAULT_URL = 'http://127.0.0.1:8000/srv/info/webhook'
+
+
+class ReplayStats:
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = collections.Counter()
+        self.errors = 0
+        self.started = time.monotonic()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def add(self, latency: float, status: str, ok: bool) -> None:
+        with self._lock:
+            self.latencies.append(latency)
+            self.statuses[status] += 1
+            if not ok:
+                self.errors += 1
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """
+        Задержка в миллисекундах по методу ближайшего ранга.
+        """
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        rank = max(int(len(latencies) * percent / 100 + 0.5), 1)
+        return latencies[min(rank, len(latencies)) - 1] * 1000
+
+
+class Replayer:
+    """
+    Воспроизводит записанные тела запросов webhook на сервере.
+
+    Без rate запросы отправляются замкнутым циклом: concurrency потоков, каждый отправляет
+    следующий запрос после ответа на предыдущий. С rate запросы отправляются по расписанию
+    независимо от ответов (не более concurrency одновременно), задержка считается от времени
+    по расписанию, поэтому очередь на стороне клиента при перегрузке сервера тоже учитывается.
+    """
+
+    def __init__(
+        self,
+        bodies: List[bytes],
+        url: str = DEFAULT_URL,
+        concurrency: int = 8,
+        rate: Optional[float] = None,
+        total: Optional[int] = None,
+        duration: Optional[float] = None,
+        timeout: float = 10,
+    ):
+        self.bodies = bodies
+        self.url = url
+        self.concurrency = concurrency
+        self.rate = rate
+        self.total = total
+        self.duration = duration
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _schedule(self) -> Iterable[bytes]:
+        """
+        Без total и duration каждый запрос отправляется один раз, иначе запросы повторяются по кругу.
+        """
+        if not self.total and not self.duration:
+            return iter(self.bodies)
+        bodies = itertools.cycle(self.bodies)
+        return itertools.islice(bodies, self.total) if self.total else bodies
+
+    @property
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers['Content-Type'] = 'application/json'
+        return session
+
+    def _send(self, stats: ReplayStats, body: bytes, scheduled: float) -> None:
+        try:
+            response = self._session.post(self.url, data=body, timeout=self.timeout)
+        except requests.RequestException as error:
+            stats.add(time.monotonic() - scheduled, type(error).__name__, ok=False)
+            return
+        stats.add(time.monotonic() - scheduled, str(response.status_code), ok=response.ok)
+
+    def run(self) -> ReplayStats:
+        stats = ReplayStats()
+        deadline = stats.started + self.duration if self.duration else None
+        bodies = self._schedule()
+        if self.rate:
+            self._run_open(stats, bodies, deadline)
+        else:
+            self._run_closed(stats, bodies, deadline)
+        stats.finished = time.monotonic()
+        return stats
+
+    def _run_closed(self, stats: ReplayStats, bodies: Iterable[bytes], deadline: Optional[float]) -> None:
+        lock = threading.Lock()
+
+        def worker():
+            while not deadline or time.monotonic() < deadline:
+                with lock:
+                    body = next(bodies, None)
+                if body is None:
+                    return
+                self._send(stats, body, time.monotonic())
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for _ in range(self.concurrency):
+                executor.submit(worker)
+
+    def _run_open(self, stats: ReplayStats, bodies: Iterable[bytes], deadline: Optional[float]) -> None:
+        interval = 1 / self.rate
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for number, body in enumerate(bodies):
+                scheduled = stats.started + number * interval
+                if deadline and scheduled >= deadline:
+                    break
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._send, stats, body, scheduled)
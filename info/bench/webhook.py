@@ -0,0 +1,168 @@
+import json
+import pathlib
+import platform
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import django
+import pydantic
+from django.http import JsonResponse
+from django.utils import timezone
+
+from info.tools.alice import AliceRequest
+from info.tools.dialogflow_webhook import WebhookHandler, WebhookResponse
+from info.tools.dialogflow_webhook_t import LazyWebhookRequest, WebhookRequest
+from info.tools.platforms import get_platform_view
+from info.tools.serializers import FastJsonResponse
+from info.tools.services import detect_client, get_analytics_data, parse_request
+from info.tools.telegram import TelegramHandler
+
+PAYLOADS_DIR = pathlib.Path(__file__).resolve().parent / 'payloads'
+BASELINE_PATH = pathlib.Path(__file__).resolve().parent / 'baseline.json'
+
+
+def load_payloads(names: Optional[List[str]] = None) -> Dict[str, bytes]:
+    """
+    Тела запросов Dialogflow: telegram (из Telegram), alice (из Алисы), dialogflow (консоль Dialogflow).
+    """
+    paths = sorted(PAYLOADS_DIR.glob('*.json'))
+    return {path.stem: path.read_bytes() for path in paths if not names or path.stem in names}
+
+
+def _webhook_handler_getters(data: dict) -> tuple:
+    handler = WebhookHandler(data)
+    return (
+        handler.get_intent_display_name(),
+        handler.get_parameters(),
+        handler.get_action(),
+        handler.get_session_id(),
+        handler.get_payload(),
+        handler.get_fulfillment_text(),
+    )
+
+
+def _platform_extraction(payload: dict) -> tuple:
+    if 'meta' in payload:
+        alice = AliceRequest(payload)
+        return alice.uid, alice.command, alice.session_id
+    if 'data' in payload:
+        telegram = TelegramHandler(payload)
+        return telegram.get_uid(), telegram.get_text(), telegram.get_chat_id()
+    return ()
+
+
+def _create_final_response(text: str) -> dict:
+    response = WebhookResponse()
+    response.simple_response(text)
+    return response.create_final_response()
+
+
+def get_stages(body: bytes) -> List[Tuple[str, Callable]]:
+    """
+    Этапы обработки запроса в порядке выполнения. Входные данные каждого этапа
+    подготавливаются заранее, поэтому замеряется только сам этап.
+    parse_raw и parse_raw_lazy - разбор с полной и отложенной валидацией, используется один из них.
+    """
+    data = json.loads(body)
+    msg = parse_request(body)
+    payload = data['originalDetectIntentRequest'].get('payload', {})
+    text = data['queryResult'].get('fulfillmentText', '')
+    response = _create_final_response(text)
+    view = get_platform_view(msg)
+    return [
+        ('json_loads', lambda: json.loads(body)),
+        ('parse_raw', lambda: WebhookRequest.parse_raw(body)),
+        ('parse_raw_lazy', lambda: LazyWebhookRequest.parse_raw(body)),
+        ('detect_client', lambda: detect_client(msg)),
+        ('webhook_handler_getters', lambda: _webhook_handler_getters(data)),
+        ('platform_extraction', lambda: _platform_extraction(payload)),
+        ('platform_view', lambda: get_platform_view(msg)),
+        ('analytics_data', lambda: get_analytics_data(msg, view)),
+        ('create_final_response', lambda: _create_final_response(text)),
+        ('json_response', lambda: JsonResponse(response).content),
+        ('fast_json_response', lambda: FastJsonResponse(response).content),
+    ]
+
+
+def run(
+    payloads: Dict[str, bytes],
+    number: Optional[int] = None,
+    repeat: int = 7,
+    only: Optional[Set[Tuple[str, str]]] = None,
+) -> dict:
+    """
+    Замеряет этапы для каждого тела запроса.
+    :param number: Вызовов в одном повторе. По умолчанию подбирается для каждого этапа timeit.Timer.autorange так,
+        чтобы повтор длился не меньше 0,2 секунды: короткие повторы дают шум таймера и планировщика.
+    :param only: Замерить только эти пары (тело запроса, этап).
+    :return: Результаты в микросекундах на вызов: минимум и медиана по повторам.
+    """
+    results = {}
+    for name, body in payloads.items():
+        results[name] = {}
+        for stage, func in get_stages(body):
+            if only is not None and (name, stage) not in only:
+                continue
+            timer = timeit.Timer(func)
+            calls = number or timer.autorange()[0]
+            timings = [total / calls * 1e6 for total in timer.repeat(repeat=repeat, number=calls)]
+            results[name][stage] = {
+                'min_us': round(min(timings), 3),
+                'median_us': round(statistics.median(timings), 3),
+                'number': calls,
+            }
+    return {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'django': django.get_version(),
+            'pydantic': pydantic.VERSION,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def environment_changes(current: dict, baseline: dict) -> List[str]:
+    """
+    Отличия окружения от окружения базовых результатов: сравнение с ними не показательно.
+    """
+    keys = ('python', 'implementation', 'machine', 'django', 'pydantic')
+    return [
+        f"{key}: {baseline['meta'].get(key)} -> {current['meta'][key]}"
+        for key in keys
+        if baseline['meta'].get(key) != current['meta'][key]
+    ]
+
+
+def compare(current: dict, baseline: dict, threshold: float = 1.25, floor_us: float = 0.5) -> List[dict]:
+    """
+    Сравнивает минимальное время этапов с медианой базовых результатов. Шум только замедляет повторы,
+    поэтому замедлением считается случай, когда даже лучший текущий повтор медленнее обычного базового.
+    Разница меньше floor_us на этапах в несколько микросекунд - шум, хотя в отношении может давать x1.5.
+    :param threshold: Допустимое отношение текущего времени к базовому.
+    :param floor_us: Разница в микросекундах, которая не считается замедлением при любом отношении.
+    :return: Строки сравнения, regression=True у этапов, замедлившихся сильнее порога.
+    """
+    rows = []
+    for name, stages in current['results'].items():
+        for stage, timing in stages.items():
+            base = baseline['results'].get(name, {}).get(stage)
+            if base is None:
+                continue
+            delta = timing['min_us'] - base['median_us']
+            ratio = timing['min_us'] / base['median_us'] if base['median_us'] else 0.0
+            rows.append({
+                'payload': name,
+                'stage': stage,
+                'baseline_us': base['median_us'],
+                'current_us': timing['min_us'],
+                'delta_us': round(delta, 3),
+                'ratio': round(ratio, 3),
+                'regression': ratio > threshold and delta > floor_us,
+            })
+    return rows
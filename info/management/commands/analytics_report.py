@@ -0,0 +1,55 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from info.models import ConversationEvent
+
+
+def _rate(part: int, total: int) -> str:
+    return f'{part / total:.1%}' if total else '-'
+
+
+def _start_of_day(date: datetime.date) -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+class Command(BaseCommand):
+    help = (  # noqa: A003
+        'Отчет по локальной аналитике диалогов (ConversationEvent): объем по платформам, '
+        'частота намерений и доля необработанных реплик.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=datetime.date.fromisoformat, help='Начальная дата, YYYY-MM-DD.')
+        parser.add_argument('--end', type=datetime.date.fromisoformat, help='Конечная дата включительно, YYYY-MM-DD.')
+        parser.add_argument('--platform', help='Только указанная платформа.')
+        parser.add_argument('--top', type=int, default=20, help='Количество намерений в отчете.')
+        parser.add_argument('--daily', action='store_true', help='Добавить объем по дням.')
+
+    def handle(self, *args, **options):  # noqa: U100
+        events = ConversationEvent.objects.for_period(
+            options['start'] and _start_of_day(options['start']),
+            options['end'] and _start_of_day(options['end'] + datetime.timedelta(days=1)),
+        )
+        if options['platform'] is not None:
+            events = events.filter(platform=options['platform'])
+        summary = events.summary()
+        total = summary['total']
+        self.stdout.write(
+            f"Реплик: {total}, необработано: {summary['not_handled']} ({_rate(summary['not_handled'], total)}), "
+            f"пользователей: {summary['users']}, сессий: {summary['sessions']}",
+        )
+        self._table('Платформа', 'platform', events.by_platform(), total)
+        self._table('Намерение', 'intent', events.by_intent()[:options['top']], total)
+        if options['daily']:
+            self._table('День', 'day', events.by_day(), total)
+
+    def _table(self, title, field, rows, total):
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{title:<40} {"реплик":>10} {"доля":>8} {"не обр.":>8}'))
+        for row in rows:
+            self.stdout.write(
+                f"{str(row[field] or '-'):<40} {row['total']:>10} {_rate(row['total'], total):>8} "
+                f"{_rate(row['not_handled'], row['total']):>8}",
+            )
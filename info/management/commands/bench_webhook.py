@@ -0,0 +1,97 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from info.bench import webhook
+
+
+class Command(BaseCommand):
+    help = (  # noqa: A003
+        'Замеряет этапы обработки запроса webhook на эталонных телах запросов. '
+        'Результаты сохраняются в JSON и сравниваются с базовыми (по умолчанию info/bench/baseline.json), '
+        'замедление сверх порога, подтвержденное повторным замером, - ошибка.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--payload',
+            action='append',
+            help='Имя тела запроса из info/bench/payloads. По умолчанию - все.',
+        )
+        parser.add_argument(
+            '--number',
+            type=int,
+            help='Вызовов в одном повторе. По умолчанию подбирается так, чтобы повтор длился не меньше 0,2 с.',
+        )
+        parser.add_argument('--repeat', type=int, default=7, help='Количество повторов.')
+        parser.add_argument('--save', help='Сохранить результаты в файл.')
+        parser.add_argument(
+            '--compare',
+            nargs='?',
+            const=str(webhook.BASELINE_PATH),
+            help='Сравнить с базовыми результатами из файла, без значения - с info/bench/baseline.json.',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=1.25,
+            help='Допустимое отношение лучшего времени этапа к базовой медиане.',
+        )
+        parser.add_argument(
+            '--floor',
+            type=float,
+            default=0.5,
+            help='Замедление в микросекундах, которое не считается ошибкой при любом отношении.',
+        )
+
+    def handle(self, *args, **options):  # noqa: U100
+        payloads = webhook.load_payloads(options['payload'])
+        if not payloads:
+            raise CommandError('Тела запросов не найдены')
+        results = webhook.run(payloads, number=options['number'], repeat=options['repeat'])
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{"запрос":<12} {"этап":<26} {"мин, мкс":>10} {"медиана":>10}'))
+        for name, stages in results['results'].items():
+            for stage, timing in stages.items():
+                self.stdout.write(f"{name:<12} {stage:<26} {timing['min_us']:>10.2f} {timing['median_us']:>10.2f}")
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {options['save']}"))
+        if options['compare']:
+            self._compare(results, payloads, options)
+
+    def _compare(self, results, payloads, options):
+        try:
+            with open(options['compare'], encoding='utf-8') as stream:
+                baseline = json.load(stream)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        self.stdout.write('')
+        for change in webhook.environment_changes(results, baseline):
+            self.stdout.write(self.style.WARNING(f'Окружение базовых результатов отличается, {change}'))
+        rows = webhook.compare(results, baseline, options['threshold'], options['floor'])
+        suspects = {(row['payload'], row['stage']) for row in rows if row['regression']}
+        if suspects:
+            # Замедление на общей машине бывает временным, ошибкой считается только повторившееся.
+            self.stdout.write(f'Повторный замер этапов: {len(suspects)}')
+            rechecked = webhook.run(payloads, number=options['number'], repeat=options['repeat'], only=suspects)
+            rechecked_rows = {
+                (row['payload'], row['stage']): row
+                for row in webhook.compare(rechecked, baseline, options['threshold'], options['floor'])
+            }
+            rows = [rechecked_rows.get((row['payload'], row['stage']), row) for row in rows]
+        regressions = 0
+        header = f'{"запрос":<12} {"этап":<26} {"база":>10} {"сейчас":>10} {"+мкс":>8} {"x":>6}'
+        self.stdout.write(self.style.MIGRATE_HEADING(header))
+        for row in rows:
+            line = (
+                f"{row['payload']:<12} {row['stage']:<26} {row['baseline_us']:>10.2f} "
+                f"{row['current_us']:>10.2f} {row['delta_us']:>8.2f} {row['ratio']:>6.2f}"
+            )
+            if row['regression']:
+                regressions += 1
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        if regressions:
+            raise CommandError(f"Замедление сверх x{options['threshold']} и {options['floor']} мкс: {regressions} этапов")
+        self.stdout.write(self.style.SUCCESS('Замедлений нет'))
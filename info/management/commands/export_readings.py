@@ -0,0 +1,69 @@
+import datetime
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from info.models import ProductionRollup
+from info.tools import exporter
+
+
+class Command(BaseCommand):
+    help = (  # noqa: A003
+        'Выгружает показатели скважин в CSV или NDJSON в формате команды import_readings. '
+        'Строки читаются из базы частями, объем выгрузки не ограничен памятью.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Путь к файлу, "-" - стандартный вывод.')
+        parser.add_argument(
+            '--format',
+            choices=tuple(exporter.ENCODERS),
+            help='Формат файла. По умолчанию определяется по расширению.',
+        )
+        parser.add_argument(
+            '--metric',
+            action='append',
+            choices=ProductionRollup.Metric.values,
+            help='Показатель. По умолчанию - все.',
+        )
+        parser.add_argument(
+            '--oilfield',
+            action='append',
+            type=int,
+            help='Идентификатор месторождения. По умолчанию - все.',
+        )
+        parser.add_argument(
+            '--well',
+            action='append',
+            help='Идентификационный номер скважины. По умолчанию - все.',
+        )
+        parser.add_argument('--start', type=datetime.date.fromisoformat, help='Начальная дата, YYYY-MM-DD.')
+        parser.add_argument('--end', type=datetime.date.fromisoformat, help='Конечная дата, YYYY-MM-DD.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):  # noqa: U100
+        path = options['path']
+        file_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        rows = exporter.iter_readings(
+            metrics=options['metric'],
+            oilfield_ids=options['oilfield'],
+            wells=options['well'],
+            start_date=options['start'],
+            end_date=options['end'],
+            chunk_size=options['chunk_size'],
+        )
+        try:
+            stream = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+        exported = 0
+        try:
+            for line in exporter.ENCODERS[file_format](rows):
+                stream.write(line)
+                exported += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        if file_format == 'csv':
+            exported -= 1
+        self.stderr.write(self.style.SUCCESS(f'Выгружено: {exported}'))
@@ -0,0 +1,64 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from info.tools.dataset import PRESETS, DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = (  # noqa: A003
+        'Создает синтетический набор данных для нагрузочной проверки: месторождения, скважины, '
+        'суточные показатели, инциденты, сотрудники и задачи. При одинаковых --seed и --end результат одинаков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=tuple(PRESETS), default='s', help='Размер набора.')
+        parser.add_argument('--oilfields', type=int, help='Количество месторождений.')
+        parser.add_argument('--wells', type=int, help='Скважин на месторождении.')
+        parser.add_argument('--years', type=int, help='Лет суточных показателей.')
+        parser.add_argument('--employees', type=int, help='Количество сотрудников.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic', help='Префикс названий месторождений и скважин.')
+        parser.add_argument(
+            '--end',
+            type=datetime.date.fromisoformat,
+            help='Последняя дата показателей, YYYY-MM-DD, по умолчанию вчерашний день.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=100000)
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY на PostgreSQL.',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить ранее созданный набор с тем же префиксом.',
+        )
+
+    def handle(self, *args, **options):  # noqa: U100
+        preset = PRESETS[options['preset']]
+        sizes = {field: options[field] if options[field] is not None else getattr(preset, field) for field in preset._fields}
+        if min(sizes.values()) < 0 or sizes['years'] < 1:
+            raise CommandError('Размеры набора должны быть положительными')
+        generator = DatasetGenerator(
+            seed=options['seed'],
+            prefix=options['prefix'],
+            end_date=options['end'],
+            chunk_size=options['chunk_size'],
+            use_copy=False if options['no_copy'] else None,
+            **sizes,
+        )
+        if options['clear']:
+            generator.clear()
+        self.stdout.write(
+            f"Месторождений: {sizes['oilfields']}, скважин: {sizes['oilfields'] * sizes['wells']}, "
+            f"период: {generator.start_date} - {generator.end_date}",
+        )
+        generator.run(progress=self._progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Показателей: {generator.rows}, {generator.seconds:.1f} с, {generator.rows_per_second:.0f} строк/с',
+        ))
+
+    def _progress(self, generator):
+        self.stdout.write(f'{generator.rows} строк, {generator.rows_per_second:.0f} строк/с')
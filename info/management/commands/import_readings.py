@@ -0,0 +1,80 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from info.models import ProductionRollup
+from info.tools.importer import ReadingImporter, read_csv, read_ndjson
+
+
+class Command(BaseCommand):
+    help = (  # noqa: A003
+        'Загружает показатели скважин из CSV или NDJSON. '
+        'Поля: well (идентификационный номер скважины), date (YYYY-MM-DD), value, metric. '
+        'Показание скважины за дату заменяется, повторная загрузка безопасна. '
+        'Каждая часть загружается в своей транзакции вместе с обновлением агрегатов, '
+        'при ошибке загруженные части сохраняются. С --skip-rollups после загрузки, '
+        'в том числе прерванной, нужно выполнить rebuild_rollups.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу, "-" - стандартный ввод.')
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'ndjson'),
+            help='Формат файла. По умолчанию определяется по расширению.',
+        )
+        parser.add_argument(
+            '--metric',
+            choices=ProductionRollup.Metric.values,
+            help='Показатель для строк без поля metric.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY на PostgreSQL.',
+        )
+        parser.add_argument(
+            '--skip-rollups',
+            action='store_true',
+            help='Не пересчитывать агрегаты. После загрузки нужно выполнить rebuild_rollups.',
+        )
+
+    def handle(self, *args, **options):  # noqa: U100
+        path = options['path']
+        file_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        reader = read_ndjson if file_format == 'ndjson' else read_csv
+        importer = ReadingImporter(
+            metric=options['metric'],
+            chunk_size=options['chunk_size'],
+            use_copy=False if options['no_copy'] else None,
+            refresh_rollups=not options['skip_rollups'],
+        )
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+        self._imported = 0
+        try:
+            with stream:
+                stats = importer.run(reader(stream), progress=self._progress)
+        except (DatabaseError, OSError, ValueError) as error:
+            if options['skip_rollups']:
+                hint = 'Агрегаты не пересчитаны, выполните rebuild_rollups.'
+            else:
+                hint = 'Агрегаты загруженных частей обновлены.'
+            raise CommandError(
+                f'Загрузка прервана: {error!r}. Сохранено строк: {self._imported}. {hint} '
+                f'Файл можно загрузить повторно.',
+            ) from error
+        for error in stats.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: {stats.imported}, пропущено: {stats.skipped}, '
+            f'{stats.seconds:.1f} с, {stats.rows_per_second:.0f} строк/с',
+        ))
+
+    def _progress(self, stats):
+        self._imported = stats.imported
+        self.stdout.write(f'{stats.imported} строк, {stats.rows_per_second:.0f} строк/с')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from info.bench.importtime import PROFILES, run
+
+
+class Command(BaseCommand):
+    help = (  # noqa: A003
+        'Замеряет время импорта при запуске процессов web и worker (python -X importtime): '
+        'общее, самые медленные модули и пакеты. С --budget завершается с ошибкой при превышении бюджета.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile', nargs='*', help=f"{', '.join(sorted(PROFILES))}, по умолчанию - все.")
+        parser.add_argument('--top', type=int, default=15, help='Сколько модулей и пакетов вывести.')
+        parser.add_argument('--repeat', type=int, default=3, help='Запусков, в отчет попадает самый быстрый.')
+        parser.add_argument('--budget', type=float, help='Бюджет времени импорта на профиль, мс.')
+
+    def handle(self, *args, **options):  # noqa: U100
+        profiles = options['profile'] or sorted(PROFILES)
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Неизвестные профили: {', '.join(sorted(unknown))}")
+        exceeded = []
+        for profile in profiles:
+            try:
+                report = run(profile, repeat=max(options['repeat'], 1))
+            except RuntimeError as error:
+                raise CommandError(f'{profile}: {error}')
+            total = report.total_us / 1000
+            line = f'{profile}: {total:.1f} мс, модулей {len(report.records)}'
+            if options['budget'] is not None and total > options['budget']:
+                exceeded.append(profile)
+                line = self.style.ERROR(f"{line}, бюджет {options['budget']:.1f} мс")
+            self.stdout.write(line)
+            self.stdout.write('  Модули, с зависимостями:')
+            for record in report.top(options['top']):
+                self.stdout.write(f'    {record.cumulative_us / 1000:8.1f} мс  {record.module}')
+            self.stdout.write('  Пакеты, собственное время:')
+            for package, self_us in report.packages(options['top']).items():
+                self.stdout.write(f'    {self_us / 1000:8.1f} мс  {package}')
+        if exceeded:
+            raise CommandError(f"Превышен бюджет времени импорта: {', '.join(exceeded)}")
@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from info.models import ProductionRollup
+from info.tools import rollups
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает агрегаты показателей скважин (ProductionRollup) по исходным данным.'  # noqa: A003
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--metric',
+            action='append',
+            choices=ProductionRollup.Metric.values,
+            help='Показатель. По умолчанию - все.',
+        )
+        parser.add_argument(
+            '--oilfield',
+            action='append',
+            type=int,
+            help='Идентификатор месторождения. По умолчанию - все.',
+        )
+        parser.add_argument('--start', type=datetime.date.fromisoformat, help='Начальная дата, YYYY-MM-DD.')
+        parser.add_argument('--end', type=datetime.date.fromisoformat, help='Конечная дата, YYYY-MM-DD.')
+
+    def handle(self, *args, **options):  # noqa: U100
+        created = rollups.rebuild(
+            metrics=options['metric'],
+            oilfield_ids=options['oilfield'],
+            start_date=options['start'],
+            end_date=options['end'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Создано агрегатов: {created}'))
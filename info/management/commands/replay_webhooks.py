@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from info.bench.replay import DEFAULT_URL, Replayer
+from info.tools.capture import read_captured
+
+
+class Command(BaseCommand):
+    help = (  # noqa: A003
+        'Воспроизводит записанные запросы webhook (WEBHOOK_CAPTURE_DIR) на сервере '
+        'и выводит задержки p50/p95/p99, долю ошибок и пропускную способность.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='+', help='Файлы или каталоги записи.')
+        parser.add_argument('--url', default=DEFAULT_URL)
+        parser.add_argument('--concurrency', type=int, default=8, help='Одновременных запросов.')
+        parser.add_argument('--rate', type=float, help='Запросов в секунду. Без параметра - замкнутый цикл.')
+        parser.add_argument('--requests', type=int, help='Всего запросов, записанные запросы повторяются по кругу.')
+        parser.add_argument('--duration', type=float, help='Длительность, секунд, записанные запросы повторяются по кругу.')
+        parser.add_argument('--timeout', type=float, default=10)
+
+    def handle(self, *args, **options):  # noqa: U100
+        try:
+            bodies = list(read_captured(options['path']))
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(error)
+        if not bodies:
+            raise CommandError('Записанные запросы не найдены')
+        stats = Replayer(
+            bodies,
+            url=options['url'],
+            concurrency=options['concurrency'],
+            rate=options['rate'],
+            total=options['requests'],
+            duration=options['duration'],
+            timeout=options['timeout'],
+        ).run()
+        self.stdout.write(f'Запросов: {stats.requests} за {stats.seconds:.1f} с, {stats.throughput:.1f} в секунду')
+        self.stdout.write(
+            f'Задержка, мс: p50 {stats.percentile(50):.1f}, p95 {stats.percentile(95):.1f}, '
+            f'p99 {stats.percentile(99):.1f}',
+        )
+        line = f'Ошибок: {stats.errors} ({stats.error_rate:.2%})'
+        self.stdout.write(self.style.ERROR(line) if stats.errors else line)
+        for status, count in sorted(stats.statuses.items()):
+            self.stdout.write(f'  {status}: {count}')
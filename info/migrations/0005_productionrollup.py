@@ -0,0 +1,84 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:54
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+import django.db.models.deletion
+
+READINGS = (
+    ('Mining', 'mining', 'mining_date', 'mining_count'),
+    ('Urgg', 'urgg', 'urgg_date', 'urgg_count'),
+    ('GasDisposal', 'gas_disposal', 'gas_disposal_date', 'gas_disposal_count'),
+)
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Заполняет агрегаты по показателям, загруженным до появления таблицы: суммы читаются только из агрегатов.
+    Используются исторические модели, а не info.tools.rollups, рассчитанный на текущую схему.
+    """
+    ProductionRollup = apps.get_model('info', 'ProductionRollup')
+    for model_name, metric, date_field, value_field in READINGS:
+        readings = apps.get_model('info', model_name).objects.annotate(rollup_oilfield=F('well__oilfield_id'))
+        for period, period_start in (('day', F(date_field)), ('month', TruncMonth(date_field))):
+            for per_well in (True, False):
+                fields = ['rollup_oilfield', 'rollup_start'] + (['well_id'] if per_well else [])
+                rows = readings.annotate(rollup_start=period_start).values(*fields).annotate(
+                    rollup_total=Sum(value_field),
+                    rollup_readings=Count('pk'),
+                ).order_by()
+                ProductionRollup.objects.bulk_create(
+                    [
+                        ProductionRollup(
+                            metric=metric,
+                            period=period,
+                            period_start=row['rollup_start'],
+                            oilfield_id=row['rollup_oilfield'],
+                            well_id=row['well_id'] if per_well else None,
+                            total=row['rollup_total'],
+                            readings=row['rollup_readings'],
+                        )
+                        for row in rows.iterator()
+                    ],
+                    batch_size=1000,
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('info', '0004_alter_well_oilfield'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('mining', 'Добыча'), ('urgg', 'Показатель УРГГ'), ('gas_disposal', 'Утилизация газа')], max_length=15, verbose_name='Показатель')),
+                ('period', models.CharField(choices=[('day', 'День'), ('month', 'Месяц')], max_length=5, verbose_name='Период')),
+                ('period_start', models.DateField(verbose_name='Начало периода')),
+                ('total', models.DecimalField(decimal_places=3, default=0, max_digits=20, verbose_name='Сумма')),
+                ('readings', models.PositiveIntegerField(default=0, verbose_name='Количество показаний')),
+                ('oilfield', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='info.oilfield', verbose_name='Месторождение')),
+                ('well', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='info.well', verbose_name='Скважина')),
+            ],
+            options={
+                'verbose_name': 'Агрегат показателей',
+                'verbose_name_plural': 'Агрегаты показателей',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='productionrollup',
+            index=models.Index(fields=['metric', 'oilfield', 'period', 'period_start'], name='rollup_oilfield_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productionrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('well__isnull', True)), fields=('metric', 'period', 'period_start', 'oilfield'), name='unique_oilfield_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='productionrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('well__isnull', False)), fields=('metric', 'period', 'period_start', 'well'), name='unique_well_rollup'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:55
+
+import logging
+
+from django.db import migrations
+from django.db.models import Count, F, Max
+
+READINGS = (
+    ('Mining', 'mining', 'mining_date', 'mining_count'),
+    ('Urgg', 'urgg', 'urgg_date', 'urgg_count'),
+    ('GasDisposal', 'gas_disposal', 'gas_disposal_date', 'gas_disposal_count'),
+)
+
+logger = logging.getLogger(__name__)
+
+
+def remove_duplicate_readings(apps, schema_editor):
+    """
+    Оставляет одно, последнее добавленное, показание скважины за день
+    и вычитает удаленные показания из агрегатов. Количество удаленных показаний пишется в журнал.
+    Миграция необратима: удаленные показания не восстанавливаются.
+    """
+    ProductionRollup = apps.get_model('info', 'ProductionRollup')
+    for model_name, metric, date_field, value_field in READINGS:
+        model = apps.get_model('info', model_name)
+        duplicates = model.objects.values('well_id', date_field).annotate(
+            last_pk=Max('pk'),
+            readings=Count('pk'),
+        ).filter(readings__gt=1).order_by()
+        deleted = 0
+        for duplicate in duplicates:
+            date = duplicate[date_field]
+            removed = model.objects.filter(
+                well_id=duplicate['well_id'],
+                **{date_field: date},
+            ).exclude(pk=duplicate['last_pk']).values_list('pk', 'well__oilfield_id', value_field)
+            for pk, oilfield_id, value in list(removed):
+                for well_id in (duplicate['well_id'], None):
+                    for period, period_start in (('day', date), ('month', date.replace(day=1))):
+                        ProductionRollup.objects.filter(
+                            metric=metric,
+                            period=period,
+                            period_start=period_start,
+                            oilfield_id=oilfield_id,
+                            well_id=well_id,
+                        ).update(total=F('total') - value, readings=F('readings') - 1)
+                model.objects.filter(pk=pk).delete()
+                deleted += 1
+        if deleted:
+            logger.warning('%s: удалено повторяющихся показаний скважин за день: %s', model_name, deleted)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('info', '0005_productionrollup'),
+    ]
+
+    operations = [
+        # Откат не восстанавливает удаленные показания, только снимает отметку о применении.
+        migrations.RunPython(remove_duplicate_readings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('info', '0006_remove_duplicate_readings'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='gasdisposal',
+            constraint=models.UniqueConstraint(fields=('well', 'gas_disposal_date'), name='unique_gas_disposal_well_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='mining',
+            constraint=models.UniqueConstraint(fields=('well', 'mining_date'), name='unique_mining_well_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='urgg',
+            constraint=models.UniqueConstraint(fields=('well', 'urgg_date'), name='unique_urgg_well_date'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('info', '0007_reading_well_date_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='Время')),
+                ('platform', models.CharField(blank=True, max_length=50, verbose_name='Платформа')),
+                ('user_id', models.CharField(blank=True, max_length=255, verbose_name='Пользователь')),
+                ('session_id', models.CharField(blank=True, max_length=255, verbose_name='Сессия')),
+                ('intent', models.CharField(blank=True, max_length=255, verbose_name='Намерение')),
+                ('user_msg', models.TextField(blank=True, verbose_name='Реплика пользователя')),
+                ('agent_msg', models.TextField(blank=True, verbose_name='Ответ')),
+                ('not_handled', models.BooleanField(default=False, verbose_name='Не обработано')),
+            ],
+            options={
+                'verbose_name': 'Событие диалога',
+                'verbose_name_plural': 'События диалогов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='conversationevent',
+            index=models.Index(fields=['created_at'], name='event_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationevent',
+            index=models.Index(fields=['intent', 'created_at'], name='event_intent_idx'),
+        ),
+    ]
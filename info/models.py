@@ -1,7 +1,8 @@
 import datetime
 
-from django.db import models
-from django.db.models import Sum, Q
+from django.db import connections, models, transaction
+from django.db.models import Count, FilteredRelation, Min, Sum, Q
+from django.db.models.functions import TruncDate
 from django.utils.translation import gettext_lazy as _
 from phonenumber_field.modelfields import PhoneNumberField
 
@@ -25,12 +26,50 @@ class Incident(models.Model):
         return f'{self.incident_date}, количество {self.incident_count}'
 
 
+class OilFieldQuerySet(models.QuerySet):
+
+    def production_matrix(self, periods, metrics=None):
+        """
+        Суммы показателей месторождений за несколько периодов одним запросом.
+        :param periods: Словарь {метка: (начало, конец)} или список пар (начало, конец).
+        Начало может быть None - с начала наблюдений.
+        :param metrics: Показатели ProductionRollup.Metric. По умолчанию - все.
+        :return: {месторождение: {метка периода: {показатель: сумма или None}}}
+        """
+        if not isinstance(periods, dict):
+            periods = {period: period for period in periods}
+        metrics = list(metrics or ProductionRollup.Metric.values)
+        annotations = {}
+        for index, (start_date, end_date) in enumerate(periods.values()):
+            period_q = ProductionRollupQuerySet.date_period_q(start_date, end_date, prefix='oilfield_rollups__')
+            for metric in metrics:
+                annotations[f'_{metric}_{index}'] = Sum(
+                    'oilfield_rollups__total',
+                    filter=period_q & Q(oilfield_rollups__metric=metric),
+                )
+        queryset = self.annotate(
+            oilfield_rollups=FilteredRelation(
+                'rollups',
+                condition=Q(rollups__well__isnull=True, rollups__metric__in=metrics),
+            ),
+        ).annotate(**annotations)
+        return {
+            oilfield: {
+                label: {metric: getattr(oilfield, f'_{metric}_{index}') for metric in metrics}
+                for index, label in enumerate(periods)
+            }
+            for oilfield in queryset
+        }
+
+
 class OilField(models.Model):
     name = models.CharField(
         max_length=255,
         verbose_name=_('Наименование'),
     )
 
+    objects = OilFieldQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Месторождение')
         verbose_name_plural = _('Месторождения')
@@ -38,26 +77,51 @@ class OilField(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def get_id_by_name(cls, name):
+        """
+        Идентификатор месторождения по наименованию из справочного кэша.
+        None, если месторождение не найдено или их несколько.
+        """
+        from .tools.reference import reference_cache
+        return reference_cache.oilfield_id(name)
+
+    def get_well_ids(self):
+        """
+        Идентификаторы скважин месторождения из справочного кэша, без запроса к базе.
+        """
+        from .tools.reference import reference_cache
+        return reference_cache.well_ids(self.pk)
+
     def get_wells(self):
-        return OilField.objects.prefetch_related('wells').get(name=self.name).wells
+        return Well.objects.filter(pk__in=self.get_well_ids())
 
     def get_start_mining_date(self):
-        return self.get_wells().order_by(
-            'mining__mining_date').values_list(
-            'mining__mining_date',
-            flat=True,
-        )[0]
+        return Mining.objects.filter(well__oilfield=self).aggregate(Min('mining_date'))['mining_date__min']
 
-    def get_mining_for_date_period(self, start_date=None, end_date=None):
-        if not start_date:
-            start_date = self.get_start_mining_date()
+    def get_total_for_date_period(self, metric, start_date=None, end_date=None):
+        """
+        Сумма показателя за период по агрегатам ProductionRollup.
+        Без начальной даты считается с начала наблюдений.
+        """
         if not end_date:
             end_date = datetime.date.today()
-        return self.get_wells().filter(
-           Q(mining__mining_date__gte=start_date) & Q(mining__mining_date__lte=end_date),
-        ).aggregate(
-            Sum('mining__mining_count'),
-        )['mining__mining_count__sum']
+        return ProductionRollup.objects.filter(
+            metric=metric,
+            oilfield=self,
+            well__isnull=True,
+        ).for_date_period(start_date, end_date).aggregate(
+            Sum('total'),
+        )['total__sum']
+
+    def get_mining_for_date_period(self, start_date=None, end_date=None):
+        return self.get_total_for_date_period(ProductionRollup.Metric.MINING, start_date, end_date)
+
+    def get_urgg_for_date_period(self, start_date=None, end_date=None):
+        return self.get_total_for_date_period(ProductionRollup.Metric.URGG, start_date, end_date)
+
+    def get_gas_disposal_for_date_period(self, start_date=None, end_date=None):
+        return self.get_total_for_date_period(ProductionRollup.Metric.GAS_DISPOSAL, start_date, end_date)
 
 
 class Well(models.Model):
@@ -110,6 +174,63 @@ class Well(models.Model):
     def __str__(self):
         return self.ident_number
 
+    @classmethod
+    def get_refs(cls, ident_number):
+        """
+        Скважины с идентификационным номером из справочного кэша (WellRef).
+        Номер уникален только в пределах месторождения.
+        """
+        from .tools.reference import reference_cache
+        return reference_cache.wells(ident_number)
+
+    @classmethod
+    def get_ref(cls, ident_number, oilfield_id=None):
+        """
+        Скважина (WellRef) по идентификационному номеру, при необходимости в пределах месторождения.
+        None, если скважина не найдена или неоднозначна.
+        """
+        from .tools.reference import reference_cache
+        return reference_cache.well(ident_number, oilfield_id)
+
+
+class ReadingQuerySet(models.QuerySet):
+    """
+    Показатели скважин. bulk_create не отправляет сигналы,
+    поэтому агрегаты пересчитываются здесь. update() агрегаты не обновляет.
+    """
+
+    def bulk_create(self, objs, *args, refresh_rollups=True, **kwargs):
+        """
+        :param refresh_rollups: False - агрегаты и версии данных не обновляются,
+        вызывающий код должен сам выполнить rollups.rebuild.
+        """
+        from .tools import rollups
+        from .tools.cache import bump_data_version
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if not refresh_rollups:
+            return objs
+        oilfield_ids = rollups.refresh_for_readings(self.model, objs)
+        transaction.on_commit(lambda: bump_data_version(oilfield_ids))
+        return objs
+
+    def delete(self, refresh_rollups=True):
+        """
+        :param refresh_rollups: False - строки удаляются одним запросом DELETE без загрузки
+        и сигналов, агрегаты и версии данных не обновляются.
+        """
+        if refresh_rollups:
+            return super().delete()
+        quote = connections[self.db].ops.quote_name
+        table = quote(self.model._meta.db_table)
+        sql, params = self.values('pk').order_by().query.get_compiler(self.db).as_sql()
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {quote(self.model._meta.pk.column)} IN ({sql})',  # noqa: S608
+                params,
+            )
+            deleted = cursor.rowcount
+        return deleted, {self.model._meta.label: deleted}
+
 
 class Mining(models.Model):
     well = models.ForeignKey(
@@ -125,9 +246,14 @@ class Mining(models.Model):
         verbose_name=_('Количество'),
     )
 
+    objects = ReadingQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Добыча')
         verbose_name_plural = _('Добыча')
+        constraints = [
+            models.UniqueConstraint(fields=['well', 'mining_date'], name='unique_mining_well_date'),
+        ]
 
     def __str__(self):
         return f'{self.mining_count}'
@@ -149,9 +275,14 @@ class Urgg(models.Model):
         verbose_name=_('Количество'),
     )
 
+    objects = ReadingQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Показатель УРГГ')
         verbose_name_plural = _('Показатели УРГГ')
+        constraints = [
+            models.UniqueConstraint(fields=['well', 'urgg_date'], name='unique_urgg_well_date'),
+        ]
 
     def __str__(self):
         return f'{self.urgg_date} - {self.urgg_count} м3'
@@ -173,14 +304,146 @@ class GasDisposal(models.Model):
         verbose_name=_("Количество"),
     )
 
+    objects = ReadingQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Утилизация газа')
         verbose_name_plural = _('Утилизация газа')
+        constraints = [
+            models.UniqueConstraint(fields=['well', 'gas_disposal_date'], name='unique_gas_disposal_well_date'),
+        ]
 
     def __str__(self):
         return f'{self.gas_disposal_date} - {self.gas_disposal_count} м3'
 
 
+def month_start(date):
+    return date.replace(day=1)
+
+
+def month_end(date):
+    return (month_start(date) + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+
+
+class ProductionRollupQuerySet(models.QuerySet):
+
+    def for_date_period(self, start_date, end_date):
+        return self.filter(self.date_period_q(start_date, end_date))
+
+    @staticmethod
+    def date_period_q(start_date, end_date, prefix=''):
+        """
+        Условие отбора агрегатов за период: полные месяцы берутся из месячных агрегатов,
+        неполные месяцы на границах - из дневных.
+        :param prefix: Путь к агрегатам от модели запроса, например 'rollups__'.
+        """
+        day = ProductionRollup.Period.DAY
+        month = ProductionRollup.Period.MONTH
+        period = f'{prefix}period'
+        period_start = f'{prefix}period_start'
+        if start_date is None:
+            first_month = None
+        elif start_date.day == 1:
+            first_month = start_date
+        else:
+            first_month = month_end(start_date) + datetime.timedelta(days=1)
+        if end_date == month_end(end_date):
+            last_month = month_start(end_date)
+        else:
+            last_month = month_start(end_date) - datetime.timedelta(days=1)
+            last_month = month_start(last_month)
+        if first_month is not None and first_month > last_month:
+            return Q(**{period: day, f'{period_start}__range': (start_date, end_date)})
+        query = Q(**{period: month, f'{period_start}__lte': last_month})
+        if first_month is not None:
+            query &= Q(**{f'{period_start}__gte': first_month})
+            if start_date < first_month:
+                head = (start_date, first_month - datetime.timedelta(days=1))
+                query |= Q(**{period: day, f'{period_start}__range': head})
+        tail_start = month_end(last_month) + datetime.timedelta(days=1)
+        if tail_start <= end_date:
+            query |= Q(**{period: day, f'{period_start}__range': (tail_start, end_date)})
+        return query
+
+
+class ProductionRollup(models.Model):
+    """
+    Предварительно рассчитанные суммы показателей скважин за день и за месяц.
+    Строки со скважиной - агрегаты скважины, без скважины - агрегаты месторождения.
+    Обновляются сигналами и ReadingQuerySet.bulk_create, пересчитываются командой rebuild_rollups.
+    """
+    class Metric(models.TextChoices):
+        MINING = 'mining', _('Добыча')
+        URGG = 'urgg', _('Показатель УРГГ')
+        GAS_DISPOSAL = 'gas_disposal', _('Утилизация газа')
+
+    class Period(models.TextChoices):
+        DAY = 'day', _('День')
+        MONTH = 'month', _('Месяц')
+
+    metric = models.CharField(
+        choices=Metric.choices,
+        max_length=15,
+        verbose_name=_('Показатель'),
+    )
+    period = models.CharField(
+        choices=Period.choices,
+        max_length=5,
+        verbose_name=_('Период'),
+    )
+    period_start = models.DateField(
+        verbose_name=_('Начало периода'),
+    )
+    oilfield = models.ForeignKey(
+        OilField,
+        on_delete=models.CASCADE,
+        related_name='rollups',
+        verbose_name=_('Месторождение'),
+    )
+    well = models.ForeignKey(
+        Well,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='rollups',
+        verbose_name=_('Скважина'),
+    )
+    total = models.DecimalField(
+        max_digits=20,
+        decimal_places=3,
+        default=0,
+        verbose_name=_('Сумма'),
+    )
+    readings = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Количество показаний'),
+    )
+
+    objects = ProductionRollupQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('Агрегат показателей')
+        verbose_name_plural = _('Агрегаты показателей')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['metric', 'period', 'period_start', 'oilfield'],
+                condition=Q(well__isnull=True),
+                name='unique_oilfield_rollup',
+            ),
+            models.UniqueConstraint(
+                fields=['metric', 'period', 'period_start', 'well'],
+                condition=Q(well__isnull=False),
+                name='unique_well_rollup',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['metric', 'oilfield', 'period', 'period_start'], name='rollup_oilfield_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.metric} {self.period_start} - {self.total}'
+
+
 class Employee(models.Model):
     id_employee = models.IntegerField(
         null=True,
@@ -246,3 +509,99 @@ class Task(models.Model):
     def __str__(self):
         task_details_short = self.task_details[:10]
         return f'{self.task_date} - {task_details_short}'
+
+
+class ConversationEventQuerySet(models.QuerySet):
+
+    def for_period(self, start=None, end=None):
+        """
+        :param start: Начало периода включительно.
+        :param end: Конец периода не включительно.
+        """
+        events = self
+        if start is not None:
+            events = events.filter(created_at__gte=start)
+        if end is not None:
+            events = events.filter(created_at__lt=end)
+        return events
+
+    def summary(self) -> dict:
+        """
+        Количество реплик, необработанных реплик, пользователей и сессий.
+        """
+        return self.aggregate(
+            total=Count('pk'),
+            not_handled=Count('pk', filter=Q(not_handled=True)),
+            users=Count('user_id', distinct=True),
+            sessions=Count('session_id', distinct=True),
+        )
+
+    def _grouped(self, *fields):
+        return self.values(*fields).annotate(
+            total=Count('pk'),
+            not_handled=Count('pk', filter=Q(not_handled=True)),
+        )
+
+    def by_intent(self):
+        return self._grouped('intent').order_by('-total', 'intent')
+
+    def by_platform(self):
+        return self._grouped('platform').order_by('-total', 'platform')
+
+    def by_day(self):
+        return self.annotate(day=TruncDate('created_at'))._grouped('day').order_by('day')
+
+
+class ConversationEvent(models.Model):
+    """
+    Реплика пользователя и ответ агента для локальной аналитики.
+    Записи только добавляются пакетами из буфера аналитики (DatabaseSink) и не изменяются.
+    """
+    created_at = models.DateTimeField(
+        verbose_name=_('Время'),
+    )
+    platform = models.CharField(
+        max_length=50,
+        blank=True,
+        verbose_name=_('Платформа'),
+    )
+    user_id = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_('Пользователь'),
+    )
+    session_id = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_('Сессия'),
+    )
+    intent = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_('Намерение'),
+    )
+    user_msg = models.TextField(
+        blank=True,
+        verbose_name=_('Реплика пользователя'),
+    )
+    agent_msg = models.TextField(
+        blank=True,
+        verbose_name=_('Ответ'),
+    )
+    not_handled = models.BooleanField(
+        default=False,
+        verbose_name=_('Не обработано'),
+    )
+
+    objects = ConversationEventQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('Событие диалога')
+        verbose_name_plural = _('События диалогов')
+        indexes = [
+            models.Index(fields=['created_at'], name='event_created_idx'),
+            models.Index(fields=['intent', 'created_at'], name='event_intent_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.created_at} {self.platform} {self.intent}'
@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Incident, OilField, Well, Task, GasDisposal, Mining, Urgg
+from .tools import rollups
+from .tools.cache import bump_data_version, bump_structure_version
+
+
+def _apply_readings(model, changes):
+    """
+    Применяет изменения показателей к агрегатам.
+    :param changes: Список пар ((well_id, дата, значение), знак).
+    :return: Идентификаторы затронутых месторождений.
+    """
+    well_ids = {values[0] for values, _ in changes}
+    oilfields = dict(Well.objects.filter(pk__in=well_ids).values_list('pk', 'oilfield_id'))
+    for (well_id, date, value), sign in changes:
+        if well_id in oilfields:
+            rollups.apply_reading(model, well_id, oilfields[well_id], date, value, sign)
+    return list(oilfields.values())
+
+
+@receiver(pre_save, sender=Mining)
+@receiver(pre_save, sender=Urgg)
+@receiver(pre_save, sender=GasDisposal)
+def reading_pre_save(sender, instance, **kwargs):  # noqa: U100
+    instance._saved_values = rollups.get_saved_values(sender, instance.pk)
+
+
+@receiver(post_save, sender=Mining)
+@receiver(post_save, sender=Urgg)
+@receiver(post_save, sender=GasDisposal)
+def reading_saved(sender, instance, **kwargs):  # noqa: U100
+    changes = [(rollups.get_reading_values(instance), 1)]
+    saved_values = getattr(instance, '_saved_values', None)
+    if saved_values:
+        changes.append((saved_values, -1))
+    oilfield_ids = _apply_readings(sender, changes)
+    transaction.on_commit(lambda: bump_data_version(oilfield_ids))
+
+
+@receiver(post_delete, sender=Mining)
+@receiver(post_delete, sender=Urgg)
+@receiver(post_delete, sender=GasDisposal)
+def reading_deleted(sender, instance, **kwargs):  # noqa: U100
+    oilfield_ids = _apply_readings(sender, [(rollups.get_reading_values(instance), -1)])
+    transaction.on_commit(lambda: bump_data_version(oilfield_ids))
+
+
+@receiver([post_save, post_delete], sender=Incident)
+@receiver([post_save, post_delete], sender=Task)
+def events_changed(sender, instance, **kwargs):  # noqa: U100
+    transaction.on_commit(bump_data_version)
+
+
+@receiver(pre_save, sender=Well)
+def well_pre_save(sender, instance, **kwargs):  # noqa: U100
+    instance._saved_oilfield_id = None
+    if instance.pk is not None:
+        instance._saved_oilfield_id = Well.objects.filter(pk=instance.pk).values_list('oilfield_id', flat=True).first()
+
+
+@receiver(post_save, sender=Well)
+def well_saved(sender, instance, **kwargs):  # noqa: U100
+    saved_oilfield_id = getattr(instance, '_saved_oilfield_id', None)
+    if saved_oilfield_id and saved_oilfield_id != instance.oilfield_id:
+        # Скважина перенесена на другое месторождение, агрегаты за всю историю пересчитываются в фоне.
+        # Задачи импортируются здесь, чтобы процессы web не загружали Celery при запуске.
+        from .tasks import rebuild_rollups
+        oilfield_ids = [saved_oilfield_id, instance.oilfield_id]
+        transaction.on_commit(lambda: rebuild_rollups.delay(oilfield_ids=oilfield_ids))
+    transaction.on_commit(bump_structure_version)
+
+
+@receiver([post_save, post_delete], sender=OilField)
+@receiver(post_delete, sender=Well)
+def structure_changed(sender, instance, **kwargs):  # noqa: U100
+    transaction.on_commit(bump_structure_version)
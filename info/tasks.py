@@ -1,53 +1,31 @@
+import datetime
+
 from config.celery import app
-from .tools.chatbase import MessageSet
-from .tools.dialogflow_webhook import WebhookHandler
-from .tools.telegram import TelegramHandler
-from .tools.alice import AliceRequest, is_alice
-from django.conf import settings
+from .tools import analytics, rollups
+from .tools.cache import bump_data_version
+
 
-API_KEY = settings.CHATBASE_API_KEY
+@app.task(ignore_result=True)
+def analytics_flush():
+    """
+    Отправляет накопленные записи аналитики получателям из ANALYTICS_SINKS пакетами.
+    """
+    analytics.flush()
 
 
 @app.task
-def chatbase_send(data):
-    msg = WebhookHandler(data)
-    payload = msg.get_payload()
-    user_id = ""
-    version = "0.1"
-    if is_alice(msg):
-        msg.set_source('alice')
-        m = AliceRequest(payload)
-        user_msg = m.command
-        user_id = m.uid
-    elif msg.get_source() == 'telegram':
-        m = TelegramHandler(payload)
-        user_id = m.get_uid()
-        user_msg = m.get_text()
-    else:
-        user_msg = ""
-    platform = msg.get_source()
-    intent = msg.get_intent_display_name()
-    session_id = msg.get_session_id()
-    agent_msg = msg.get_fulfillment_text()
-    action = msg.get_action()
-    not_handled = True if action == 'input.unknown' else False
-    messages = MessageSet(
-        api_key=API_KEY,
-        platform=platform,
-        version=version,
-        user_id=user_id,
-    )
-    messages.new_message(
-        intent=intent,
-        message=user_msg,
-        session_id=session_id,
-        msg_type='user',
-        not_handled=not_handled,
-    )
-    messages.new_message(
-        intent=intent,
-        message=agent_msg,
-        session_id=session_id,
-        msg_type='agent',
+def rebuild_rollups(metrics=None, oilfield_ids=None, start_date=None, end_date=None):
+    """
+    Пересчитывает агрегаты показателей в очереди rollups.
+    :param start_date: Начальная дата в формате YYYY-MM-DD.
+    :param end_date: Конечная дата в формате YYYY-MM-DD.
+    :return: Количество созданных агрегатов.
+    """
+    created = rollups.rebuild(
+        metrics=metrics,
+        oilfield_ids=oilfield_ids,
+        start_date=start_date and datetime.date.fromisoformat(start_date),
+        end_date=end_date and datetime.date.fromisoformat(end_date),
     )
-    messages.send()
+    bump_data_version(oilfield_ids or ())
+    return created
@@ -0,0 +1,23 @@
+import pytest
+from django.core.cache import cache
+
+from info.models import OilField, Well
+from info.tools.reference import reference_cache
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    # Кэш в памяти и справочный кэш процесса переживают тест, а идентификаторы в SQLite повторяются.
+    cache.clear()
+    reference_cache.expire()
+
+
+@pytest.fixture()
+def wells():
+    north = OilField.objects.create(name='Северное')
+    south = OilField.objects.create(name='Южное')
+    return (
+        Well.objects.create(ident_number='101', oilfield=north),
+        Well.objects.create(ident_number='102', oilfield=north),
+        Well.objects.create(ident_number='201', oilfield=south),
+    )
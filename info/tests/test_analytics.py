@@ -0,0 +1,250 @@
+import asyncio
+import collections
+import datetime
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import redis
+from django.core.management import call_command
+
+from info.models import ConversationEvent
+from info.tools import analytics
+
+
+class FailingSink(analytics.AnalyticsSink):
+    name = 'failing'
+    batch_size = 2
+
+    def __init__(self, error=None, result=analytics.RETRY):
+        self.error = error
+        self.result = result
+        self.calls = 0
+
+    def send(self, records):  # noqa: U100
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture()
+def buffers(monkeypatch, settings):
+    """
+    Буферы получателей в памяти вместо Redis: ключ - список записей.
+    """
+    settings.ANALYTICS_MAX_ATTEMPTS = 3
+    lists = collections.defaultdict(list)
+
+    def pop_batch(key, size):
+        records, lists[key][:] = lists[key][:size], lists[key][size:]
+        return records
+
+    def requeue(key, records):
+        lists[key][:0] = records
+
+    def dead_letter(key, records):
+        lists[key].extend(records)
+
+    monkeypatch.setattr(analytics, 'pop_batch', pop_batch)
+    monkeypatch.setattr(analytics, 'requeue', requeue)
+    monkeypatch.setattr(analytics, 'dead_letter', dead_letter)
+    return lists
+
+
+def make_records(count):
+    return [{'user_msg': str(number)} for number in range(count)]
+
+
+def test_unexpected_error_requeues_batch(buffers):
+    sink = FailingSink(error=KeyError('platform'))
+    records = make_records(2)
+    assert analytics.send_batch(sink, records) == analytics.RETRY
+    assert buffers[sink.buffer_key] == [dict(record, attempts=1) for record in records]
+
+
+def test_exhausted_records_moved_to_dead_letters(buffers):
+    sink = FailingSink()
+    records = [{'user_msg': '0', 'attempts': 1}, {'user_msg': '1', 'attempts': 2}]
+    assert analytics.send_batch(sink, records) == analytics.RETRY
+    assert buffers[sink.buffer_key] == [{'user_msg': '0', 'attempts': 2}]
+    assert buffers[sink.dead_letter_key] == [{'user_msg': '1', 'attempts': 3}]
+
+
+def test_rejected_batch_not_requeued(buffers):
+    sink = FailingSink(result=analytics.REJECTED)
+    assert analytics.send_batch(sink, make_records(2)) == analytics.REJECTED
+    assert not buffers
+
+
+def test_requeue_failure_does_not_raise(buffers, monkeypatch):
+    def requeue(key, records):  # noqa: U100
+        raise redis.ConnectionError()
+
+    monkeypatch.setattr(analytics, 'requeue', requeue)
+    sink = FailingSink(error=RuntimeError())
+    assert analytics.send_batch(sink, make_records(2)) == analytics.RETRY
+    assert not buffers[sink.buffer_key]
+
+
+def test_flush_keeps_records_on_failure(buffers):
+    sink = FailingSink(error=ValueError())
+    records = make_records(5)
+    buffers[sink.buffer_key].extend(records)
+    for attempt in range(1, 3):
+        assert asyncio.run(analytics.aflush(sink, max_batches=10)) == 0
+        # После первого неудачного пакета выгрузка останавливается, порядок записей сохраняется.
+        assert sink.calls == attempt
+        assert [record['user_msg'] for record in buffers[sink.buffer_key]] == ['0', '1', '2', '3', '4']
+    asyncio.run(analytics.aflush(sink, max_batches=10))
+    assert buffers[sink.dead_letter_key] == [dict(record, attempts=3) for record in records[:2]]
+    assert len(buffers[sink.buffer_key]) == 3
+
+
+class BlockingSink(analytics.AnalyticsSink):
+    """
+    Получатель, отправка которого ждет release: видно, сколько пакетов одновременно в обработке.
+    """
+    name = 'blocking'
+    batch_size = 2
+    concurrency = 2
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.sent = []
+
+    def send(self, records):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.release.wait(5)
+        with self.lock:
+            self.in_flight -= 1
+            self.sent.extend(records)
+        return analytics.SENT
+
+
+def test_flush_limits_batches_in_flight(buffers, monkeypatch):
+    sink = BlockingSink()
+    records = make_records(9)
+    buffers[sink.buffer_key].extend(records)
+    pops = []
+    pop_batch = analytics.pop_batch
+
+    def counting_pop_batch(key, size):
+        pops.append(key)
+        return pop_batch(key, size)
+
+    monkeypatch.setattr(analytics, 'pop_batch', counting_pop_batch)
+    # Пул больше числа слотов: лишний пакет был бы извлечен, если бы ограничивал только пул.
+    monkeypatch.setattr(analytics, 'ThreadPoolExecutor', lambda max_workers: ThreadPoolExecutor(max_workers + 2))
+
+    async def main():
+        flushing = asyncio.ensure_future(analytics.aflush(sink, max_batches=10))
+        while sink.in_flight < sink.concurrency:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        # Все слоты заняты: следующий пакет не извлекается из буфера.
+        assert len(pops) == sink.concurrency
+        assert len(buffers[sink.buffer_key]) == len(records) - sink.concurrency * sink.batch_size
+        sink.release.set()
+        return await flushing
+
+    assert asyncio.run(main()) == len(records)
+    assert sink.max_in_flight == sink.concurrency
+    assert sorted(sink.sent, key=lambda record: int(record['user_msg'])) == records
+    assert not buffers[sink.buffer_key]
+
+
+def make_event_record(time_stamp, **fields):
+    record = {
+        'time_stamp': time_stamp,
+        'platform': 'telegram',
+        'user_id': '42',
+        'session_id': 's1',
+        'intent': 'Добыча',
+        'user_msg': 'сколько добыто',
+        'agent_msg': '15',
+        'not_handled': False,
+    }
+    record.update(fields)
+    return record
+
+
+def send_in_thread(sink, records):
+    # Получатель закрывает соединение своего потока, как в пуле aflush.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(sink.send, records).result()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_database_sink_maps_records():
+    records = [
+        make_event_record(1612051200123),
+        make_event_record(1612137600000, platform=None, user_id=None, session_id=None, intent=None,
+                          user_msg=None, agent_msg=None, not_handled=True),
+    ]
+    assert send_in_thread(analytics.DatabaseSink(), records) == analytics.SENT
+    events = list(ConversationEvent.objects.order_by('created_at').values(
+        'created_at', 'platform', 'user_id', 'session_id', 'intent', 'user_msg', 'agent_msg', 'not_handled',
+    ))
+    assert events == [
+        {
+            'created_at': datetime.datetime(2021, 1, 31, 0, 0, 0, 123000, tzinfo=datetime.timezone.utc),
+            'platform': 'telegram',
+            'user_id': '42',
+            'session_id': 's1',
+            'intent': 'Добыча',
+            'user_msg': 'сколько добыто',
+            'agent_msg': '15',
+            'not_handled': False,
+        },
+        {
+            'created_at': datetime.datetime(2021, 2, 1, tzinfo=datetime.timezone.utc),
+            'platform': '',
+            'user_id': '',
+            'session_id': '',
+            'intent': '',
+            'user_msg': '',
+            'agent_msg': '',
+            'not_handled': True,
+        },
+    ]
+
+
+@pytest.mark.django_db()
+def test_analytics_report_aggregates():
+    day = datetime.datetime(2021, 1, 31, 12, tzinfo=datetime.timezone.utc)
+    events = [
+        ('telegram', '1', 's1', 'Добыча', False, day),
+        ('telegram', '1', 's1', 'Добыча', False, day),
+        ('telegram', '2', 's2', '', True, day),
+        ('alice', '3', 's3', 'Добыча', False, day + datetime.timedelta(days=1)),
+        # Вне периода отчета.
+        ('alice', '4', 's4', 'Инциденты', True, day + datetime.timedelta(days=5)),
+    ]
+    ConversationEvent.objects.bulk_create([
+        ConversationEvent(platform=platform, user_id=user_id, session_id=session_id, intent=intent,
+                          not_handled=not_handled, created_at=created_at)
+        for platform, user_id, session_id, intent, not_handled, created_at in events
+    ])
+    stdout = io.StringIO()
+    call_command('analytics_report', '--start', '2021-01-31', '--end', '2021-02-01', '--daily', stdout=stdout)
+    lines = [' '.join(line.split()) for line in stdout.getvalue().splitlines()]
+    assert lines[0] == 'Реплик: 4, необработано: 1 (25.0%), пользователей: 3, сессий: 3'
+    assert 'telegram 3 75.0% 33.3%' in lines
+    assert 'alice 1 25.0% 0.0%' in lines
+    assert 'Добыча 3 75.0% 0.0%' in lines
+    assert '- 1 25.0% 100.0%' in lines
+    assert '2021-01-31 3 75.0% 33.3%' in lines
+    assert '2021-02-01 1 25.0% 0.0%' in lines
+
+    stdout = io.StringIO()
+    call_command('analytics_report', '--platform', 'alice', '--top', '1', stdout=stdout)
+    lines = [' '.join(line.split()) for line in stdout.getvalue().splitlines()]
+    assert lines[0] == 'Реплик: 2, необработано: 1 (50.0%), пользователей: 2, сессий: 2'
+    assert [line for line in lines if line.startswith(('Добыча', 'Инциденты'))] == ['Добыча 1 50.0% 0.0%']
@@ -0,0 +1,87 @@
+import asyncio
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from config.asgi import application
+from info import views
+from info.bench.webhook import PAYLOADS_DIR
+
+CONCURRENT_REQUESTS = 6
+HANDLER_SECONDS = 0.3
+
+
+def http_scope(path, body):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'POST',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': b'',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+
+
+async def call(path, body):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(http_scope(path, body), receive, send)
+    return messages[0]['status']
+
+
+def test_middleware_is_async_capable():
+    # Синхронный middleware переводит всю цепочку и async view в один поток.
+    for path in settings.MIDDLEWARE:
+        assert getattr(import_string(path), 'async_capable', False), path
+
+
+def test_concurrent_webhook_calls_overlap(monkeypatch, settings):
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.METRICS_ENABLED = False
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(msg, view):  # noqa: U100
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(HANDLER_SECONDS)
+        in_flight -= 1
+        return {'fulfillmentText': 'ok'}
+
+    async def push(data):  # noqa: U100
+        pass
+
+    monkeypatch.setattr(views, 'amessages_handler', handler)
+    monkeypatch.setattr(views.analytics, 'apush', push)
+    body = (PAYLOADS_DIR / 'telegram.json').read_bytes()
+
+    async def main():
+        return await asyncio.gather(*(call('/srv/info/webhook', body) for _ in range(CONCURRENT_REQUESTS)))
+
+    loop = asyncio.new_event_loop()
+    try:
+        started = loop.time()
+        statuses = loop.run_until_complete(main())
+        elapsed = loop.time() - started
+    finally:
+        loop.close()
+    assert statuses == [200] * CONCURRENT_REQUESTS
+    assert max_in_flight == CONCURRENT_REQUESTS
+    assert elapsed < HANDLER_SECONDS * CONCURRENT_REQUESTS / 2
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from info.bench import webhook
+
+
+def make_results(timings):
+    return {
+        'meta': {'python': '3.11.7', 'implementation': 'CPython', 'machine': 'x86_64', 'django': '3.2', 'pydantic': '1.10'},
+        'results': {'alice': {stage: {'min_us': low, 'median_us': median} for stage, (low, median) in timings.items()}},
+    }
+
+
+@pytest.mark.parametrize('current, regression', [
+    # Медиана выросла из-за шума, лучший повтор как в базе.
+    ((10.0, 14.0), False),
+    ((12.4, 13.0), False),
+    ((12.6, 13.0), True),
+])
+def test_compare_uses_best_repeat_against_baseline_median(current, regression):
+    baseline = make_results({'parse_raw': (9.0, 10.0)})
+    [row] = webhook.compare(make_results({'parse_raw': current}), baseline)
+    assert row['regression'] is regression
+    assert row['baseline_us'] == 10.0
+
+
+def test_compare_ignores_small_absolute_delta():
+    baseline = make_results({'detect_client': (0.15, 0.18), 'analytics_data': (1.2, 1.35)})
+    current = make_results({'detect_client': (0.3, 0.3), 'analytics_data': (1.9, 2.1)})
+    rows = {row['stage']: row for row in webhook.compare(current, baseline, floor_us=0.5)}
+    assert not rows['detect_client']['regression']
+    assert rows['analytics_data']['regression']
+
+
+def test_compare_skips_stages_missing_in_baseline():
+    baseline = make_results({'parse_raw': (9.0, 10.0)})
+    current = make_results({'parse_raw': (9.0, 10.0), 'parse_raw_lazy': (50.0, 60.0)})
+    assert [row['stage'] for row in webhook.compare(current, baseline)] == ['parse_raw']
+
+
+def test_baseline_covers_all_stages():
+    with open(webhook.BASELINE_PATH, encoding='utf-8') as stream:
+        baseline = json.load(stream)
+    payloads = webhook.load_payloads()
+    assert set(baseline['results']) == set(payloads)
+    for name, body in payloads.items():
+        assert set(baseline['results'][name]) == {stage for stage, _ in webhook.get_stages(body)}
@@ -0,0 +1,101 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+
+from info.models import Incident, Mining
+from info.tools import cache
+from info.tools.services import BaseIntentHandler
+
+
+class CountingHandler(BaseIntentHandler):
+    _intent_name = 'test.cache.intent'
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.queries = 0
+
+    def _get_params(self, params):
+        return params
+
+    def _get_cache_scope(self, params):  # noqa: U100
+        return self.scope
+
+    def _get_query_to_db(self, params):  # noqa: U100
+        self.queries += 1
+        return self.queries
+
+    def _create_response(self, data):
+        return f'answer {data}'
+
+
+def test_bump_invalidates_only_its_scope():
+    first, second = cache.get_data_version(1), cache.get_data_version(2)
+    everything = cache.get_data_version()
+    assert cache.get_data_version(1) == first
+    cache.bump_data_version([1])
+    assert cache.get_data_version(1) != first
+    assert cache.get_data_version(2) == second
+    # Общая версия меняется при любом изменении данных.
+    assert cache.get_data_version() != everything
+
+    first, everything = cache.get_data_version(1), cache.get_data_version()
+    cache.bump_data_version()
+    assert cache.get_data_version(1) == first
+    assert cache.get_data_version() != everything
+
+
+def test_structure_bump_invalidates_everything():
+    versions = [cache.get_data_version(1), cache.get_data_version(), cache.get_structure_version()]
+    cache.bump_structure_version()
+    assert all(
+        old != new
+        for old, new in zip(versions, [cache.get_data_version(1), cache.get_data_version(), cache.get_structure_version()])
+    )
+
+
+def test_answer_key_canonical_params():
+    key = cache.get_answer_key('intent', {'oilfield': ' Северное  Поле', 'date': '', 'period': {'b': 1, 'a': [2]}})
+    assert key == cache.get_answer_key('intent', {'period': {'a': [2], 'b': 1}, 'oilfield': 'северное поле'})
+    assert key != cache.get_answer_key('other', {'period': {'a': [2], 'b': 1}, 'oilfield': 'северное поле'})
+    assert key != cache.get_answer_key('intent', {'period': {'a': [2], 'b': 1}, 'oilfield': 'южное'})
+
+
+def test_answer_cached_until_scope_bumped():
+    handler = CountingHandler(scope=1)
+    assert handler._get_answer({'oilfield': 'Северное'}) == 'answer 1'
+    assert handler._get_answer({'oilfield': ' северное'}) == 'answer 1'
+    cache.bump_data_version([2])
+    assert handler._get_answer({'oilfield': 'Северное'}) == 'answer 1'
+    cache.bump_data_version([1])
+    assert handler._get_answer({'oilfield': 'Северное'}) == 'answer 2'
+    assert handler.queries == 2
+
+
+@pytest.mark.django_db()
+def test_signals_bump_versions_on_commit(wells, django_capture_on_commit_callbacks):
+    north, _, south = wells
+    versions = {
+        oilfield_id: cache.get_data_version(oilfield_id)
+        for oilfield_id in (north.oilfield_id, south.oilfield_id, None)
+    }
+    with django_capture_on_commit_callbacks() as callbacks:
+        Mining.objects.create(well=north, mining_date=datetime.date(2021, 1, 30), mining_count=Decimal('1.5'))
+    # До фиксации транзакции версия не меняется: другие процессы еще не видят новых данных.
+    assert cache.get_data_version(north.oilfield_id) == versions[north.oilfield_id]
+    for callback in callbacks:
+        callback()
+    assert cache.get_data_version(north.oilfield_id) != versions[north.oilfield_id]
+    assert cache.get_data_version(south.oilfield_id) == versions[south.oilfield_id]
+    assert cache.get_data_version() != versions[None]
+
+    versions = {oilfield_id: cache.get_data_version(oilfield_id) for oilfield_id in versions}
+    with django_capture_on_commit_callbacks(execute=True):
+        Incident.objects.create(incident_date=datetime.date(2021, 1, 30), incident_count=1, incident_details='')
+    assert cache.get_data_version(north.oilfield_id) == versions[north.oilfield_id]
+    assert cache.get_data_version() != versions[None]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        south.oilfield.name = 'Южное-2'
+        south.oilfield.save()
+    assert cache.get_data_version(north.oilfield_id) != versions[north.oilfield_id]
@@ -0,0 +1,176 @@
+import collections
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from info.tools.chatbase import ChatbaseClient, CircuitOpenError
+
+Reply = collections.namedtuple('Reply', ['status', 'delay'])
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1, чтобы соединение оставалось открытым между запросами.
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):  # noqa: N802
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests.append(self.client_address[1])
+        reply = self.server.replies.popleft() if self.server.replies else Reply(200, 0)
+        time.sleep(reply.delay)
+        body = b'{"status": 200}'
+        self.send_response(reply.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # noqa: A002, U100
+        pass
+
+
+@pytest.fixture()
+def stub():
+    """
+    Локальный HTTP сервер вместо Chatbase API. replies - очередь ответов (статус, задержка),
+    requests - клиентские порты полученных запросов: по ним видно, новое ли соединение.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.replies = collections.deque()
+    server.requests = []
+    server.url = 'http://127.0.0.1:{0}/api/messages'.format(server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(**kwargs):
+    options = {'timeout': (1, 1), 'retries': 2, 'backoff_factor': 0, 'failure_threshold': 3, 'reset_timeout': 0.2}
+    options.update(kwargs)
+    return ChatbaseClient(**options)
+
+
+def post(client, stub):
+    return client.post(stub.url, data=b'[]', headers={'Content-Type': 'application/json'})
+
+
+def test_connection_reused(stub):
+    client = make_client()
+    for _ in range(3):
+        assert post(client, stub).status_code == 200
+    assert len(stub.requests) == 3
+    assert len(set(stub.requests)) == 1
+
+
+def test_retry_on_503(stub):
+    stub.replies.extend([Reply(503, 0), Reply(503, 0), Reply(200, 0)])
+    client = make_client()
+    assert post(client, stub).status_code == 200
+    assert len(stub.requests) == 3
+    assert client.breaker.failures == 0
+
+
+def test_retries_exhausted_return_last_response(stub):
+    stub.replies.extend([Reply(503, 0)] * 3)
+    client = make_client()
+    assert post(client, stub).status_code == 503
+    assert len(stub.requests) == 3
+    assert client.breaker.failures == 1
+
+
+def test_no_retry_on_read_timeout(stub):
+    stub.replies.append(Reply(200, 0.5))
+    client = make_client(timeout=(1, 0.1))
+    with pytest.raises(requests.ReadTimeout):
+        post(client, stub)
+    time.sleep(0.6)
+    assert len(stub.requests) == 1
+    assert client.breaker.failures == 1
+
+
+def test_breaker_opens_half_opens_and_closes(stub):
+    stub.replies.extend([Reply(503, 0)] * 3)
+    client = make_client(retries=0)
+    for _ in range(3):
+        assert post(client, stub).status_code == 503
+    # Цепь разомкнута: запрос не отправляется.
+    with pytest.raises(CircuitOpenError):
+        post(client, stub)
+    assert len(stub.requests) == 3
+
+    # После паузы проходит пробный запрос, ошибка сразу размыкает цепь снова.
+    time.sleep(0.25)
+    stub.replies.append(Reply(503, 0))
+    assert post(client, stub).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        post(client, stub)
+
+    # Успешный пробный запрос замыкает цепь.
+    time.sleep(0.25)
+    assert post(client, stub).status_code == 200
+    assert client.breaker.failures == 0
+    assert post(client, stub).status_code == 200
+    assert len(stub.requests) == 6
+
+
+def test_half_open_lets_one_trial_through(stub):
+    stub.replies.extend([Reply(503, 0)] * 3)
+    client = make_client(retries=0)
+    for _ in range(3):
+        post(client, stub)
+    time.sleep(0.25)
+    # Пробный запрос отвечает медленно: остальные вызовы в это время должны отклоняться.
+    stub.replies.append(Reply(200, 0.3))
+    results = []
+
+    def call():
+        try:
+            results.append(post(client, stub).status_code)
+        except CircuitOpenError:
+            results.append('open')
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results, key=str) == [200] + ['open'] * 4
+    assert len(stub.requests) == 4
+    # Пробный запрос успешен, цепь замкнута.
+    assert post(client, stub).status_code == 200
+
+
+def test_lost_trial_is_given_up_after_reset_timeout():
+    client = make_client(reset_timeout=0.1)
+    for _ in range(3):
+        client.breaker.record_failure()
+    time.sleep(0.15)
+    assert client.breaker.allow()
+    assert not client.breaker.allow()
+    # Результат пробного запроса не записан: через reset_timeout разрешается новый.
+    time.sleep(0.15)
+    assert client.breaker.allow()
+
+
+def test_session_recreated_after_fork(stub):
+    client = make_client()
+    assert post(client, stub).status_code == 200
+    session = client.session
+    pid = os.fork()
+    if pid == 0:
+        try:
+            recreated = client.session is not session and client.session is client.session
+            status = post(client, stub).status_code
+        finally:
+            os._exit(0 if recreated and status == 200 else 1)
+    _, exit_status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(exit_status) == 0
+    assert client.session is session
+    # Дочерний процесс открыл свое соединение, а не использовал соединение родителя.
+    assert len(set(stub.requests)) == 2
@@ -0,0 +1,116 @@
+import json
+
+from info.bench.webhook import PAYLOADS_DIR
+from info.tools import cache
+from info.tools.context import ConversationContext, get_conversation
+from info.tools.services import BaseIntentHandler, parse_request
+
+NAMES = ('oilfield', 'well', 'date', 'date-period')
+
+
+class RecordingHandler(BaseIntentHandler):
+    """
+    Запоминает параметры каждой реплики. Промежуточный результат хранится в состоянии диалога
+    и пересчитывается, если его нет или данные месторождения 1 изменились.
+    """
+    _intent_name = 'test.context.intent'
+    _cacheable = False
+
+    def __init__(self):
+        self.params = []
+        self.queries = 0
+
+    def _get_params(self, params):
+        self.params.append(params)
+        return params
+
+    def _get_query_to_db(self, params):  # noqa: U100
+        conversation = get_conversation()
+        result = conversation.get_result('total', oilfield_id=1)
+        if result is None:
+            self.queries += 1
+            result = self.queries
+            conversation.set_result('total', result, oilfield_id=1)
+        return result
+
+    def _create_response(self, data):
+        return f'answer {data}'
+
+
+def turn(handler, name, parameters, new_session=False):
+    body = json.loads((PAYLOADS_DIR / f'{name}.json').read_bytes())
+    body['queryResult']['parameters'] = parameters
+    if name == 'alice':
+        body['originalDetectIntentRequest']['payload']['session']['new'] = new_session
+    return handler.handle(parse_request(json.dumps(body)))
+
+
+def test_fill_carries_missing_params():
+    context = ConversationContext('session', 60)
+    period = {'startDate': '2021-05-01', 'endDate': '2021-05-31'}
+    assert context.fill({'oilfield': 'Северное', 'date-period': period, 'intent': 'x'}, NAMES) == {
+        'oilfield': 'Северное', 'date-period': period, 'intent': 'x',
+    }
+    assert context.params == {'oilfield': 'Северное', 'date-period': period}
+    assert context._changed
+
+    # Пустые значения Dialogflow означают, что параметр не указан в реплике.
+    context._changed = False
+    assert context.fill({'oilfield': '', 'well': [], 'date-period': {}}, NAMES) == {
+        'oilfield': 'Северное', 'well': [], 'date-period': period,
+    }
+    assert context.fill({'oilfield': ' Северное '}, NAMES)['date-period'] == period
+    assert not context._changed
+
+    assert context.fill({'oilfield': 'Южное', 'date-period': ''}, NAMES) == {'oilfield': 'Южное', 'date-period': period}
+    assert context.params['oilfield'] == 'Южное'
+    assert context._changed
+    # Параметры, не переносимые между репликами, не запоминаются.
+    assert context.fill({'intent': 'y'}, ('oilfield',)) == {'intent': 'y', 'oilfield': 'Южное'}
+    assert 'intent' not in context.params
+
+
+def test_result_invalidated_by_data_version():
+    context = ConversationContext('session', 60)
+    context.set_result('north', 10, oilfield_id=1)
+    context.set_result('total', 30)
+    assert (context.get_result('north', oilfield_id=1), context.get_result('total')) == (10, 30)
+    assert context.get_result('unknown') is None
+
+    cache.bump_data_version([2])
+    assert context.get_result('north', oilfield_id=1) == 10
+    # Результат без месторождения зависит от всех данных.
+    assert context.get_result('total') is None
+
+    cache.bump_data_version([1])
+    assert context.get_result('north', oilfield_id=1) is None
+
+    context.set_result('north', 11, oilfield_id=1)
+    assert context.get_result('north', oilfield_id=1) == 11
+    cache.bump_structure_version()
+    assert context.get_result('north', oilfield_id=1) is None
+
+
+def test_handle_keeps_state_between_turns():
+    handler = RecordingHandler()
+    period = {'startDate': '2021-05-01', 'endDate': '2021-05-31'}
+    assert turn(handler, 'telegram', {'oilfield': 'Северное', 'date-period': period}) == 'answer 1'
+    assert turn(handler, 'telegram', {'oilfield': '', 'date-period': ''}) == 'answer 1'
+    assert handler.params[-1] == {'oilfield': 'Северное', 'date-period': period}
+
+    cache.bump_data_version([2])
+    assert turn(handler, 'telegram', {}) == 'answer 1'
+    cache.bump_data_version([1])
+    assert turn(handler, 'telegram', {}) == 'answer 2'
+    assert handler.params[-1] == {'oilfield': 'Северное', 'date-period': period}
+
+
+def test_new_alice_session_starts_empty():
+    handler = RecordingHandler()
+    assert turn(handler, 'alice', {'oilfield': 'Северное'}) == 'answer 1'
+    assert turn(handler, 'alice', {'oilfield': ''}) == 'answer 1'
+    assert handler.params[-1] == {'oilfield': 'Северное'}
+    assert turn(handler, 'alice', {'oilfield': ''}, new_session=True) == 'answer 2'
+    assert handler.params[-1] == {'oilfield': ''}
+    # Сессия Telegram хранится отдельно от сессии Алисы.
+    assert turn(handler, 'telegram', {}) == 'answer 3'
@@ -0,0 +1,89 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+
+from info.models import Employee, Incident, Mining, OilField, ProductionRollup, Task, Well
+from info.tools import rollups
+from info.tools.dataset import DatasetGenerator
+
+pytestmark = pytest.mark.django_db
+
+END_DATE = datetime.date(2021, 12, 31)
+
+
+def generate(seed, **kwargs):
+    generator = DatasetGenerator(oilfields=2, wells=2, years=1, employees=3, seed=seed, end_date=END_DATE, **kwargs)
+    generator.run()
+    return generator
+
+
+def snapshot():
+    """
+    Содержимое набора без первичных ключей, которые меняются при повторной генерации.
+    """
+    readings = {
+        metric: list(model.objects.filter(well__oilfield__name__startswith='synthetic-').order_by(
+            'well__ident_number', rollups.READINGS[model].date_field,
+        ).values_list('well__ident_number', rollups.READINGS[model].date_field, rollups.READINGS[model].value_field))
+        for metric, model in rollups.METRIC_MODELS.items()
+    }
+    return {
+        'wells': list(Well.objects.filter(oilfield__name__startswith='synthetic-').order_by('ident_number').values_list(
+            'oilfield__name', 'ident_number', 'well_type', 'well_status', 'asurg',
+        )),
+        'readings': readings,
+        'rollups': list(ProductionRollup.objects.filter(oilfield__name__startswith='synthetic-').order_by(
+            'metric', 'period', 'period_start', 'oilfield__name', 'well__ident_number',
+        ).values_list('metric', 'period', 'period_start', 'oilfield__name', 'well__ident_number', 'total', 'readings')),
+        'incidents': sorted(Incident.objects.values_list('incident_date', 'incident_count', 'incident_details')),
+        'employees': sorted(Employee.objects.values_list('email', 'first_name', 'last_name', 'phone_number')),
+        'tasks': sorted(Task.objects.values_list('task_date', 'id_employee__email', 'task_details')),
+    }
+
+
+def test_same_seed_and_end_date_reproduce_dataset():
+    generator = generate(seed=1)
+    assert generator.rows == 2 * 2 * 365 * 3
+    assert (generator.start_date, generator.end_date) == (datetime.date(2021, 1, 1), END_DATE)
+    first = snapshot()
+    assert len(first['readings'][ProductionRollup.Metric.MINING]) == 2 * 2 * 365
+
+    generator.clear()
+    generate(seed=1, use_copy=False)
+    assert snapshot() == first
+
+    generator.clear()
+    generate(seed=2)
+    assert snapshot() != first
+
+
+def test_clear_keeps_other_data(wells):
+    north = wells[0]
+    Mining.objects.create(well=north, mining_date=datetime.date(2021, 1, 30), mining_count=Decimal('1.5'))
+    kept = list(ProductionRollup.objects.values_list('metric', 'period', 'period_start', 'oilfield_id', 'well_id', 'total'))
+    generator = generate(seed=1)
+    generator.clear()
+    assert not OilField.objects.filter(name__startswith='synthetic-').exists()
+    assert not Well.objects.filter(ident_number__startswith='synthetic-').exists()
+    assert not Employee.objects.exists()
+    assert not Incident.objects.exists()
+    assert not Task.objects.exists()
+    assert list(Mining.objects.values_list('well_id', 'mining_count')) == [(north.pk, Decimal('1.5'))]
+    assert list(
+        ProductionRollup.objects.values_list('metric', 'period', 'period_start', 'oilfield_id', 'well_id', 'total'),
+    ) == kept
+
+
+def test_delete_without_rollups_refresh(wells):
+    north, other, south = wells
+    Mining.objects.bulk_create([
+        Mining(well=well, mining_date=datetime.date(2021, 1, 30), mining_count=Decimal('1.5'))
+        for well in (north, other, south)
+    ])
+    rollup_count = ProductionRollup.objects.count()
+    deleted = Mining.objects.filter(well__oilfield_id=north.oilfield_id).delete(refresh_rollups=False)
+    assert deleted == (2, {'info.Mining': 2})
+    assert list(Mining.objects.values_list('well_id', flat=True)) == [south.pk]
+    # Агрегаты не изменяются, вызывающий код пересчитывает их сам.
+    assert ProductionRollup.objects.count() == rollup_count
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+from django.db import connection, connections
+
+from info.models import OilField
+from info.tools import db
+
+# Соединение с тестовой базой SQLite в памяти не закрывается, иначе база будет потеряна.
+postgresql_only = pytest.mark.skipif(connection.vendor == 'sqlite', reason='in-memory SQLite ignores close')
+
+
+def in_thread(func):
+    """
+    Выполняет func в отдельном потоке и возвращает соединение этого потока. Поток завершается,
+    как простаивающий поток пула, который больше не получит работы.
+    """
+    result = {}
+
+    def run():
+        func()
+        result['connection'] = connections['default']
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    return result['connection']
+
+
+def request():
+    db.prepare_connections()
+    OilField.objects.exists()
+    db.release_connections()
+
+
+@postgresql_only
+@pytest.mark.django_db(transaction=True)
+def test_idle_connection_of_other_thread_is_closed():
+    idle = in_thread(request)
+    assert idle.connection is not None
+    # Простой меньше DATABASE_CONN_MAX_IDLE: соединение остается открытым.
+    assert db.close_idle_connections() == 0
+    assert db.close_idle_connections(0) == 1
+    assert idle.connection is None
+    assert db.close_idle_connections(0) == 0
+
+
+@postgresql_only
+@pytest.mark.django_db(transaction=True)
+def test_busy_connection_is_not_closed():
+    def nested_request():
+        db.prepare_connections()
+        request()
+        OilField.objects.exists()
+
+    busy = in_thread(nested_request)
+    # Внешний запрос не завершен: соединение используется, хотя вложенный уже освободил его.
+    assert db.close_idle_connections(0) == 0
+    assert busy.connection is not None
+    busy.inc_thread_sharing()
+    busy.close()
+    busy.dec_thread_sharing()
+
+
+@postgresql_only
+@pytest.mark.django_db(transaction=True)
+def test_fork_closes_connections_of_all_threads():
+    idle = in_thread(request)
+    OilField.objects.exists()
+    db._close_before_fork()
+    assert idle.connection is None
+    assert connection.connection is None
+
+
+@pytest.mark.django_db()
+def test_connections_in_transaction_are_kept():
+    OilField.objects.create(name='Северное')
+    # Тестовая транзакция: проверка соединений после запроса не должна ее закрыть.
+    db.release_connections()
+    db.prepare_connections()
+    assert OilField.objects.count() == 1
+    db.release_connections()
@@ -0,0 +1,104 @@
+import asyncio
+import csv
+import datetime
+import io
+import json
+import time
+from decimal import Decimal
+
+import pytest
+from django.http import StreamingHttpResponse
+
+from config.asgi import django_application
+from info.models import Mining, Urgg
+from info.tools.exporter import FIELDS, PrefetchIterator
+from info.tools.importer import ReadingImporter, read_csv, read_ndjson
+
+
+@pytest.fixture()
+def readings(wells):
+    north, _, south = wells
+    Mining.objects.bulk_create([
+        Mining(well=north, mining_date=datetime.date(2021, 1, 30), mining_count=Decimal('1.5')),
+        Mining(well=south, mining_date=datetime.date(2021, 1, 31), mining_count=Decimal('2.25')),
+    ])
+    Urgg.objects.create(well=north, urgg_date=datetime.date(2021, 2, 1), urgg_count=Decimal('3'))
+
+
+def export(client, **params):
+    response = client.get('/srv/info/export', params)
+    assert response.status_code == 200
+    assert response.streaming
+    return response, b''.join(response.streaming_content).decode()
+
+
+# Строки читаются в потоке-производителе, ему нужны зафиксированные данные.
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures('readings')
+def test_export_csv(admin_client):
+    response, content = export(admin_client, format='csv', metric='mining')
+    assert response['Content-Type'] == 'text/csv; charset=utf-8'
+    assert response['Content-Disposition'] == 'attachment; filename="readings.csv"'
+    assert list(csv.reader(io.StringIO(content))) == [
+        list(FIELDS),
+        ['101', '2021-01-30', '1.500', 'mining', 'Северное'],
+        ['201', '2021-01-31', '2.250', 'mining', 'Южное'],
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures('readings')
+def test_export_ndjson_filters(admin_client):
+    response, content = export(admin_client, format='ndjson', well='101', start='2021-01-31')
+    assert response['Content-Type'] == 'application/x-ndjson; charset=utf-8'
+    assert [json.loads(line) for line in content.splitlines()] == [
+        {'well': '101', 'date': '2021-02-01', 'value': '3.000', 'metric': 'urgg', 'oilfield': 'Северное'},
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures('readings')
+def test_export_round_trips_through_import(admin_client):
+    _, csv_content = export(admin_client, format='csv')
+    _, ndjson_content = export(admin_client, format='ndjson')
+    expected = set(Mining.objects.values_list('well_id', 'mining_date', 'mining_count'))
+    for rows in (read_csv(io.StringIO(csv_content)), read_ndjson(io.StringIO(ndjson_content))):
+        Mining.objects.all().delete()
+        Urgg.objects.all().delete()
+        stats = ReadingImporter(use_copy=False).run(rows)
+        assert (stats.imported, stats.skipped) == (3, 0)
+        assert set(Mining.objects.values_list('well_id', 'mining_date', 'mining_count')) == expected
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_rejects_bad_parameters(admin_client):
+    assert admin_client.get('/srv/info/export', {'format': 'xml'}).status_code == 400
+    assert admin_client.get('/srv/info/export', {'metric': 'oil'}).status_code == 400
+    assert admin_client.get('/srv/info/export', {'start': '30.01.2021'}).status_code == 400
+
+
+def test_streaming_response_does_not_block_event_loop():
+    def lines():
+        for number in range(5):
+            time.sleep(0.05)
+            yield f'{number}\n'
+
+    response = StreamingHttpResponse(PrefetchIterator(lines(), lines_per_block=1))
+    messages = []
+    ticks = 0
+
+    async def send(message):
+        messages.append(message)
+
+    async def main():
+        nonlocal ticks
+        sending = asyncio.ensure_future(django_application.send_response(response, send))
+        while not sending.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        await sending
+
+    asyncio.run(main())
+    assert b''.join(message.get('body', b'') for message in messages) == b'0\n1\n2\n3\n4\n'
+    # Пока поток-производитель готовит строки, цикл событий обслуживает другие задачи.
+    assert ticks >= 10
@@ -0,0 +1,150 @@
+import datetime
+import io
+from decimal import Decimal
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from info.models import Mining, OilField, Urgg, Well
+from info.tests.utils import assert_rollups_match
+from info.tools import rollups
+from info.tools.importer import ReadingImporter, read_csv, read_ndjson
+
+pytestmark = pytest.mark.django_db
+
+USE_COPY = [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(connection.vendor != 'postgresql', reason='COPY requires PostgreSQL')),
+]
+
+FIRST_FILE = '''well,date,value,metric
+101,2021-01-30,1.5,mining
+102,2021-01-30,2.5,mining
+201,2021-01-31,3.5,mining
+101,2021-01-31,4.5,urgg
+101,2021-01-30,9.5,mining
+'''
+
+# Пересекается с FIRST_FILE: два показания заменяются, одно добавляется.
+SECOND_FILE = '''well,date,value,metric
+102,2021-01-30,20.5,mining
+201,2021-01-31,30.5,mining
+201,2021-02-01,5.5,mining
+'''
+
+
+def import_csv(text, **kwargs):
+    return ReadingImporter(**kwargs).run(read_csv(io.StringIO(text)))
+
+
+def mining_values():
+    return {
+        (ident_number, date): value
+        for ident_number, date, value in Mining.objects.values_list('well__ident_number', 'mining_date', 'mining_count')
+    }
+
+
+@pytest.mark.parametrize('use_copy', USE_COPY)
+@pytest.mark.parametrize('chunk_size', [2, 5000])
+@pytest.mark.usefixtures('wells')
+def test_import_deduplicates_and_upserts(use_copy, chunk_size):
+    stats = import_csv(FIRST_FILE, chunk_size=chunk_size, use_copy=use_copy)
+    assert stats.skipped == 0
+    # Повтор скважины и даты в файле, в той же части или в следующей: остается последнее значение.
+    assert mining_values() == {
+        ('101', datetime.date(2021, 1, 30)): Decimal('9.5'),
+        ('102', datetime.date(2021, 1, 30)): Decimal('2.5'),
+        ('201', datetime.date(2021, 1, 31)): Decimal('3.5'),
+    }
+    assert Urgg.objects.get().urgg_count == Decimal('4.5')
+    assert_rollups_match(Mining)
+    assert_rollups_match(Urgg)
+
+    import_csv(SECOND_FILE, chunk_size=chunk_size, use_copy=use_copy)
+    assert mining_values() == {
+        ('101', datetime.date(2021, 1, 30)): Decimal('9.5'),
+        ('102', datetime.date(2021, 1, 30)): Decimal('20.5'),
+        ('201', datetime.date(2021, 1, 31)): Decimal('30.5'),
+        ('201', datetime.date(2021, 2, 1)): Decimal('5.5'),
+    }
+    assert_rollups_match(Mining)
+    assert_rollups_match(Urgg)
+
+
+@pytest.mark.parametrize('use_copy', USE_COPY)
+@pytest.mark.usefixtures('wells')
+def test_chunks_update_rollups_incrementally(monkeypatch, use_copy):
+    def rebuild(*args, **kwargs):  # noqa: U100
+        raise AssertionError('rebuild is not expected')
+
+    # Пересчет каждой части по всем показателям затронутых месяцев дает квадратичное время загрузки.
+    monkeypatch.setattr(rollups, 'rebuild', rebuild)
+    days = [datetime.date(2021, month, day) for day in (1, 15) for month in range(1, 13)]
+    lines = [f'{well},{day.isoformat()},{index}.1255,mining' for index, day in enumerate(days) for well in ('101', '201')]
+    import_csv('well,date,value,metric\n' + '\n'.join(lines), chunk_size=5, use_copy=use_copy)
+    replaced = [line.replace('.1255', '.5') for line in reversed(lines[::3])]
+    import_csv('well,date,value,metric\n' + '\n'.join(replaced), chunk_size=5, use_copy=use_copy)
+    assert Mining.objects.count() == len(lines)
+    # Значение округляется до точности поля так же, как при сохранении.
+    assert Mining.objects.get(well__ident_number='201', mining_date=days[0]).mining_count == Decimal('0.126')
+    assert Mining.objects.get(well__ident_number='101', mining_date=days[0]).mining_count == Decimal('0.5')
+    assert_rollups_match(Mining)
+
+
+@pytest.mark.usefixtures('wells')
+def test_import_skips_bad_rows():
+    Well.objects.create(ident_number='101', oilfield=OilField.objects.create(name='Западное'))
+    text = '''well,date,value,metric
+101,2021-01-30,1.5,mining
+999,2021-01-30,1.5,mining
+102,2021-13-01,1.5,mining
+102,2021-01-30,abc,mining
+102,2021-01-30,1.5,unknown
+201,2021-01-30,1.5,mining
+'''
+    stats = import_csv(text)
+    assert (stats.imported, stats.skipped) == (1, 5)
+    assert [error.split(':')[0] for error in stats.errors] == ['1', '2', '3', '4', '5']
+    assert_rollups_match(Mining)
+
+
+@pytest.mark.parametrize('use_copy', USE_COPY)
+@pytest.mark.usefixtures('wells')
+def test_failure_keeps_committed_chunks_consistent(use_copy):
+    def rows():
+        yield from read_csv(io.StringIO(FIRST_FILE))
+        raise ValueError('broken file')
+
+    with pytest.raises(ValueError, match='broken file'):
+        ReadingImporter(chunk_size=2, use_copy=use_copy).run(rows())
+    # Две полные части загружены и учтены в агрегатах, последняя неполная часть не записана.
+    assert Mining.objects.count() + Urgg.objects.count() == 4
+    assert_rollups_match(Mining)
+    assert_rollups_match(Urgg)
+
+
+@pytest.mark.parametrize('skip_rollups', [False, True])
+@pytest.mark.usefixtures('wells')
+def test_command_reports_failure(tmp_path, skip_rollups):
+    path = tmp_path / 'readings.ndjson'
+    path.write_text(
+        '{"well": "101", "date": "2021-01-30", "value": 1.5}\n'
+        '{"well": "102", "date": "2021-01-30", "value": 2.5}\n'
+        '{"well": "201", "date": \n',
+        encoding='utf-8',
+    )
+    args = [str(path), '--metric', 'mining', '--chunk-size', '2', '--no-copy']
+    if skip_rollups:
+        args.append('--skip-rollups')
+    with pytest.raises(CommandError, match='Сохранено строк: 2') as error:
+        call_command('import_readings', *args, stdout=io.StringIO())
+    assert ('rebuild_rollups' in str(error.value)) == skip_rollups
+    assert Mining.objects.count() == 2
+    if not skip_rollups:
+        assert_rollups_match(Mining)
+
+
+def test_read_ndjson_skips_blank_lines():
+    rows = list(read_ndjson(io.StringIO('{"well": "101"}\n\n{"well": "102"}\n')))
+    assert rows == [{'well': '101'}, {'well': '102'}]
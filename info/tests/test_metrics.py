@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from info.tools import metrics
+
+
+class HashClient:
+    """
+    Хеш METRICS_KEY в памяти: команды, которые выполняют Histograms.flush и render.
+    """
+
+    def __init__(self):
+        self.hash = {}
+
+    def pipeline(self, transaction=True):  # noqa: U100
+        return self
+
+    def hincrby(self, key, field, amount):  # noqa: U100
+        field = field.encode()
+        self.hash[field] = int(self.hash.get(field, 0)) + amount
+
+    def hincrbyfloat(self, key, field, amount):  # noqa: U100
+        field = field.encode()
+        self.hash[field] = float(self.hash.get(field, 0)) + amount
+
+    def execute(self):
+        pass
+
+    def hgetall(self, key):  # noqa: U100
+        return {field: str(value).encode() for field, value in self.hash.items()}
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    client = HashClient()
+    monkeypatch.setattr(metrics, 'get_client', lambda: client)
+    monkeypatch.setattr(metrics, 'histograms', metrics.Histograms())
+    return client
+
+
+@pytest.mark.usefixtures('client')
+def test_render_accepts_any_label_characters():
+    metrics.histograms.observe(('handler', 'Добыча | месяц', 'a"b'), 0.002)
+    metrics.histograms.observe(('handler', 'Добыча | месяц', 'a"b'), 0.02)
+    text = metrics.render()
+    assert (
+        'webhook_stage_seconds_count{stage="handler",intent="Добыча | месяц",platform="a\\"b"} 2'
+        in text.splitlines()
+    )
+    assert 'webhook_stage_seconds_bucket{stage="handler",intent="Добыча | месяц",platform="a\\"b",le="0.0025"} 1' in text
+
+
+def test_render_skips_malformed_fields(client):
+    client.hash[b'handler|intent|alice|0'] = 1
+    client.hash[b'["handler", "intent"]'] = 1
+    metrics.histograms.observe(('request', '', 'alice'), 0.01)
+    lines = [line for line in metrics.render().splitlines() if line.startswith('webhook_stage_seconds_count')]
+    assert lines == ['webhook_stage_seconds_count{stage="request",intent="",platform="alice"} 1']
+
+
+@pytest.mark.usefixtures('client')
+def test_timed_records_request_stages(settings):
+    settings.METRICS_ENABLED = True
+
+    @metrics.timed
+    async def view(request):  # noqa: U100
+        with metrics.stage('parse'):
+            metrics.set_labels(intent='Добыча', platform='telegram')
+        return HttpResponse()
+
+    asyncio.run(view(RequestFactory().post('/info/webhook')))
+    stages = {labels[0] for labels in metrics.histograms._data}
+    assert stages == {'parse', 'request'}
+    assert {labels[1:] for labels in metrics.histograms._data} == {('Добыча', 'telegram')}
@@ -0,0 +1,43 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from info.tests.utils import assert_rollups_match
+
+BEFORE_ROLLUPS = [('info', '0004_alter_well_oilfield')]
+
+
+def migrate(targets=None):
+    executor = MigrationExecutor(connection)
+    executor.migrate(targets or executor.loader.graph.leaf_nodes())
+    return executor.loader.project_state(targets).apps if targets else None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rollups_backfilled_for_existing_readings(caplog):
+    apps = migrate(BEFORE_ROLLUPS)
+    try:
+        oilfield = apps.get_model('info', 'OilField').objects.create(name='Северное')
+        well = apps.get_model('info', 'Well').objects.create(ident_number='101', oilfield=oilfield)
+        mining = apps.get_model('info', 'Mining')
+        mining.objects.create(well=well, mining_date=datetime.date(2021, 1, 30), mining_count=Decimal('10.5'))
+        mining.objects.create(well=well, mining_date=datetime.date(2021, 2, 1), mining_count=Decimal('4.5'))
+        # Повтор за день: 0006 оставляет последнее показание и вычитает удаленное из агрегатов.
+        urgg = apps.get_model('info', 'Urgg')
+        urgg.objects.create(well=well, urgg_date=datetime.date(2021, 1, 30), urgg_count=Decimal('1.5'))
+        urgg.objects.create(well=well, urgg_date=datetime.date(2021, 1, 30), urgg_count=Decimal('2.5'))
+    finally:
+        migrate()
+
+    from info.models import Mining, OilField, Urgg
+
+    oilfield = OilField.objects.get()
+    start, end = datetime.date(2021, 1, 1), datetime.date(2021, 12, 31)
+    assert oilfield.get_mining_for_date_period(start, end) == Decimal('15')
+    assert oilfield.get_urgg_for_date_period(start, end) == Decimal('2.5')
+    assert_rollups_match(Mining)
+    assert_rollups_match(Urgg)
+    assert 'Urgg: удалено повторяющихся показаний скважин за день: 1' in caplog.messages
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import pytest
+from django.test import AsyncClient
+
+from info import views
+from info.bench.webhook import PAYLOADS_DIR
+from info.tools.platforms import AliceView, DialogflowView, TelegramView, get_platform_view
+from info.tools.services import parse_request
+
+
+def load_payload(name):
+    return json.loads((PAYLOADS_DIR / f'{name}.json').read_bytes())
+
+
+def telegram_request(**sender):
+    body = load_payload('telegram')
+    body['originalDetectIntentRequest']['payload']['data']['from'] = sender
+    return body
+
+
+def test_telegram_optional_fields():
+    view = get_platform_view(parse_request(json.dumps(telegram_request(id='42'))))
+    assert isinstance(view, TelegramView)
+    assert view.uid == '42-.telegram_client'
+    assert view.text == 'сколько добыто на Уренгойском за май'
+
+
+def test_alice_button_pressed_without_command():
+    body = load_payload('alice')
+    payload = body['originalDetectIntentRequest']['payload']
+    payload['request'] = {'type': 'ButtonPressed', 'payload': {}}
+    view = get_platform_view(parse_request(json.dumps(body)))
+    assert isinstance(view, AliceView)
+    assert view.text == ''
+    assert view.conversation_id == f"alice:{payload['session']['session_id']}"
+
+
+def test_malformed_payload_keeps_common_fields():
+    body = load_payload('telegram')
+    body['originalDetectIntentRequest']['payload']['data'] = 'not an object'
+    view = get_platform_view(parse_request(json.dumps(body)))
+    assert (view.platform, view.uid, view.text) == ('telegram', '', '')
+    assert view.session_id == body['session']
+    assert isinstance(get_platform_view(parse_request(json.dumps(load_payload('dialogflow')))), DialogflowView)
+
+
+@pytest.fixture()
+def webhook_calls(monkeypatch, settings):
+    """
+    Вызов webhook без Redis и обработчиков намерений: возвращает статус ответа, записи аналитики
+    и представления запроса, переданные обработчику.
+    """
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.METRICS_ENABLED = False
+    pushed = []
+    handled = []
+
+    async def push(data):
+        pushed.append(data)
+
+    async def handler(msg, view):  # noqa: U100
+        handled.append(view)
+        return {'fulfillmentText': 'ok'}
+
+    monkeypatch.setattr(views.analytics, 'apush', push)
+    monkeypatch.setattr(views, 'amessages_handler', handler)
+
+    def call(body):
+        response = asyncio.run(AsyncClient().post('/srv/info/webhook', body, content_type='application/json'))
+        return response.status_code, pushed, handled
+
+    return call
+
+
+def test_webhook_without_language_code(webhook_calls):
+    status, pushed, handled = webhook_calls(telegram_request(id='42', first_name='Иван'))
+    assert status == 200
+    assert [data['user_id'] for data in pushed] == ['42-.telegram_client']
+    # Обработчик получает то же представление запроса, из которого получены данные аналитики.
+    assert [view.uid for view in handled] == ['42-.telegram_client']
+
+
+def test_analytics_failure_does_not_fail_reply(webhook_calls, monkeypatch):
+    def broken(msg, view):  # noqa: U100
+        raise ValueError('broken')
+
+    monkeypatch.setattr(views, 'get_analytics_data', broken)
+    status, pushed, handled = webhook_calls(load_payload('telegram'))
+    assert status == 200
+    assert pushed == []
+    assert len(handled) == 1
@@ -0,0 +1,85 @@
+import pytest
+from django.db import connection
+
+from info.models import Well
+from info.tools.profiler import QueryBudgetExceeded, _is_sqlite_scan, assert_intent_budget, query_budget
+from info.tools.services import BaseIntentHandler
+
+pytestmark = pytest.mark.django_db
+
+sqlite_only = pytest.mark.skipif(connection.vendor != 'sqlite', reason='EXPLAIN QUERY PLAN is SQLite-specific')
+
+
+class WellsHandler(BaseIntentHandler):
+    _intent_name = 'test.profiler.wells'
+    _query_budget = 1
+
+    def _get_params(self, params):
+        return params
+
+    def _get_query_to_db(self, params):
+        return [list(Well.objects.filter(pk=pk)) for pk in params['ids']]
+
+    def _create_response(self, data):  # noqa: U100
+        return ''
+
+
+def test_query_budget_pass(wells):
+    with query_budget(2) as profiler:
+        Well.objects.get(pk=wells[0].pk)
+        list(Well.objects.filter(oilfield_id=wells[0].oilfield_id))
+    assert profiler.count == 2
+    assert profiler.duplicates() == []
+
+
+def test_query_budget_failure_includes_report(wells):
+    with pytest.raises(QueryBudgetExceeded) as error:
+        with query_budget(1):
+            for well in wells:
+                Well.objects.get(pk=well.pk)
+    message = str(error.value)
+    assert message.startswith('3 queries, budget 1\n3 queries, ')
+    assert '1 duplicated' in message
+    # Отчет перечисляет каждый запрос с текстом SQL.
+    assert sum(line.startswith(f'{number}. ') for number in (1, 2, 3) for line in message.splitlines()) == 3
+    assert 'info_well' in message
+
+
+def test_assert_intent_budget(wells):
+    handler = WellsHandler()
+    profiler = assert_intent_budget(handler, {'ids': [wells[0].pk]}, allow_sequential_scans=True)
+    assert profiler.count == 1
+    with pytest.raises(QueryBudgetExceeded, match='2 queries, budget 1'):
+        assert_intent_budget(handler, {'ids': [wells[0].pk, wells[1].pk]}, allow_sequential_scans=True)
+    assert assert_intent_budget(handler, {'ids': []}, max_queries=0).count == 0
+
+    class Unbudgeted(WellsHandler):
+        _query_budget = None
+
+    with pytest.raises(ValueError, match='No query budget'):
+        assert_intent_budget(Unbudgeted(), {'ids': []})
+
+
+@pytest.mark.parametrize('plan, scan', [
+    ('2 0 0 SCAN info_well', True),
+    ('0 0 0 SCAN TABLE info_well', True),
+    ('2 0 0 SCAN info_well USING COVERING INDEX info_well_oilfield_id', False),
+    ('3 0 0 SEARCH info_well USING INTEGER PRIMARY KEY (rowid=?)', False),
+    ('3 0 0 SEARCH info_well USING INDEX info_well_oilfield_id (oilfield_id=?)\n5 0 0 SCAN info_oilfield', True),
+    ('Seq Scan on info_well', False),
+])
+def test_is_sqlite_scan(plan, scan):
+    assert _is_sqlite_scan(plan) is scan
+
+
+@sqlite_only
+def test_sequential_scan_detected_on_sqlite(wells):
+    with query_budget(1, allow_sequential_scans=False) as profiler:
+        Well.objects.get(pk=wells[0].pk)
+    assert profiler.sequential_scans() == []
+    assert 'SEARCH' in profiler.queries[0].plan
+
+    with pytest.raises(QueryBudgetExceeded, match='1 sequential scans') as error:
+        with query_budget(1, allow_sequential_scans=False):
+            list(Well.objects.filter(ident_number='101'))
+    assert 'SCAN info_well' in str(error.value)
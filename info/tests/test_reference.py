@@ -0,0 +1,66 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from info.models import OilField, Well
+from info.tools import reference
+from info.tools.reference import ReferenceCache, WellRef
+
+pytestmark = pytest.mark.django_db
+
+
+def count_queries(func):
+    with CaptureQueriesContext(connection) as queries:
+        value = func()
+    return value, len(queries)
+
+
+@pytest.fixture()
+def processes(monkeypatch, settings):
+    """
+    Справочные кэши двух процессов с общим кэшем Django. Модели обращаются к кэшу первого процесса.
+    """
+    settings.REFERENCE_VERSION_CHECK_INTERVAL = 60
+    local, other = ReferenceCache(), ReferenceCache()
+    monkeypatch.setattr(reference, 'reference_cache', local)
+    return local, other
+
+
+def test_model_lookups_use_reference_cache(wells, processes):
+    north, _, south = wells
+    local, _ = processes
+    oilfield = north.oilfield
+    assert count_queries(oilfield.get_well_ids) == ((north.pk, wells[1].pk), 1)
+    assert count_queries(oilfield.get_well_ids) == ((north.pk, wells[1].pk), 0)
+    assert list(oilfield.get_wells()) == [north, wells[1]]
+    assert count_queries(lambda: OilField.get_id_by_name('Южное')) == (south.oilfield_id, 1)
+    assert count_queries(lambda: OilField.get_id_by_name('Южное')) == (south.oilfield_id, 0)
+    ref = WellRef(south.pk, '201', south.oilfield_id, south.well_type, south.well_status)
+    assert Well.get_refs('201') == (ref,)
+    assert count_queries(lambda: Well.get_ref('201', south.oilfield_id)) == (ref, 0)
+    assert Well.get_ref('201', north.oilfield_id) is None
+    assert local.oilfield_id('Западное') is None
+
+
+def test_version_bump_invalidates_both_tiers(wells, processes, settings, django_capture_on_commit_callbacks):
+    north = wells[0]
+    local, other = processes
+    assert local.well_ids(north.oilfield_id) == (north.pk, wells[1].pk)
+    # Другой процесс получает значение из общего кэша, без запроса к базе.
+    assert count_queries(lambda: other.well_ids(north.oilfield_id)) == ((north.pk, wells[1].pk), 0)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        added = Well.objects.create(ident_number='103', oilfield=north.oilfield)
+    expected = (north.pk, wells[1].pk, added.pk)
+    # Процесс, изменивший справочник, видит изменение сразу: ключи обоих уровней содержат новую версию.
+    assert count_queries(lambda: local.well_ids(north.oilfield_id)) == (expected, 1)
+    # Другой процесс сверяет версию не чаще REFERENCE_VERSION_CHECK_INTERVAL и до этого отвечает из памяти.
+    assert count_queries(lambda: other.well_ids(north.oilfield_id)) == ((north.pk, wells[1].pk), 0)
+    settings.REFERENCE_VERSION_CHECK_INTERVAL = 0
+    assert count_queries(lambda: other.well_ids(north.oilfield_id)) == (expected, 0)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        north.oilfield.name = 'Новое'
+        north.oilfield.save()
+    assert other.oilfield_id('Северное') is None
+    assert local.oilfield_id('Новое') == north.oilfield_id
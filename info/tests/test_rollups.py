@@ -0,0 +1,132 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.db.models import Sum
+
+from info import tasks
+from info.models import GasDisposal, Mining, OilField, ProductionRollup, Urgg
+from info.tests.utils import actual_rollups, assert_rollups_match, new_reading
+from info.tools import rollups
+
+pytestmark = pytest.mark.django_db
+
+
+def create_readings(model, wells):
+    readings = []
+    for number, date in enumerate([datetime.date(2021, 1, 30), datetime.date(2021, 1, 31), datetime.date(2021, 2, 1)]):
+        for well in wells:
+            reading = new_reading(model, well, date, f'{number + 1}.{well.pk % 10}25')
+            reading.save()
+            readings.append(reading)
+    return readings
+
+
+@pytest.mark.parametrize('model', [Mining, Urgg, GasDisposal])
+def test_save_creates_rollups(model, wells):
+    create_readings(model, wells)
+    assert_rollups_match(model)
+
+
+@pytest.mark.parametrize('model', [Mining, Urgg])
+def test_update_value_date_and_well(model, wells):
+    readings = create_readings(model, wells)
+    reading = rollups.READINGS[model]
+    changed = readings[0]
+    setattr(changed, reading.value_field, Decimal('99.5'))
+    changed.save()
+    assert_rollups_match(model)
+    # Перенос показателя в другой месяц и на скважину другого месторождения.
+    setattr(changed, reading.date_field, datetime.date(2021, 3, 15))
+    changed.well = wells[2]
+    changed.save()
+    assert_rollups_match(model)
+
+
+@pytest.mark.parametrize('model', [Mining, GasDisposal])
+def test_delete_removes_empty_rollups(model, wells):
+    readings = create_readings(model, wells)
+    for reading in readings[:4]:
+        reading.delete()
+    assert_rollups_match(model)
+    for reading in readings[4:]:
+        reading.delete()
+    assert not ProductionRollup.objects.exists()
+
+
+@pytest.mark.parametrize('model', [Mining, Urgg])
+def test_bulk_create(model, wells):
+    create_readings(model, wells[:1])
+    model.objects.bulk_create([
+        new_reading(model, well, datetime.date(2021, 2, day), f'{day}.5')
+        for well in wells
+        for day in range(2, 6)
+    ])
+    assert_rollups_match(model)
+
+
+def test_move_well_to_other_oilfield(wells, django_capture_on_commit_callbacks, monkeypatch):
+    create_readings(Mining, wells)
+    monkeypatch.setattr(tasks.rebuild_rollups, 'delay', lambda **kwargs: tasks.rebuild_rollups(**kwargs))
+    moved = wells[0]
+    with django_capture_on_commit_callbacks(execute=True):
+        moved.oilfield = wells[2].oilfield
+        moved.save()
+    assert_rollups_match(Mining)
+
+
+def test_incremental_matches_rebuild(wells):
+    readings = create_readings(Mining, wells)
+    readings[1].delete()
+    readings[2].mining_count = Decimal('7.777')
+    readings[2].save()
+    incremental = actual_rollups(Mining)
+    rollups.rebuild()
+    assert actual_rollups(Mining) == incremental
+
+
+def raw_total(oilfield, start_date, end_date):
+    return Mining.objects.filter(
+        well__oilfield=oilfield,
+        mining_date__range=(start_date, end_date),
+    ).aggregate(Sum('mining_count'))['mining_count__sum']
+
+
+def test_production_matrix_single_query(wells, django_assert_num_queries):
+    north, _, south = wells
+    create_readings(Mining, wells)
+    new_reading(Urgg, north, datetime.date(2021, 1, 15), '2.5').save()
+    periods = {
+        'all': (None, datetime.date(2021, 12, 31)),
+        'january': (datetime.date(2021, 1, 1), datetime.date(2021, 1, 31)),
+        # Неполные месяцы на обеих границах считаются по дневным агрегатам.
+        'days': (datetime.date(2021, 1, 31), datetime.date(2021, 2, 1)),
+        'empty': (datetime.date(2020, 1, 1), datetime.date(2020, 12, 31)),
+    }
+    metrics = [ProductionRollup.Metric.MINING, ProductionRollup.Metric.URGG]
+    with django_assert_num_queries(1):
+        matrix = OilField.objects.order_by('pk').production_matrix(periods, metrics)
+    assert list(matrix) == [north.oilfield, south.oilfield]
+    for oilfield, by_period in matrix.items():
+        for label, (start_date, end_date) in periods.items():
+            assert by_period[label] == {
+                metric: oilfield.get_total_for_date_period(metric, start_date, end_date) for metric in metrics
+            }
+    days = periods['days']
+    assert matrix[north.oilfield]['days'][ProductionRollup.Metric.MINING] == raw_total(north.oilfield, *days)
+    assert matrix[south.oilfield]['january'][ProductionRollup.Metric.MINING] == raw_total(south.oilfield, *periods['january'])
+    assert matrix[north.oilfield]['all'][ProductionRollup.Metric.URGG] == Decimal('2.5')
+    assert matrix[south.oilfield]['all'][ProductionRollup.Metric.URGG] is None
+    assert matrix[south.oilfield]['empty'] == dict.fromkeys(metrics)
+
+
+def test_production_matrix_period_pairs(wells):
+    oilfield = wells[0].oilfield
+    create_readings(Mining, wells[:1])
+    period = (datetime.date(2021, 1, 1), datetime.date(2021, 2, 28))
+    matrix = OilField.objects.filter(pk=oilfield.pk).production_matrix([period])
+    assert matrix == {oilfield: {period: {
+        ProductionRollup.Metric.MINING: raw_total(oilfield, *period),
+        ProductionRollup.Metric.URGG: None,
+        ProductionRollup.Metric.GAS_DISPOSAL: None,
+    }}}
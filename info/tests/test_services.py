@@ -0,0 +1,61 @@
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from info.bench.webhook import PAYLOADS_DIR
+from info.tools import services
+from info.tools.platforms import get_platform_view
+from info.tools.services import BaseIntentHandler, IntentRegistry, parse_request
+
+
+def make_handler(intent_name, action_name=None):
+    class Handler(BaseIntentHandler):
+        _intent_name = intent_name
+        _action_name = action_name
+
+        def _get_params(self, params):
+            return params
+
+        def _get_query_to_db(self, params):  # noqa: U100
+            return None
+
+        def _create_response(self, data):  # noqa: U100
+            return intent_name
+
+    return Handler()
+
+
+def test_register_finds_by_intent_and_action():
+    registry = IntentRegistry()
+    handler = make_handler('test.registry.intent', 'test.registry.action')
+    registry.register(handler)
+    assert registry.get('test.registry.intent') is handler
+    assert registry.get('unknown', 'test.registry.action') is handler
+    assert registry.get('unknown') is None
+
+
+def test_register_duplicate_intent():
+    registry = IntentRegistry()
+    registry.register(make_handler('test.registry.duplicate'))
+    with pytest.raises(ImproperlyConfigured):
+        registry.register(make_handler('test.registry.duplicate'))
+
+
+def test_register_duplicate_action():
+    registry = IntentRegistry()
+    registry.register(make_handler('test.registry.first', 'test.registry.shared'))
+    with pytest.raises(ImproperlyConfigured):
+        registry.register(make_handler('test.registry.second', 'test.registry.shared'))
+    assert registry.get('test.registry.second') is None
+
+
+def test_handle_uses_given_view(monkeypatch):
+    msg = parse_request((PAYLOADS_DIR / 'telegram.json').read_bytes())
+    view = get_platform_view(msg)
+
+    def build_again(msg):  # noqa: U100
+        raise AssertionError('view built twice')
+
+    monkeypatch.setattr(services, 'get_platform_view', build_again)
+    handler = make_handler('test.view.intent')
+    assert handler.handle(msg, view) == 'test.view.intent'
+    assert services.get_analytics_data(msg, view)['user_id'] == view.uid
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from info.models import ProductionRollup
+from info.tools import rollups
+
+DAY = ProductionRollup.Period.DAY
+MONTH = ProductionRollup.Period.MONTH
+
+
+def expected_rollups(model) -> set:
+    """
+    Агрегаты, посчитанные по исходным показателям запросами Sum и Count.
+    """
+    reading = rollups.READINGS[model]
+    expected = set()
+    for period, period_start in ((DAY, F(reading.date_field)), (MONTH, TruncMonth(reading.date_field))):
+        for per_well in (True, False):
+            fields = ['well__oilfield_id', 'rollup_start'] + (['well_id'] if per_well else [])
+            rows = model.objects.annotate(rollup_start=period_start).values(*fields).annotate(
+                rollup_total=Sum(reading.value_field),
+                rollup_readings=Count('pk'),
+            ).order_by()
+            for row in rows:
+                expected.add((
+                    period,
+                    row['rollup_start'],
+                    row['well__oilfield_id'],
+                    row.get('well_id'),
+                    row['rollup_total'],
+                    row['rollup_readings'],
+                ))
+    return expected
+
+
+def actual_rollups(model) -> set:
+    return set(
+        ProductionRollup.objects.filter(metric=rollups.READINGS[model].metric).values_list(
+            'period', 'period_start', 'oilfield_id', 'well_id', 'total', 'readings',
+        ),
+    )
+
+
+def assert_rollups_match(model):
+    assert actual_rollups(model) == expected_rollups(model)
+
+
+def new_reading(model, well, date, value):
+    reading = rollups.READINGS[model]
+    return model(well=well, **{reading.date_field: date, reading.value_field: Decimal(value)})
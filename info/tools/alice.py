@@ -1,4 +1,4 @@
-import json
+from info.tools.serializers import dumps_str
 
 
 def is_alice(msg):
@@ -8,6 +8,8 @@ def is_alice(msg):
 
 
 class AliceRequest(object):
+    __slots__ = ('_request_dict',)
+
     def __init__(self, request_dict):
         self._request_dict = request_dict
 
@@ -74,11 +76,7 @@ class AliceResponse(object):
         }
 
     def dumps(self):
-        return json.dumps(
-            self._response_dict,
-            ensure_ascii=False,
-            indent=2,
-        )
+        return dumps_str(self._response_dict)
 
     def set_text(self, text):
         self._response_dict['response']['text'] = text[:1024]
@@ -0,0 +1,343 @@
+import asyncio
+import datetime
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+from django.utils.module_loading import import_string
+
+from info.tools.serializers import dumps
+
+if TYPE_CHECKING:
+    from info.tools.chatbase import Message, MessageSet
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = 'info:analytics:{0}'
+DEAD_LETTER_KEY = 'info:analytics:{0}:dead'
+VERSION = '0.1'
+
+SENT = 'sent'
+RETRY = 'retry'
+REJECTED = 'rejected'
+
+_client = None
+_sinks = None
+
+
+def get_client() -> redis.Redis:
+    """
+    Клиент Redis буфера аналитики. Создается при первом обращении, соединения берутся из общего пула процесса.
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.ANALYTICS_BUFFER_URL)
+    return _client
+
+
+def configure_chatbase() -> None:
+    """
+    Настраивает общий для процесса HTTP клиент Chatbase по настройкам проекта.
+    Модуль chatbase и requests импортируются здесь: в процессах web они не нужны.
+    """
+    from info.tools.chatbase import ChatbaseClient, set_default_client
+    set_default_client(ChatbaseClient(
+        timeout=(settings.CHATBASE_CONNECT_TIMEOUT, settings.CHATBASE_READ_TIMEOUT),
+        retries=settings.CHATBASE_RETRIES,
+        backoff_factor=settings.CHATBASE_BACKOFF_FACTOR,
+        failure_threshold=settings.CHATBASE_FAILURE_THRESHOLD,
+        reset_timeout=settings.CHATBASE_RESET_TIMEOUT,
+        pool_maxsize=settings.CHATBASE_CONCURRENCY,
+    ))
+
+
+class AnalyticsSink(ABC):
+    """
+    Получатель записей аналитики. У каждого получателя свой буфер,
+    поэтому сбой одного не задерживает и не дублирует отправку в другие.
+    """
+    batch_size = 100
+    concurrency = 1
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """
+        Имя получателя, часть ключа буфера.
+        """
+
+    @property
+    def buffer_key(self) -> str:
+        return BUFFER_KEY.format(self.name)
+
+    @property
+    def dead_letter_key(self) -> str:
+        return DEAD_LETTER_KEY.format(self.name)
+
+    @abstractmethod
+    def send(self, records: List[dict]) -> str: # noqa
+        """
+        Отправляет пакет записей. Вызывается в пуле потоков.
+        :return: SENT, RETRY (пакет вернется в буфер) или REJECTED (пакет будет отброшен).
+        """
+
+
+class ChatbaseSink(AnalyticsSink):
+    """
+    Отправка в Chatbase Batch API. Каждая запись - два сообщения, пользователя и агента.
+    HTTP клиент Chatbase настраивается при первой отправке, получатель создается и там, где только пишут в буфер.
+    """
+    name = 'chatbase'
+
+    def __init__(self):
+        self.batch_size = max(settings.CHATBASE_BATCH_SIZE // 2, 1)
+        self.concurrency = settings.CHATBASE_CONCURRENCY
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def _configure(self) -> None:
+        with self._lock:
+            if not self._configured:
+                configure_chatbase()
+                self._configured = True
+
+    @staticmethod
+    def _new_message(record: dict, message: str, msg_type: str, not_handled: bool = False) -> 'Message':
+        from info.tools.chatbase import Message
+        msg = Message(
+            api_key=settings.CHATBASE_API_KEY,
+            platform=record['platform'],
+            message=message,
+            intent=record['intent'],
+            version=VERSION,
+            user_id=record['user_id'],
+            session_id=record['session_id'],
+            not_handled=not_handled,
+        )
+        if msg_type == 'user':
+            msg.set_as_type_user()
+        else:
+            msg.set_as_type_agent()
+        # Время реплики, а не отправки пакета.
+        msg.time_stamp = record['time_stamp']
+        return msg
+
+    def build_message_set(self, records: List[dict]) -> 'MessageSet':
+        """
+        Платформа и пользователь задаются в каждом сообщении, поэтому в пакете могут быть разные диалоги.
+        """
+        from info.tools.chatbase import MessageSet
+        messages = MessageSet(api_key=settings.CHATBASE_API_KEY, version=VERSION)
+        for record in records:
+            messages.messages.append(self._new_message(record, record['user_msg'], 'user', record['not_handled']))
+            messages.messages.append(self._new_message(record, record['agent_msg'], 'agent'))
+        return messages
+
+    def send(self, records: List[dict]) -> str:
+        import requests
+        self._configure()
+        try:
+            response = self.build_message_set(records).send()
+        except requests.RequestException:
+            return RETRY
+        if response.status_code == 429 or response.status_code >= 500:
+            return RETRY
+        if not response.ok:
+            logger.error('Chatbase rejected batch of %s records: %s', len(records), response.text)
+            return REJECTED
+        return SENT
+
+
+class DatabaseSink(AnalyticsSink):
+    """
+    Запись в таблицу ConversationEvent одной массовой вставкой на пакет.
+    """
+    name = 'database'
+
+    def __init__(self):
+        self.batch_size = settings.ANALYTICS_DB_BATCH_SIZE
+
+    def send(self, records: List[dict]) -> str:
+        from info.models import ConversationEvent
+        close_old_connections()
+        try:
+            ConversationEvent.objects.bulk_create([
+                ConversationEvent(
+                    created_at=datetime.datetime.fromtimestamp(record['time_stamp'] / 1000, tz=datetime.timezone.utc),
+                    platform=record['platform'] or '',
+                    user_id=record['user_id'] or '',
+                    session_id=record['session_id'] or '',
+                    intent=record['intent'] or '',
+                    user_msg=record['user_msg'] or '',
+                    agent_msg=record['agent_msg'] or '',
+                    not_handled=record['not_handled'],
+                )
+                for record in records
+            ])
+        except DatabaseError:
+            logger.warning('Analytics batch of %s records not saved', len(records), exc_info=True)
+            return RETRY
+        finally:
+            # Потоки пула живут только до конца выгрузки, соединение не переиспользуется.
+            connection.close()
+        return SENT
+
+
+def get_sinks() -> List[AnalyticsSink]:
+    """
+    Получатели из настройки ANALYTICS_SINKS.
+    """
+    global _sinks
+    if _sinks is None:
+        _sinks = [import_string(path)() for path in settings.ANALYTICS_SINKS]
+    return _sinks
+
+
+def push(data: dict) -> None:
+    """
+    Добавляет запись в буферы получателей. Отправка выполняется периодической задачей analytics_flush.
+    Недоступность Redis не должна ломать ответ пользователю, поэтому запись в этом случае теряется.
+    :param data: Данные, извлеченные из запроса services.get_analytics_data.
+    """
+    record = dumps(dict(data, time_stamp=int(round(time.time() * 1e3))))
+    pipe = get_client().pipeline(transaction=False)
+    for sink in get_sinks():
+        pipe.rpush(sink.buffer_key, record)
+    try:
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning('Analytics record dropped', exc_info=True)
+
+
+apush = sync_to_async(push, thread_sensitive=False)
+
+
+def pop_batch(key: str, size: int) -> List[dict]:
+    """
+    Атомарно извлекает из начала буфера до size записей.
+    """
+    pipe = get_client().pipeline()
+    pipe.lrange(key, 0, size - 1)
+    pipe.ltrim(key, size, -1)
+    records, _ = pipe.execute()
+    return [json.loads(record) for record in records]
+
+
+def requeue(key: str, records: List[dict]) -> None:
+    """
+    Возвращает неотправленные записи в начало буфера в исходном порядке.
+    """
+    if records:
+        get_client().lpush(key, *(dumps(record) for record in reversed(records)))
+
+
+def dead_letter(key: str, records: List[dict]) -> None:
+    """
+    Переносит записи, исчерпавшие попытки отправки, в конец списка недоставленных.
+    """
+    if records:
+        get_client().rpush(key, *(dumps(record) for record in records))
+
+
+def retry_later(sink: AnalyticsSink, records: List[dict]) -> None:
+    """
+    Возвращает пакет в буфер, увеличив счетчик попыток записей.
+    Записи, отправка которых не удалась ANALYTICS_MAX_ATTEMPTS раз, переносятся в список недоставленных,
+    чтобы один неотправляемый пакет не останавливал выгрузку буфера.
+    """
+    retry, dead = [], []
+    for record in records:
+        record = dict(record, attempts=record.get('attempts', 0) + 1)
+        (dead if record['attempts'] >= settings.ANALYTICS_MAX_ATTEMPTS else retry).append(record)
+    try:
+        requeue(sink.buffer_key, retry)
+        dead_letter(sink.dead_letter_key, dead)
+    except redis.RedisError:
+        logger.error('Analytics batch of %s records for %s lost', len(records), sink.name, exc_info=True)
+        return
+    if retry:
+        logger.warning('Analytics batch of %s records for %s requeued', len(retry), sink.name)
+    if dead:
+        logger.error('Analytics batch of %s records for %s moved to %s', len(dead), sink.name, sink.dead_letter_key)
+
+
+def send_batch(sink: AnalyticsSink, records: List[dict]) -> str:
+    """
+    Отправляет пакет получателю. При RETRY и при любой ошибке получателя пакет возвращается в буфер:
+    извлеченный из Redis пакет есть только в памяти процесса.
+    """
+    try:
+        result = sink.send(records)
+    except Exception:
+        logger.exception('Analytics sink %s failed on batch of %s records', sink.name, len(records))
+        result = RETRY
+    if result == RETRY:
+        retry_later(sink, records)
+    return result
+
+
+async def aflush(sink: AnalyticsSink, max_batches: Optional[int] = None) -> int:
+    """
+    Отправляет накопленные записи получателю пакетами, одновременно не более sink.concurrency пакетов.
+    Следующий пакет извлекается из буфера только после освобождения места,
+    поэтому в памяти процесса не больше sink.concurrency пакетов, остальное ждет в Redis.
+    После первого возвращенного в буфер пакета новые не извлекаются до следующего запуска.
+    :return: Количество отправленных записей.
+    """
+    max_batches = max_batches or settings.ANALYTICS_FLUSH_MAX_BATCHES
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(sink.concurrency)
+    sending = set()
+    sent = 0
+    stopped = False
+
+    async def send(executor, records):
+        nonlocal sent, stopped
+        try:
+            result = await loop.run_in_executor(executor, send_batch, sink, records)
+        finally:
+            slots.release()
+        if result == SENT:
+            sent += len(records)
+        elif result == RETRY:
+            stopped = True
+
+    # Получатели и клиент Redis синхронные, запросы выполняются в пуле потоков по числу слотов.
+    with ThreadPoolExecutor(max_workers=sink.concurrency) as executor:
+        for _ in range(max_batches):
+            await slots.acquire()
+            records = [] if stopped else await loop.run_in_executor(executor, pop_batch, sink.buffer_key, sink.batch_size)
+            if not records:
+                slots.release()
+                break
+            task = loop.create_task(send(executor, records))
+            sending.add(task)
+            task.add_done_callback(sending.discard)
+        if sending:
+            await asyncio.gather(*sending)
+    return sent
+
+
+async def aflush_all(max_batches: Optional[int] = None) -> Dict[str, int]:
+    """
+    Выгружает буферы всех получателей одновременно.
+    :return: Количество отправленных записей по именам получателей.
+    """
+    sinks = get_sinks()
+    sent = await asyncio.gather(*(aflush(sink, max_batches) for sink in sinks))
+    return {sink.name: count for sink, count in zip(sinks, sent)}
+
+
+def flush(max_batches: Optional[int] = None) -> Dict[str, int]:
+    """
+    Синхронная обертка над aflush_all для задачи Celery.
+    """
+    return asyncio.run(aflush_all(max_batches))
@@ -0,0 +1,31 @@
+import asyncio
+import contextvars
+import functools
+from typing import Callable
+
+from info.tools.db import get_executor, prepare_connections, release_connections
+
+
+def database_sync_to_async(func: Callable) -> Callable:
+    """
+    Выполняет синхронную функцию, работающую с ORM, в пуле потоков базы данных.
+
+    В отличие от sync_to_async с thread_sensitive=True, запросы разных корутин
+    не выстраиваются в очередь к одному потоку. Каждый поток пула держит постоянное
+    соединение, которое проверяется и возвращается так же, как после обычного HTTP запроса.
+    Контекст (contextvars) вызывающей корутины передается в поток.
+    """
+    def inner(*args, **kwargs):
+        prepare_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            release_connections()
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, inner, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
+
+    return wrapper
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import time
+from typing import Any, Iterable, Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+
+DATA_VERSION_KEY = 'info:data-version:{0}'
+ANSWER_KEY = 'info:answer:{0}:{1}:{2}'
+
+STRUCTURE_SCOPE = 'structure'
+ALL_SCOPE = 'all'
+
+
+def _oilfield_scope(oilfield_id: int) -> str:
+    return f'oilfield:{oilfield_id}'
+
+
+def _get_versions(keys: list) -> dict:
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Начальное значение уникально, чтобы после вытеснения ключа версия не повторилась.
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def get_structure_version() -> str:
+    """
+    Возвращает версию справочников (месторождения, скважины).
+    """
+    key = DATA_VERSION_KEY.format(STRUCTURE_SCOPE)
+    return str(_get_versions([key])[key])
+
+
+def get_data_version(oilfield_id: Optional[int] = None) -> str:
+    """
+    Возвращает версию данных.
+    Для месторождения версия меняется только при изменении его показателей,
+    без месторождения - при любом изменении данных.
+    """
+    scope = ALL_SCOPE if oilfield_id is None else _oilfield_scope(oilfield_id)
+    keys = [DATA_VERSION_KEY.format(STRUCTURE_SCOPE), DATA_VERSION_KEY.format(scope)]
+    versions = _get_versions(keys)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def _bump(scope: str) -> None:
+    key = DATA_VERSION_KEY.format(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_data_version(oilfield_ids: Iterable[int] = ()) -> None:
+    """
+    Сдвигает версию данных. Без аргументов сдвигается только общая версия.
+    """
+    _bump(ALL_SCOPE)
+    for oilfield_id in set(oilfield_ids):
+        _bump(_oilfield_scope(oilfield_id))
+
+
+def bump_structure_version() -> None:
+    """
+    Сдвигает версию справочников (месторождения, скважины). Устаревают все ответы и справочный кэш.
+    """
+    from info.tools.reference import reference_cache
+    _bump(STRUCTURE_SCOPE)
+    reference_cache.expire()
+
+
+def canonicalize(value: Any) -> Any:
+    """
+    Приводит параметры к каноническому виду: ключи упорядочены, пустые значения отброшены,
+    строки в нижнем регистре без лишних пробелов.
+    """
+    if isinstance(value, dict):
+        return {
+            key: canonicalize(item)
+            for key, item in sorted(value.items())
+            if item is not None and item != '' and item != [] and item != {}
+        }
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(item) for item in value]
+    if isinstance(value, str):
+        return ' '.join(value.lower().split())
+    return value
+
+
+def get_answer_key(intent_name: str, params: dict, oilfield_id: Optional[int] = None) -> str:
+    """
+    Ключ кэша ответа: намерение, параметры, версия данных и текущая дата,
+    так как без явного периода ответ считается относительно сегодняшнего дня.
+    """
+    raw = json.dumps([intent_name, canonicalize(params)], ensure_ascii=False, sort_keys=True, default=str)
+    digest = hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    return ANSWER_KEY.format(
+        get_data_version(oilfield_id),
+        timezone.localdate().isoformat(),
+        digest,
+    )
@@ -0,0 +1,130 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Iterator, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Значения этих ключей заменяются на хэш на любом уровне вложенности.
+REDACT_KEYS = frozenset((
+    'user_id', 'application_id', 'client_id', 'username', 'first_name', 'last_name',
+    'phone_number', 'email', 'access_token', 'token', 'password', 'authorization', 'api_key',
+))
+# У этих объектов (отправитель и чат Telegram, пользователь) заменяется идентификатор.
+REDACT_PARENTS = frozenset(('from', 'chat', 'user'))
+
+_lock = threading.Lock()
+_capture_logger = None
+
+
+def redact_value(value: Any) -> str:
+    """
+    Заменяет значение хэшем с ключом SECRET_KEY: одинаковые значения остаются одинаковыми,
+    поэтому при воспроизведении сохраняется распределение запросов по пользователям и сессиям.
+    """
+    digest = hashlib.blake2b(str(value).encode(), key=settings.SECRET_KEY.encode()[:64], digest_size=8)
+    return f'redacted-{digest.hexdigest()}'
+
+
+def redact(data: Any, parent: Optional[str] = None) -> Any:
+    if isinstance(data, dict):
+        return {
+            key: redact_value(value)
+            if (key in REDACT_KEYS or key == 'id' and parent in REDACT_PARENTS) and not isinstance(value, (dict, list))
+            else redact(value, key)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [redact(item, parent) for item in data]
+    return data
+
+
+class RedactFilter(logging.Filter):
+    """
+    Разбор и очистка тела выполняются в потоке записи, а не в обработчике запроса.
+    Тела, не являющиеся JSON объектом, не сохраняются.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:  # noqa: A003
+        try:
+            body = json.loads(record.msg)
+        except ValueError:
+            return False
+        if not isinstance(body, dict):
+            return False
+        record.msg = json.dumps({'ts': record.created, 'body': redact(body)}, ensure_ascii=False)
+        return True
+
+
+def _get_capture_logger() -> logging.Logger:
+    global _capture_logger
+    with _lock:
+        if _capture_logger is None:
+            os.makedirs(settings.WEBHOOK_CAPTURE_DIR, exist_ok=True)
+            # Отдельный файл на процесс: несколько процессов не могут безопасно ротировать один файл.
+            handler = RotatingFileHandler(
+                os.path.join(settings.WEBHOOK_CAPTURE_DIR, f'webhook-{os.getpid()}.ndjson'),
+                maxBytes=settings.WEBHOOK_CAPTURE_MAX_BYTES,
+                backupCount=settings.WEBHOOK_CAPTURE_BACKUPS,
+                encoding='utf-8',
+            )
+            handler.addFilter(RedactFilter())
+            records = queue.Queue(maxsize=10000)
+            listener = QueueListener(records, handler)
+            listener.start()
+            atexit.register(listener.stop)
+            capture_logger = logging.getLogger('info.webhook_capture')
+            capture_logger.propagate = False
+            capture_logger.setLevel(logging.INFO)
+            capture_logger.addHandler(QueueHandler(records))
+            _capture_logger = capture_logger
+    return _capture_logger
+
+
+def record(body: bytes) -> None:
+    """
+    Сохраняет тело запроса webhook, если задана настройка WEBHOOK_CAPTURE_DIR.
+    Запись выполняется отдельным потоком, при переполнении очереди тело отбрасывается.
+    """
+    if not settings.WEBHOOK_CAPTURE_DIR:
+        return
+    try:
+        _get_capture_logger().info(body.decode('utf-8', errors='replace'))
+    except queue.Full:
+        pass
+    except OSError:
+        logger.warning('Webhook capture disabled', exc_info=True)
+
+
+def capture_files(paths: List[str]) -> List[str]:
+    """
+    Файлы записи: указанные файлы и все *.ndjson* из указанных каталогов, вместе с ротированными.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if '.ndjson' in name
+            ))
+        else:
+            files.append(path)
+    return files
+
+
+def read_captured(paths: List[str]) -> Iterator[bytes]:
+    """
+    Тела запросов из файлов записи в порядке файлов.
+    """
+    for path in capture_files(paths):
+        with open(path, encoding='utf-8') as stream:
+            for line in stream:
+                line = line.strip()
+                if line:
+                    yield json.dumps(json.loads(line)['body'], ensure_ascii=False).encode()
@@ -13,10 +13,16 @@
 # limitations under the License.
 
 """Define the core attributes/methods on a Message instance."""
-import json
-import requests
+import os
+import threading
 import time
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from info.tools.serializers import dumps
+
 
 class InvalidMessageTypeError(Exception):
     """Error raised when attribute values are set on a
@@ -37,6 +43,138 @@ class MessageTypes(object):
     AGENT = "agent"
 
 
+class CircuitOpenError(requests.ConnectionError):
+    """Error raised instead of a request while the circuit breaker is open."""
+
+
+class CircuitBreaker(object):
+    """Stop calling the API after consecutive failures.
+    After failure_threshold failures in a row requests fail fast for
+    reset_timeout seconds, then a single trial request is let through.
+    Other requests keep failing fast until the trial is recorded; a trial
+    that is never recorded is given up after another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a request may be sent."""
+        with self._lock:
+            now = time.monotonic()
+            if self.trial_started_at is not None:
+                if now - self.trial_started_at < self.reset_timeout:
+                    return False
+            elif self.opened_at is None:
+                return True
+            elif now - self.opened_at < self.reset_timeout:
+                return False
+            # Half-open: this caller sends the trial, the next failure opens the circuit again.
+            self.opened_at = None
+            self.failures = self.failure_threshold - 1
+            self.trial_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_started_at = None
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ChatbaseClient(object):
+    """Per-process pooled HTTP client for the Chatbase API.
+    Keeps connections alive between calls, applies timeouts, retries
+    connection errors, 429 and 5xx responses with exponential backoff,
+    and fails fast through a circuit breaker while the API is down.
+    The session is recreated after fork, so an instance created before
+    the workers are forked is safe to use in each of them.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self,
+                 timeout=(3.05, 10),
+                 retries=3,
+                 backoff_factor=0.5,
+                 pool_maxsize=10,
+                 failure_threshold=5,
+                 reset_timeout=30.0):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_maxsize = pool_maxsize
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._session = None
+        self._pid = None
+
+    @property
+    def session(self):
+        """Return the requests session owned by the current process."""
+        if self._session is None or self._pid != os.getpid():
+            session = requests.Session()
+            # A read timeout may follow a delivered request, retrying it would duplicate messages.
+            # read=False re-raises the timeout as is (ReadTimeout) instead of wrapping it in MaxRetryError.
+            retry = Retry(total=self.retries,
+                          read=False,
+                          backoff_factor=self.backoff_factor,
+                          status_forcelist=self.RETRY_STATUSES,
+                          allowed_methods=frozenset(['POST']),
+                          raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=self.pool_maxsize,
+                                  max_retries=retry)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._session = session
+            self._pid = os.getpid()
+        return self._session
+
+    def post(self, url, data, headers=None):
+        """POST to the API through the circuit breaker."""
+        if not self.breaker.allow():
+            raise CircuitOpenError('Chatbase circuit breaker is open')
+        try:
+            response = self.session.post(url, data=data, headers=headers, timeout=self.timeout)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        if response.status_code in self.RETRY_STATUSES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+
+_default_client = None
+
+
+def get_default_client():
+    """Return the process-wide client, creating it with default settings."""
+    global _default_client
+    if _default_client is None:
+        _default_client = ChatbaseClient()
+    return _default_client
+
+
+def set_default_client(client):
+    """Replace the process-wide client used by Message.send and MessageSet.send."""
+    global _default_client
+    _default_client = client
+
+
 class Message(object):
     """Base Message.
     Define attributes present on all variants of the Message Class.
@@ -110,14 +248,14 @@ class Message(object):
 
     def to_json(self):
         """Return a JSON version for use with the Chatbase API"""
-        return json.dumps(self, default=lambda i: i.__dict__)
+        return dumps(self)
 
-    def send(self):
+    def send(self, client=None):
         """Send the message to the Chatbase API."""
         url = "https://chatbase.com/api/message"
-        return requests.post(url,
-                             data=self.to_json(),
-                             headers=Message.get_content_type())
+        return (client or get_default_client()).post(url,
+                                                     data=self.to_json(),
+                                                     headers=Message.get_content_type())
 
 
 class MessageSet(object):
@@ -158,15 +296,14 @@ class MessageSet(object):
 
     def to_json(self):
         """Return a JSON version for use with the Chatbase API"""
-        return json.dumps({'messages': self.messages},
-                          default=lambda i: i.__dict__)
+        return dumps({'messages': self.messages})
 
-    def send(self):
+    def send(self, client=None):
         """Send the message set to the Chatbase API"""
         url = ("https://chatbase.com/api/messages?api_key=%s" % self.api_key)
-        return requests.post(url,
-                             data=self.to_json(),
-                             headers=Message.get_content_type())
+        return (client or get_default_client()).post(url,
+                                                     data=self.to_json(),
+                                                     headers=Message.get_content_type())
 
 
 class BotMessage(Message):
@@ -0,0 +1,99 @@
+import contextvars
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from info.tools.cache import canonicalize, get_data_version
+from info.tools.platforms import PlatformView
+
+CONTEXT_KEY = 'info:context:{0}'
+
+_current = contextvars.ContextVar('info_conversation', default=None)
+
+
+class ConversationContext:
+    """
+    Состояние диалога между репликами: последние параметры (месторождение, скважина, период)
+    и промежуточные результаты обработчиков. Хранится в общем кэше по идентификатору сессии
+    и устаревает вместе с сессией платформы.
+    """
+    __slots__ = ('conversation_id', 'timeout', 'params', 'results', '_changed')
+
+    def __init__(self, conversation_id: str, timeout: int, data: Optional[dict] = None):
+        data = data or {}
+        self.conversation_id = conversation_id
+        self.timeout = timeout
+        self.params = data.get('params', {})
+        self.results = data.get('results', {})
+        self._changed = False
+
+    @classmethod
+    def load(cls, view: PlatformView) -> 'ConversationContext':
+        """
+        Состояние диалога запроса. Новая сессия Алисы начинается с пустого состояния.
+        """
+        timeout = settings.CONVERSATION_CONTEXT_TIMEOUTS.get(view.platform, settings.CONVERSATION_CONTEXT_TIMEOUT)
+        data = None if view.new_session else cache.get(CONTEXT_KEY.format(view.conversation_id))
+        return cls(view.conversation_id, timeout, data)
+
+    def save(self) -> None:
+        """
+        Сохраняет состояние, если оно изменилось. Срок хранения отсчитывается от последней реплики.
+        """
+        if self._changed:
+            cache.set(
+                CONTEXT_KEY.format(self.conversation_id),
+                {'params': self.params, 'results': self.results},
+                self.timeout,
+            )
+            self._changed = False
+
+    def fill(self, params: dict, names: Iterable[str]) -> dict:
+        """
+        Дополняет параметры реплики значениями из предыдущих реплик и запоминает итоговые значения.
+        Например, для "а за прошлый месяц?" месторождение берется из предыдущего вопроса.
+        :param names: Параметры Dialogflow, переносимые между репликами.
+        """
+        params = dict(params)
+        for name in names:
+            value = canonicalize(params.get(name))
+            if value is None or value == '' or value == [] or value == {}:
+                if name in self.params:
+                    params[name] = self.params[name]
+            elif canonicalize(self.params.get(name)) != value:
+                self.params[name] = params[name]
+                self._changed = True
+        return params
+
+    def get_result(self, name: str, oilfield_id: Optional[int] = None) -> Any:
+        """
+        Промежуточный результат, сохраненный в этом диалоге. None, если его нет
+        или данные, из которых он получен, с тех пор изменились.
+        """
+        result = self.results.get(name)
+        if result is None or result[0] != get_data_version(oilfield_id):
+            return None
+        return result[1]
+
+    def set_result(self, name: str, value: Any, oilfield_id: Optional[int] = None) -> None:
+        """
+        Сохраняет промежуточный результат вместе с версией данных месторождения.
+        """
+        self.results[name] = (get_data_version(oilfield_id), value)
+        self._changed = True
+
+
+def get_conversation() -> Optional[ConversationContext]:
+    """
+    Состояние диалога обрабатываемой реплики, доступное в методах обработчика намерения.
+    """
+    return _current.get()
+
+
+def set_conversation(context: Optional[ConversationContext]) -> contextvars.Token:
+    return _current.set(context)
+
+
+def reset_conversation(token: contextvars.Token) -> None:
+    _current.reset(token)
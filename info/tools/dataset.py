@@ -0,0 +1,249 @@
+import datetime
+import io
+import random
+import time
+from collections import namedtuple
+from decimal import Decimal
+from typing import Callable, Optional
+
+from django.db import connection, transaction
+
+from info.models import Employee, Incident, OilField, ProductionRollup, Task, Well
+from info.tools import rollups
+from info.tools.cache import bump_data_version, bump_structure_version
+
+Preset = namedtuple('Preset', ['oilfields', 'wells', 'years', 'employees'])
+
+# Строк показателей: месторождения * скважины * дни * 3.
+PRESETS = {
+    's': Preset(oilfields=3, wells=10, years=1, employees=20),  # ~33 тыс.
+    'm': Preset(oilfields=10, wells=50, years=3, employees=100),  # ~1,6 млн
+    'l': Preset(oilfields=30, wells=100, years=10, employees=500),  # ~33 млн
+}
+
+# Базовый суточный уровень показателя по типу скважины: (добыча, УРГГ, утилизация газа).
+LEVELS = {
+    Well.WellType.A: (400, 60, 15),
+    Well.WellType.B: (40, 20, 3),
+    Well.WellType.C: (120, 30, 8),
+    Well.WellType.D: (20, 10, 2),
+}
+# Доля от базового уровня по статусу скважины.
+STATUS_FACTORS = {
+    Well.WellStatus.A: 0.05,
+    Well.WellStatus.B: 0.5,
+    Well.WellStatus.C: 0.1,
+    Well.WellStatus.D: 0.0,
+}
+
+
+class DatasetGenerator:
+    """
+    Детерминированный синтетический набор данных для нагрузочной проверки.
+    Месторождения и скважины именуются с префиксом, что позволяет удалить набор целиком.
+    Показатели вставляются через COPY на PostgreSQL и bulk_create на других СУБД,
+    агрегаты пересчитываются один раз после вставки.
+    Набор определяется seed и end_date: по умолчанию end_date - вчерашний день,
+    поэтому для воспроизводимого набора дата окончания задается явно.
+    """
+
+    def __init__(
+        self,
+        oilfields: int,
+        wells: int,
+        years: int,
+        employees: int,
+        seed: int = 0,
+        prefix: str = 'synthetic',
+        end_date: Optional[datetime.date] = None,
+        chunk_size: int = 100000,
+        use_copy: Optional[bool] = None,
+    ):
+        self.oilfields = oilfields
+        self.wells = wells
+        self.employees = employees
+        self.prefix = prefix
+        self.end_date = end_date or datetime.date.today() - datetime.timedelta(days=1)
+        self.start_date = self.end_date - datetime.timedelta(days=365 * years - 1)
+        self.chunk_size = chunk_size
+        self.use_copy = connection.vendor == 'postgresql' if use_copy is None else use_copy
+        self.random = random.Random(seed)  # noqa: S311
+        self.rows = 0
+        self.started = None
+        self.finished = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.monotonic()) - self.started if self.started else 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def clear(self) -> None:
+        """
+        Удаляет ранее созданный набор с тем же префиксом.
+        """
+        oilfields = OilField.objects.filter(name__startswith=f'{self.prefix}-')
+        with transaction.atomic():
+            Task.objects.filter(task_details__startswith=f'[{self.prefix}]').delete()
+            Incident.objects.filter(incident_details__startswith=f'[{self.prefix}]').delete()
+            Employee.objects.filter(email__endswith=f'@{self.prefix}.example').delete()
+            # Каскадное удаление отправило бы сигнал на каждый показатель, агрегаты удаляются вместе с месторождениями.
+            for model in rollups.READINGS:
+                model.objects.filter(well__oilfield__in=oilfields).delete(refresh_rollups=False)
+            oilfield_ids = list(oilfields.values_list('pk', flat=True))
+            oilfields.delete()
+        bump_data_version(oilfield_ids)
+        bump_structure_version()
+
+    def run(self, progress: Optional[Callable] = None) -> int:
+        """
+        :param progress: Функция, вызываемая с генератором после каждой части.
+        :return: Количество вставленных показателей.
+        """
+        self.started = time.monotonic()
+        wells = self._create_structure()
+        self._create_events()
+        batch = {metric: [] for metric in rollups.METRIC_MODELS}
+        pending = 0
+        for well in wells:
+            for metric, date, value in self._readings(well):
+                batch[metric].append((well.pk, date, value))
+                pending += 1
+            if pending >= self.chunk_size:
+                self._write(batch)
+                batch = {metric: [] for metric in rollups.METRIC_MODELS}
+                pending = 0
+                if progress:
+                    progress(self)
+        self._write(batch)
+        rollups.rebuild(oilfield_ids={well.oilfield_id for well in wells})
+        self._analyze()
+        bump_data_version({well.oilfield_id for well in wells})
+        bump_structure_version()
+        self.finished = time.monotonic()
+        return self.rows
+
+    def _create_structure(self) -> list:
+        oilfields = OilField.objects.bulk_create([
+            OilField(name=f'{self.prefix}-{number}') for number in range(1, self.oilfields + 1)
+        ])
+        if not all(oilfield.pk for oilfield in oilfields):
+            # bulk_create возвращает первичные ключи не на всех СУБД.
+            oilfields = list(OilField.objects.filter(name__startswith=f'{self.prefix}-').order_by('pk'))
+        wells = []
+        for oilfield in oilfields:
+            for number in range(1, self.wells + 1):
+                wells.append(Well(
+                    oilfield=oilfield,
+                    ident_number=f'{oilfield.name}-{number}',
+                    well_type=self.random.choices(list(Well.WellType), weights=(70, 15, 10, 5))[0],
+                    well_status=self.random.choices(list(Well.WellStatus), weights=(5, 10, 80, 5))[0],
+                    asurg=self.random.random() < 0.3,
+                ))
+        Well.objects.bulk_create(wells, batch_size=1000)
+        if not all(well.pk for well in wells):
+            wells = list(Well.objects.filter(oilfield__name__startswith=f'{self.prefix}-').order_by('pk'))
+        return wells
+
+    def _create_events(self) -> None:
+        days = (self.end_date - self.start_date).days
+        first_id = (Employee.objects.order_by('-id_employee').values_list('id_employee', flat=True).first() or 0) + 1
+        employees = [
+            Employee(
+                id_employee=first_id + number,
+                email=f'employee{first_id + number}@{self.prefix}.example',
+                first_name=self.random.choice(('Иван', 'Петр', 'Анна', 'Мария', 'Олег', 'Елена')),
+                last_name=self.random.choice(('Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов')),
+                phone_number=f'+7916{first_id + number:07d}',
+            )
+            for number in range(self.employees)
+        ]
+        Employee.objects.bulk_create(employees, batch_size=1000)
+        Incident.objects.bulk_create(
+            [
+                Incident(
+                    incident_date=self.start_date + datetime.timedelta(days=self.random.randrange(days + 1)),
+                    incident_count=self.random.randint(1, 5),
+                    incident_details=f'[{self.prefix}] Инцидент {number}',
+                )
+                for number in range(max(days // 7, 1) * self.oilfields)
+            ],
+            batch_size=1000,
+        )
+        if employees:
+            Task.objects.bulk_create(
+                [
+                    Task(
+                        task_date=self.start_date + datetime.timedelta(days=self.random.randrange(days + 1)),
+                        id_employee_id=self.random.choice(employees).id_employee,
+                        task_details=f'[{self.prefix}] Задача {number}',
+                    )
+                    for number in range(max(days // 2, 1) * self.oilfields)
+                ],
+                batch_size=1000,
+            )
+
+    def _readings(self, well: Well):
+        """
+        Суточные показатели скважины: базовый уровень снижается на 5-15% в год, шум около 5%.
+        """
+        factor = STATUS_FACTORS[well.well_status]
+        levels = [level * factor * self.random.uniform(0.5, 1.5) for level in LEVELS[well.well_type]]
+        decline = self.random.uniform(0.85, 0.95) ** (1 / 365)
+        date = self.start_date
+        day = 0
+        gauss = self.random.gauss
+        while date <= self.end_date:
+            trend = decline ** day
+            for metric, level in zip(rollups.METRIC_MODELS, levels):
+                yield metric, date, round(max(level * trend * (1 + gauss(0, 0.05)), 0), 3)
+            date += datetime.timedelta(days=1)
+            day += 1
+
+    def _write(self, batch: dict) -> None:
+        with transaction.atomic():
+            for metric, rows in batch.items():
+                if not rows:
+                    continue
+                model = rollups.METRIC_MODELS[metric]
+                if self.use_copy:
+                    self._copy(model, rows)
+                else:
+                    reading = rollups.READINGS[model]
+                    model.objects.bulk_create(
+                        [
+                            model(well_id=well_id, **{reading.date_field: date, reading.value_field: Decimal(str(value))})
+                            for well_id, date, value in rows
+                        ],
+                        batch_size=5000,
+                        refresh_rollups=False,
+                    )
+                self.rows += len(rows)
+
+    @staticmethod
+    def _analyze() -> None:
+        """
+        Обновляет статистику планировщика PostgreSQL: без нее после массовой загрузки
+        запросы к агрегатам выполняются полным перебором строк месторождения.
+        """
+        if connection.vendor != 'postgresql':
+            return
+        models = (OilField, Well, ProductionRollup, *rollups.READINGS)
+        with connection.cursor() as cursor:
+            for model in models:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+    @staticmethod
+    def _copy(model, rows: list) -> None:
+        reading = rollups.READINGS[model]
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(column) for column in (
+            model._meta.get_field('well').column,
+            model._meta.get_field(reading.date_field).column,
+            model._meta.get_field(reading.value_field).column,
+        ))
+        buffer = io.StringIO(''.join(f'{well_id}\t{date.isoformat()}\t{value}\n' for well_id, date, value in rows))
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN', buffer)
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Соединения всех потоков: сколько запросов или задач их сейчас используют и когда освобождены.
+# Соединение, не используемое ни одним запросом, может закрыть другой поток, см. close_idle_connections.
+_active = {}
+_released = {}
+_connections_lock = threading.Lock()
+_evictor = None
+
+
+def prepare_connections(**kwargs) -> None:  # noqa: U100
+    """
+    Проверяет постоянные соединения текущего потока перед запросом или задачей.
+    Закрываются устаревшие (CONN_MAX_AGE) и ошибочные соединения, простаивавшие дольше
+    DATABASE_CONN_MAX_IDLE, и неработающие, если простой больше DATABASE_HEALTH_CHECK_INTERVAL.
+    Закрытое соединение будет открыто заново при первом запросе.
+    Соединения внутри транзакции (atomic) не проверяются и не закрываются.
+    """
+    now = time.monotonic()
+    for conn in connections.all():
+        with _connections_lock:
+            _active[conn] = _active.get(conn, 0) + 1
+            released_at = _released.pop(conn, now)
+        if conn.connection is None or conn.in_atomic_block:
+            continue
+        conn.close_if_unusable_or_obsolete()
+        idle = now - released_at
+        if conn.connection is None:
+            continue
+        if idle > settings.DATABASE_CONN_MAX_IDLE:
+            conn.close()
+        elif idle > settings.DATABASE_HEALTH_CHECK_INTERVAL and not conn.is_usable():
+            conn.close()
+
+
+def release_connections(**kwargs) -> None:  # noqa: U100
+    """
+    Возвращает соединения текущего потока после запроса или задачи: закрывает устаревшие
+    и запоминает время, с которого оставшиеся простаивают. Соединение, которое больше
+    не использует ни один запрос потока, закрывается через DATABASE_CONN_MAX_IDLE
+    простоя, даже если поток больше не получит работы.
+    """
+    now = time.monotonic()
+    for conn in connections.all():
+        if not conn.in_atomic_block:
+            conn.close_if_unusable_or_obsolete()
+        with _connections_lock:
+            active = max(_active.pop(conn, 0) - 1, 0)
+            if active:
+                _active[conn] = active
+            elif conn.connection is not None and not conn.in_atomic_block:
+                _released[conn] = now
+    _start_evictor()
+
+
+def close_idle_connections(max_idle: Optional[float] = None) -> int:
+    """
+    Закрывает соединения всех потоков, не используемые ни одним запросом дольше max_idle секунд,
+    по умолчанию DATABASE_CONN_MAX_IDLE. Возвращает количество закрытых соединений.
+    Блокировка удерживается до закрытия, поэтому prepare_connections потока-владельца
+    дожидается его и открывает соединение заново.
+    """
+    if max_idle is None:
+        max_idle = settings.DATABASE_CONN_MAX_IDLE
+    now = time.monotonic()
+    with _connections_lock:
+        expired = [conn for conn, released_at in _released.items() if now - released_at >= max_idle]
+        for conn in expired:
+            del _released[conn]
+            # Соединение принадлежит другому потоку, который его сейчас не использует.
+            conn.inc_thread_sharing()
+            try:
+                conn.close()
+            except DatabaseError:
+                pass
+            finally:
+                conn.dec_thread_sharing()
+    return len(expired)
+
+
+def _evict() -> None:
+    while True:
+        time.sleep(max(settings.DATABASE_CONN_MAX_IDLE / 2, 1))
+        close_idle_connections()
+
+
+def _start_evictor() -> None:
+    global _evictor
+    if _evictor is None:
+        with _connections_lock:
+            if _evictor is None:
+                _evictor = threading.Thread(target=_evict, name='database-evictor', daemon=True)
+                _evictor.start()
+
+
+def close_connections() -> None:
+    """
+    Закрывает соединения текущего потока.
+    """
+    for conn in connections.all():
+        if conn.connection is not None and not conn.in_atomic_block:
+            conn.close()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Пул потоков для запросов к базе из асинхронного кода.
+    Каждый поток держит свое постоянное соединение, поэтому размер пула DATABASE_POOL_SIZE -
+    это и наибольшее число соединений процесса из асинхронных обработчиков.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.DATABASE_POOL_SIZE,
+                    thread_name_prefix='database',
+                )
+    return _executor
+
+
+def _reset_after_fork() -> None:
+    # Потоки пула и поток закрытия соединений не переживают fork, они создаются заново.
+    global _executor, _executor_lock, _connections_lock, _evictor
+    _executor = None
+    _executor_lock = threading.Lock()
+    _connections_lock = threading.Lock()
+    _evictor = None
+    _active.clear()
+    _released.clear()
+
+
+def _close_before_fork() -> None:
+    # Дочерние процессы не должны унаследовать сокеты соединений: закрываются соединения текущего
+    # потока и все свободные соединения других потоков, в том числе потоков пула.
+    if settings.configured:
+        close_connections()
+        close_idle_connections(0)
+
+
+os.register_at_fork(before=_close_before_fork, after_in_child=_reset_after_fork)
@@ -1,5 +1,5 @@
-from typing import Optional, Any
-from pydantic import Field, BaseModel, root_validator, AnyUrl, PositiveInt
+from typing import Optional, Any, ClassVar
+from pydantic import Field, BaseModel, root_validator, AnyUrl, PositiveInt, PrivateAttr
 
 
 class Text(BaseModel):
@@ -366,6 +366,58 @@ class WebhookRequest(BaseModel):
     )
 
 
+class LazyModel(BaseModel):
+    """
+    Модель, валидирующая только объявленные поля.
+    Остальные поля исходных данных валидируются полной моделью full_model при первом обращении к ним.
+    """
+    full_model: ClassVar[type[BaseModel]]
+    _data: dict = PrivateAttr()
+    _full: Optional[BaseModel] = PrivateAttr(None)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._data = data
+
+    def get_full(self) -> BaseModel:
+        """
+        Полностью валидированная модель. Создается один раз.
+        :raises pydantic.ValidationError: Если исходные данные не соответствуют полной модели.
+        """
+        if self._full is None:
+            self._full = self.full_model.parse_obj(self._data)
+        return self._full
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_') or name not in self.full_model.__fields__:
+            raise AttributeError(name)
+        return getattr(self.get_full(), name)
+
+
+class LazyQueryResult(LazyModel):
+    """
+    Результат обработки запроса: только поля, которые используют обработчики намерений и аналитика.
+    """
+    full_model = QueryResult
+
+    action: Optional[str]
+    parameters: Optional[dict]
+    intent: Intent
+    query_text: str = Field(alias='queryText')
+    fulfillment_text: str = Field(alias='fulfillmentText')
+
+
+class LazyWebhookRequest(LazyModel):
+    """
+    Запрос от Dialogflow с отложенной валидацией сообщений, контекстов и диагностической информации.
+    """
+    full_model = WebhookRequest
+
+    session: str
+    original_detect_intent_request: OriginalDetectIntentRequest = Field(alias='originalDetectIntentRequest')
+    query_result: LazyQueryResult = Field(alias='queryResult')
+
+
 class EventInput(BaseModel):
     """
     События позволяют сопоставлять намерения по имени события вместо ввода на естественном языке.
@@ -0,0 +1,142 @@
+import csv
+import datetime
+import queue
+import threading
+from typing import Iterable, Iterator, Optional
+
+from django.db import close_old_connections
+
+from info.tools import rollups
+from info.tools.db import close_connections
+from info.tools.serializers import dumps_str
+
+FIELDS = ('well', 'date', 'value', 'metric', 'oilfield')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def iter_readings(
+    metrics: Optional[Iterable[str]] = None,
+    oilfield_ids: Optional[Iterable[int]] = None,
+    wells: Optional[Iterable[str]] = None,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    chunk_size: int = 2000,
+) -> Iterator[tuple]:
+    """
+    Показатели скважин в порядке (показатель, скважина, дата).
+    Строки читаются серверным курсором частями по chunk_size, весь запрос в память не загружается.
+    Поля строки соответствуют FIELDS и формату команды import_readings.
+    """
+    for metric in metrics or rollups.METRIC_MODELS:
+        model = rollups.METRIC_MODELS[metric]
+        reading = rollups.READINGS[model]
+        readings = model.objects.all()
+        if oilfield_ids:
+            readings = readings.filter(well__oilfield_id__in=oilfield_ids)
+        if wells:
+            readings = readings.filter(well__ident_number__in=wells)
+        if start_date:
+            readings = readings.filter(**{f'{reading.date_field}__gte': start_date})
+        if end_date:
+            readings = readings.filter(**{f'{reading.date_field}__lte': end_date})
+        readings = readings.order_by('well_id', reading.date_field).values_list(
+            'well__ident_number',
+            reading.date_field,
+            reading.value_field,
+            'well__oilfield__name',
+        )
+        for ident_number, date, value, oilfield in readings.iterator(chunk_size=chunk_size):
+            yield ident_number, date.isoformat(), str(value), metric, oilfield
+
+
+class _Line:
+    """
+    Буфер для csv.writer, возвращающий записанную строку.
+    """
+
+    def write(self, value):
+        return value
+
+
+def to_csv(rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(_Line())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def to_ndjson(rows: Iterable[tuple]) -> Iterator[str]:
+    for row in rows:
+        yield dumps_str(dict(zip(FIELDS, row))) + '\n'
+
+
+ENCODERS = {
+    'csv': to_csv,
+    'ndjson': to_ndjson,
+}
+
+
+class PrefetchIterator:
+    """
+    Выполняет генератор в отдельном потоке и отдает его вывод блоками строк.
+
+    Запросы выполняются в потоке-производителе, пока ответ отправляется клиенту.
+    Очередь ограничена, поэтому потребление памяти не зависит от объема выгрузки.
+    __next__ ждет очередь и блокирует поток: под ASGI ответ перебирается в отдельном потоке
+    обработчиком config.asgi.StreamingASGIHandler, а не в цикле событий.
+    """
+
+    def __init__(self, lines: Iterable[str], lines_per_block: int = 500, max_blocks: int = 8):
+        self._queue = queue.Queue(maxsize=max_blocks)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._produce,
+            args=(lines, lines_per_block),
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, lines, lines_per_block):
+        close_old_connections()
+        try:
+            block = []
+            for line in lines:
+                block.append(line)
+                if len(block) >= lines_per_block:
+                    if not self._put(''.join(block)):
+                        return
+                    block = []
+            if block:
+                self._put(''.join(block))
+        except Exception as error:
+            self._put(error)
+        finally:
+            self._put(None)
+            # Поток завершается, постоянное соединение не будет переиспользовано.
+            close_connections()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        item = self._queue.get()
+        if item is None:
+            raise StopIteration
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def close(self):
+        self._closed.set()
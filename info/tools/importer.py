@@ -0,0 +1,214 @@
+import csv
+import datetime
+import io
+import json
+import time
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Iterable, Iterator, Optional, TextIO
+
+from django.db import connection, transaction
+
+from info.models import Well
+from info.tools import rollups
+from info.tools.cache import bump_data_version
+
+MAX_ERRORS = 10
+
+
+def read_csv(stream: TextIO) -> Iterator[dict]:
+    """
+    CSV с заголовком: well (идентификационный номер скважины), date (YYYY-MM-DD), value[, metric].
+    """
+    return csv.DictReader(stream)
+
+
+def read_ndjson(stream: TextIO) -> Iterator[dict]:
+    """
+    По одному JSON объекту с теми же полями, что и в CSV, на строку.
+    """
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+class ImportStats:
+
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.finished = None
+
+    def skip(self, line: int, reason: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f'{line}: {reason}')
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.imported / self.seconds if self.seconds else 0.0
+
+
+class ReadingImporter:
+    """
+    Потоковая загрузка показателей скважин частями.
+    Повторная загрузка того же файла не создает дублей: показание скважины за дату заменяется.
+    На PostgreSQL часть загружается через COPY во временную таблицу и INSERT ... ON CONFLICT,
+    на других СУБД - через bulk_update/bulk_create.
+    При refresh_rollups=False агрегаты и версии данных не обновляются, после загрузки,
+    в том числе прерванной, нужно выполнить rebuild_rollups.
+    """
+
+    def __init__(
+        self,
+        metric: Optional[str] = None,
+        chunk_size: int = 5000,
+        use_copy: Optional[bool] = None,
+        refresh_rollups: bool = True,
+    ):
+        self.metric = metric
+        self.chunk_size = chunk_size
+        self.use_copy = connection.vendor == 'postgresql' if use_copy is None else use_copy
+        self.refresh_rollups = refresh_rollups
+        self.wells = {}
+        self.oilfield_ids = {}
+        self.ambiguous = set()
+        for ident_number, pk, oilfield_id in Well.objects.values_list('ident_number', 'pk', 'oilfield_id'):
+            if ident_number in self.wells:
+                self.ambiguous.add(ident_number)
+            self.wells[ident_number] = (pk, oilfield_id)
+            self.oilfield_ids[pk] = oilfield_id
+
+    def run(self, rows: Iterable[dict], progress=None) -> ImportStats:
+        """
+        Каждая часть записывается в своей транзакции вместе с изменением агрегатов на разницу
+        между загруженными и сохраненными ранее показателями, поэтому после любой части,
+        в том числе перед ошибкой, агрегаты и версии данных соответствуют загруженным показателям.
+        :param progress: Функция, вызываемая со статистикой после каждой части.
+        """
+        stats = ImportStats()
+        chunk = {}
+        oilfields = {}
+        chunk_rows = 0
+        for line, row in enumerate(rows, start=1):
+            try:
+                metric, well_id, oilfield_id, date, value = self._parse(row)
+            except (KeyError, TypeError, ValueError, InvalidOperation) as error:
+                stats.skip(line, repr(error))
+                continue
+            chunk.setdefault(metric, {})[(well_id, date)] = value
+            oilfields.setdefault(metric, set()).add(oilfield_id)
+            chunk_rows += 1
+            if chunk_rows >= self.chunk_size:
+                stats.imported += self._write(chunk, oilfields)
+                chunk, oilfields, chunk_rows = {}, {}, 0
+                if progress:
+                    progress(stats)
+        stats.imported += self._write(chunk, oilfields)
+        stats.finished = time.monotonic()
+        return stats
+
+    def _parse(self, row: dict) -> tuple:
+        metric = row.get('metric') or self.metric
+        if metric not in rollups.METRIC_MODELS:
+            raise ValueError(f'Unknown metric {metric!r}')
+        ident_number = str(row['well'])
+        if ident_number not in self.wells:
+            raise ValueError(f'Unknown well {ident_number!r}')
+        if ident_number in self.ambiguous:
+            raise ValueError(f'Ambiguous well {ident_number!r}')
+        well_id, oilfield_id = self.wells[ident_number]
+        date = datetime.date.fromisoformat(row['date'])
+        # Значение округляется до точности поля заранее, чтобы изменения агрегатов совпадали с сохраненным.
+        model = rollups.METRIC_MODELS[metric]
+        field = model._meta.get_field(rollups.READINGS[model].value_field)
+        value = Decimal(str(row['value'])).quantize(Decimal(1).scaleb(-field.decimal_places), rounding=ROUND_HALF_UP)
+        return metric, well_id, oilfield_id, date, value
+
+    def _write(self, chunk: dict, oilfields: dict) -> int:
+        written = 0
+        with transaction.atomic():
+            for metric, values in chunk.items():
+                written += len(values)
+                model = rollups.METRIC_MODELS[metric]
+                existing = self._existing(model, values) if self.refresh_rollups or not self.use_copy else {}
+                if self.refresh_rollups:
+                    # Агрегаты обновляются на разницу с сохраненными значениями: объем работы
+                    # пропорционален части, а не всем показателям затронутых месяцев.
+                    rollups.apply_changes(model, self._changes(values, existing))
+                if self.use_copy:
+                    self._copy(model, values)
+                else:
+                    self._upsert(model, values, existing)
+            if self.refresh_rollups and chunk:
+                oilfield_ids = set().union(*oilfields.values())
+                transaction.on_commit(lambda: bump_data_version(oilfield_ids))
+        return written
+
+    def _changes(self, values: dict, existing: dict) -> Iterator[tuple]:
+        for (well_id, date), value in values.items():
+            if (well_id, date) in existing:
+                yield well_id, self.oilfield_ids[well_id], date, value - existing[(well_id, date)][1], 0
+            else:
+                yield well_id, self.oilfield_ids[well_id], date, value, 1
+
+    @staticmethod
+    def _existing(model, values: dict) -> dict:
+        """
+        Сохраненные показатели части: (well_id, дата) -> (pk, значение).
+        """
+        reading = rollups.READINGS[model]
+        existing = model.objects.filter(
+            well_id__in={well_id for well_id, _ in values},
+            **{f'{reading.date_field}__in': {date for _, date in values}},
+        ).values_list('pk', 'well_id', reading.date_field, reading.value_field)
+        return {(well_id, date): (pk, value) for pk, well_id, date, value in existing if (well_id, date) in values}
+
+    @staticmethod
+    def _upsert(model, values: dict, existing: dict) -> None:
+        reading = rollups.READINGS[model]
+        updated = []
+        for key, (pk, _) in existing.items():
+            updated.append(model(pk=pk, **{reading.value_field: values.pop(key)}))
+        model.objects.bulk_update(updated, [reading.value_field], batch_size=500)
+        model.objects.bulk_create(
+            [
+                model(well_id=well_id, **{reading.date_field: date, reading.value_field: value})
+                for (well_id, date), value in values.items()
+            ],
+            batch_size=1000,
+            refresh_rollups=False,
+        )
+
+    @staticmethod
+    def _copy(model, values: dict) -> None:
+        reading = rollups.READINGS[model]
+        quote = connection.ops.quote_name
+        temp_table = quote(f'import_{reading.metric}')
+        table = quote(model._meta.db_table)
+        date_column = quote(model._meta.get_field(reading.date_field).column)
+        value_column = quote(model._meta.get_field(reading.value_field).column)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for (well_id, date), value in values.items():
+            writer.writerow((well_id, date.isoformat(), value))
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {temp_table} (well_id bigint, reading_date date, reading_value numeric) '
+                f'ON COMMIT DROP',
+            )
+            cursor.copy_expert(f'COPY {temp_table} FROM STDIN WITH (FORMAT csv)', buffer)
+            cursor.execute(
+                f'INSERT INTO {table} (well_id, {date_column}, {value_column}) '  # noqa: S608
+                f'SELECT well_id, reading_date, reading_value FROM {temp_table} '
+                f'ON CONFLICT (well_id, {date_column}) DO UPDATE SET {value_column} = EXCLUDED.{value_column}',
+            )
+            # Таблица удаляется сразу, а не при COMMIT: загрузка может выполняться внутри внешней транзакции.
+            cursor.execute(f'DROP TABLE {temp_table}')
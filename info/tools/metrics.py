@@ -0,0 +1,232 @@
+import asyncio
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, Optional, Tuple
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Поле хеша - JSON массив [этап, намерение, платформа, корзина]: значения меток могут содержать любые символы.
+METRICS_KEY = 'info:metrics:v2'
+METRIC_NAME = 'webhook_stage_seconds'
+# Границы корзин в секундах, включая сроки ответа Алисы (3 с) и Dialogflow (5 с).
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 3.0, 5.0, 10.0)
+# Значение метки вне известного набора: число рядов не должно зависеть от содержимого запросов.
+OTHER = 'other'
+
+_current = contextvars.ContextVar('info_request_metrics', default=None)
+_client = None
+
+
+class RequestMetrics:
+    """
+    Время этапов одного запроса. Время одноименных этапов суммируется.
+    Объект разделяют все задачи и потоки запроса, поскольку копия контекста ссылается на него же.
+    """
+    __slots__ = ('stages', 'intent', 'platform')
+
+    def __init__(self):
+        self.stages = {}
+        self.intent = ''
+        self.platform = ''
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+class Histograms:
+    """
+    Гистограммы процесса с момента последней выгрузки в Redis.
+    Выгружаются приращения, поэтому данные всех процессов складываются.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._flushed = time.monotonic()
+
+    def observe(self, labels: Tuple[str, str, str], seconds: float) -> None:
+        with self._lock:
+            data = self._data.get(labels)
+            if data is None:
+                data = self._data[labels] = [0] * (len(BUCKETS) + 1) + [0.0]
+            data[bisect.bisect_left(BUCKETS, seconds)] += 1
+            data[-1] += seconds
+
+    def is_flush_due(self) -> bool:
+        return time.monotonic() - self._flushed >= settings.METRICS_FLUSH_INTERVAL
+
+    def flush(self) -> None:
+        with self._lock:
+            data, self._data = self._data, {}
+            self._flushed = time.monotonic()
+        if not data:
+            return
+        pipe = get_client().pipeline(transaction=False)
+        for labels, values in data.items():
+            for index, count in enumerate(values[:-1]):
+                if count:
+                    pipe.hincrby(METRICS_KEY, _field(labels, str(index)), count)
+            pipe.hincrbyfloat(METRICS_KEY, _field(labels, 'sum'), values[-1])
+        try:
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning('Metrics dropped', exc_info=True)
+
+
+histograms = Histograms()
+
+
+def _field(labels: Tuple[str, str, str], index: str) -> str:
+    return json.dumps([*labels, index], ensure_ascii=False)
+
+
+def _parse_field(field: bytes) -> Optional[Tuple[Tuple[str, str, str], str]]:
+    try:
+        *labels, index = json.loads(field)
+    except ValueError:
+        return None
+    if len(labels) != 3 or not all(isinstance(value, str) for value in labels):
+        return None
+    return tuple(labels), index
+
+
+def get_client() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.METRICS_REDIS_URL)
+    return _client
+
+
+def start() -> RequestMetrics:
+    metrics = RequestMetrics()
+    _current.set(metrics)
+    return metrics
+
+
+def finish(metrics: RequestMetrics, seconds: float) -> None:
+    """
+    Переносит время этапов запроса и общее время (этап request) в гистограммы.
+    """
+    metrics.add('request', seconds)
+    for name, stage_seconds in metrics.stages.items():
+        histograms.observe((name, metrics.intent, metrics.platform), stage_seconds)
+
+
+def set_labels(intent: Optional[str] = None, platform: Optional[str] = None) -> None:
+    """
+    Метки запроса. Вызывающий код передает только значения из известного набора, остальные заменяет на OTHER.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.intent = intent or ''
+        metrics.platform = platform or ''
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Замеряет этап текущего запроса. Вне запроса ничего не делает.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - started)
+
+
+async def astage(name: str, awaitable: Awaitable):
+    """
+    Замеряет ожидание awaitable как этап текущего запроса.
+    """
+    with stage(name):
+        return await awaitable
+
+
+def _format_labels(stage_name: str, intent: str, platform: str, le: Optional[str] = None) -> str:
+    labels = {'stage': stage_name, 'intent': intent, 'platform': platform}
+    if le is not None:
+        labels['le'] = le
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items()
+    )
+    return ','.join(f'{key}="{value}"' for key, value in escaped)
+
+
+def render() -> str:
+    """
+    Гистограммы всех процессов в текстовом формате Prometheus.
+    """
+    histograms.flush()
+    series = {}
+    for field, value in get_client().hgetall(METRICS_KEY).items():
+        parsed = _parse_field(field)
+        if parsed is None:
+            logger.warning('Malformed metrics field %r skipped', field)
+            continue
+        labels, index = parsed
+        series.setdefault(labels, {})[index] = value
+    lines = [
+        f'# HELP {METRIC_NAME} Webhook request stage duration by intent and platform.',
+        f'# TYPE {METRIC_NAME} histogram',
+    ]
+    for labels, values in sorted(series.items()):
+        cumulative = 0
+        for index, bound in enumerate((*BUCKETS, '+Inf')):
+            cumulative += int(values.get(str(index), 0))
+            lines.append(f'{METRIC_NAME}_bucket{{{_format_labels(*labels, le=str(bound))}}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_sum{{{_format_labels(*labels)}}} {float(values.get("sum", 0))}')
+        lines.append(f'{METRIC_NAME}_count{{{_format_labels(*labels)}}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+aflush = sync_to_async(histograms.flush, thread_sensitive=False)
+
+
+def timed(view: Callable) -> Callable:
+    """
+    Декоратор view: замеряет время обработки запроса и переносит время этапов в гистограммы.
+    Поддерживает синхронные и асинхронные view, чтобы не переводить async view в поток.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not settings.METRICS_ENABLED:
+                return await view(request, *args, **kwargs)
+            metrics = start()
+            started = time.perf_counter()
+            response = await view(request, *args, **kwargs)
+            finish(metrics, time.perf_counter() - started)
+            if histograms.is_flush_due():
+                await aflush()
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.METRICS_ENABLED:
+            return view(request, *args, **kwargs)
+        metrics = start()
+        started = time.perf_counter()
+        response = view(request, *args, **kwargs)
+        finish(metrics, time.perf_counter() - started)
+        if histograms.is_flush_due():
+            histograms.flush()
+        return response
+
+    return wrapper
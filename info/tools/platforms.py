@@ -0,0 +1,95 @@
+import logging
+from typing import Union
+
+from info.tools.dialogflow_webhook_t import LazyWebhookRequest, WebhookRequest
+
+logger = logging.getLogger(__name__)
+
+# Платформы, которые различает get_platform_view. Пустая строка - консоль Dialogflow.
+PLATFORMS = frozenset(['alice', 'telegram', ''])
+
+
+class PlatformView:
+    """
+    Данные запроса, общие для всех платформ: платформа, пользователь, текст, сессия и намерение.
+    Поля извлекаются из запроса один раз при создании, дальше это обычные атрибуты без обхода словарей.
+    Сессия - сессия Dialogflow, она однозначно определяет диалог на любой платформе.
+    conversation_id - идентификатор диалога для хранения его состояния: сессия платформы, если она своя.
+    """
+    __slots__ = ('platform', 'uid', 'text', 'session_id', 'intent', 'conversation_id', 'new_session')
+
+    def __init__(self, msg: Union[WebhookRequest, LazyWebhookRequest], platform: str, payload: dict):
+        self.platform = platform
+        self.session_id = msg.session
+        self.intent = msg.query_result.intent.display_name
+        self.uid = ''
+        self.text = ''
+        self.conversation_id = msg.session
+        self.new_session = False
+        try:
+            self._extract(msg, payload)
+        except (AttributeError, KeyError, TypeError):
+            # Разбор данных платформы нужен аналитике и состоянию диалога, но не ответу: запрос обрабатывается без них.
+            logger.warning('%s payload not parsed', type(self).__name__, exc_info=True)
+
+    def _extract(self, msg, payload: dict) -> None:  # noqa: U100
+        """
+        Заполняет uid, text и, если у платформы свои сессии, conversation_id и new_session.
+        Необязательные в протоколе платформы поля читаются через get.
+        """
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.platform!r} {self.uid!r} {self.intent!r}>'
+
+
+class DialogflowView(PlatformView):
+    """
+    Запрос из консоли Dialogflow или интеграции без собственного разбора: пользователь неизвестен.
+    """
+    __slots__ = ()
+
+
+class AliceView(PlatformView):
+    """
+    Запрос из Яндекс.Алисы. uid совпадает с AliceRequest.uid, диалог - сессия Алисы.
+    """
+    __slots__ = ()
+
+    def _extract(self, msg, payload: dict) -> None:  # noqa: U100
+        session = payload.get('session', {})
+        application_id = session.get('application', {}).get('application_id', '')
+        self.uid = f"{application_id[0:9]}-{payload.get('meta', {}).get('client_id', '')}"
+        # У нажатия кнопки (ButtonPressed) нет command.
+        self.text = payload.get('request', {}).get('command', '')
+        if session.get('session_id'):
+            self.conversation_id = f"alice:{session['session_id']}"
+        self.new_session = bool(session.get('new'))
+
+
+class TelegramView(PlatformView):
+    """
+    Запрос из Telegram. uid совпадает с TelegramHandler.get_uid.
+    """
+    __slots__ = ()
+
+    def _extract(self, msg, payload: dict) -> None:  # noqa: U100
+        data = payload.get('data', {})
+        # from отсутствует у сообщений каналов, language_code - у части пользователей.
+        sender = data.get('from', {})
+        self.uid = f"{sender.get('id', '')}-{sender.get('language_code', '')}.telegram_client"
+        self.text = data.get('text', '')
+
+
+def get_platform_view(msg: Union[WebhookRequest, LazyWebhookRequest]) -> PlatformView:
+    """
+    Представление запроса для его платформы.
+    Запрос без источника считается запросом Алисы, если в нем есть данные Алисы, иначе - из консоли Dialogflow.
+    """
+    request = msg.original_detect_intent_request
+    source = request.source
+    payload = request.payload or {}
+    if source == 'telegram':
+        return TelegramView(msg, source, payload)
+    if not source and 'client_id' in payload.get('meta', {}):
+        return AliceView(msg, 'alice', payload)
+    return DialogflowView(msg, source or '', payload)
@@ -0,0 +1,154 @@
+import collections
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from django.db import connections
+
+QueryRecord = collections.namedtuple('QueryRecord', ['sql', 'params', 'seconds', 'plan'])
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Запросы к базе вышли за установленный бюджет.
+    """
+
+
+class QueryProfiler:
+    """
+    Записывает запросы к базе внутри блока with: текст, параметры и время выполнения.
+    Запросы перехватываются через connection.execute_wrapper, поэтому учитываются
+    только запросы текущего потока к соединению using.
+
+    При explain=True после выхода из блока для каждого SELECT выполняется EXPLAIN,
+    и план сохраняется в QueryRecord.plan. EXPLAIN выполняется отдельным запросом,
+    поэтому включать его стоит только при отладке.
+    """
+
+    def __init__(self, using: str = 'default', explain: bool = False):
+        self.connection = connections[using]
+        self.explain = explain
+        self.queries = []
+        self._wrapper = None
+
+    def __enter__(self) -> 'QueryProfiler':
+        self._wrapper = self.connection.execute_wrapper(self._record)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+        if self.explain and exc_info[0] is None:
+            self.queries = [self._with_plan(query) for query in self.queries]
+
+    def _record(self, execute, sql, params, many, context):  # noqa: U100
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(QueryRecord(sql, params, time.perf_counter() - started, None))
+
+    def _with_plan(self, query: QueryRecord) -> QueryRecord:
+        if not query.sql.lstrip().upper().startswith('SELECT'):
+            return query
+        prefix = 'EXPLAIN QUERY PLAN' if self.connection.vendor == 'sqlite' else 'EXPLAIN'
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {query.sql}', query.params)
+            plan = '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+        return query._replace(plan=plan)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def seconds(self) -> float:
+        return sum(query.seconds for query in self.queries)
+
+    def duplicates(self) -> List[str]:
+        """
+        Запросы с одинаковым текстом, выполненные несколько раз: признак N+1.
+        """
+        counter = collections.Counter(query.sql for query in self.queries)
+        return [sql for sql, count in counter.items() if count > 1]
+
+    def sequential_scans(self) -> List[QueryRecord]:
+        """
+        Запросы с полным перебором таблицы в плане. Требует explain=True.
+        """
+        return [
+            query for query in self.queries
+            if query.plan and ('Seq Scan' in query.plan or _is_sqlite_scan(query.plan))
+        ]
+
+    def summary(self) -> str:
+        return (
+            f'{self.count} queries, {self.seconds * 1000:.1f} ms, '
+            f'{len(self.duplicates())} duplicated, {len(self.sequential_scans())} sequential scans'
+        )
+
+    def report(self) -> str:
+        """
+        Подробный отчет: каждый запрос с временем и планом.
+        """
+        lines = [self.summary()]
+        for number, query in enumerate(self.queries, start=1):
+            lines.append(f'{number}. {query.seconds * 1000:.2f} ms: {query.sql}')
+            if query.plan:
+                lines.extend(f'    {line}' for line in query.plan.splitlines())
+        return '\n'.join(lines)
+
+
+def _is_sqlite_scan(plan: str) -> bool:
+    # В SQLite 3.36+ полный перебор - "SCAN table", в более ранних - "SCAN TABLE table" без "USING INDEX".
+    return any(
+        line.split(' ', 3)[3].startswith('SCAN') and 'USING' not in line
+        for line in plan.splitlines()
+        if line.count(' ') >= 3
+    )
+
+
+@contextmanager
+def query_budget(
+    max_queries: int,
+    max_seconds: Optional[float] = None,
+    allow_sequential_scans: bool = True,
+    using: str = 'default',
+) -> Iterator[QueryProfiler]:
+    """
+    Проверяет, что запросы внутри блока укладываются в бюджет.
+    Предназначен для проверок и отладки, в том числе вне тестового окружения.
+    :raises QueryBudgetExceeded: С подробным отчетом о запросах.
+    """
+    with QueryProfiler(using=using, explain=not allow_sequential_scans) as profiler:
+        yield profiler
+    problems = []
+    if profiler.count > max_queries:
+        problems.append(f'{profiler.count} queries, budget {max_queries}')
+    if max_seconds is not None and profiler.seconds > max_seconds:
+        problems.append(f'{profiler.seconds:.3f} s, budget {max_seconds} s')
+    if not allow_sequential_scans and profiler.sequential_scans():
+        problems.append(f'{len(profiler.sequential_scans())} sequential scans')
+    if problems:
+        raise QueryBudgetExceeded(f"{'; '.join(problems)}\n{profiler.report()}")
+
+
+def assert_intent_budget(
+    handler,
+    params: dict,
+    max_queries: Optional[int] = None,
+    allow_sequential_scans: bool = False,
+) -> QueryProfiler:
+    """
+    Выполняет запросы обработчика намерения и проверяет бюджет.
+    :param handler: Обработчик, подкласс services.BaseIntentHandler.
+    :param params: Параметры сообщения Dialogflow, как в queryResult.parameters.
+    :param max_queries: Бюджет, по умолчанию - handler._query_budget.
+    :raises QueryBudgetExceeded: Если бюджет превышен.
+    """
+    budget = handler._query_budget if max_queries is None else max_queries
+    if budget is None:
+        raise ValueError(f'No query budget for intent {handler._intent_name!r}')
+    with query_budget(budget, allow_sequential_scans=allow_sequential_scans) as profiler:
+        handler._get_query_to_db(handler._get_params(params))
+    return profiler
@@ -0,0 +1,134 @@
+import collections
+import hashlib
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from cachetools import LRUCache
+from django.conf import settings
+from django.core.cache import cache
+
+from info.models import OilField, Well
+from info.tools.cache import get_structure_version
+
+REFERENCE_KEY = 'info:reference:{0}:{1}:{2}'
+
+WellRef = collections.namedtuple('WellRef', ['id', 'ident_number', 'oilfield_id', 'well_type', 'well_status'])
+
+_MISSING = object()
+
+
+class ReferenceCache:
+    """
+    Справочные данные месторождений и скважин в двух уровнях кэша:
+    LRU в памяти процесса и общий кэш Django (Redis), оба с версией справочников в ключе.
+
+    Версия справочников сдвигается при любом изменении месторождений и скважин, см. info.signals.
+    Процесс сверяет версию не чаще раза в REFERENCE_VERSION_CHECK_INTERVAL секунд,
+    поэтому изменения, сделанные другими процессами, видны с такой задержкой.
+    Значения - неизменяемые кортежи, их можно разделять между потоками.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self._local = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked = 0.0
+
+    def _get_version(self) -> str:
+        now = time.monotonic()
+        if self._version is None or now - self._checked >= settings.REFERENCE_VERSION_CHECK_INTERVAL:
+            version = get_structure_version()
+            with self._lock:
+                if version != self._version:
+                    self._local.clear()
+                    self._version = version
+                self._checked = now
+        return self._version
+
+    def expire(self) -> None:
+        """
+        Требует сверить версию при следующем обращении. Вызывается при сдвиге версии в этом процессе.
+        """
+        self._checked = 0.0
+
+    def prime(self) -> None:
+        """
+        Загружает в память процесса идентификаторы всех месторождений и их скважин двумя запросами.
+        Вызывается при запуске процесса, чтобы первые запросы не обращались ни к общему кэшу, ни к базе.
+        Скважины по идентификационному номеру не загружаются: их может быть больше, чем помещается в LRU.
+        """
+        version = self._get_version()
+        oilfields = collections.defaultdict(list)
+        for pk, name in OilField.objects.order_by('pk').values_list('pk', 'name'):
+            oilfields[name].append(pk)
+        well_ids = collections.defaultdict(list)
+        for pk, oilfield_id in Well.objects.order_by('pk').values_list('pk', 'oilfield_id'):
+            well_ids[oilfield_id].append(pk)
+        with self._lock:
+            for name, ids in oilfields.items():
+                self._local[(version, 'oilfield', name)] = ids[0] if len(ids) == 1 else None
+                for pk in ids:
+                    self._local[(version, 'well-ids', pk)] = tuple(well_ids.get(pk, ()))
+
+    def _get(self, kind: str, arg, load: Callable):
+        version = self._get_version()
+        local_key = (version, kind, arg)
+        with self._lock:
+            value = self._local.get(local_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        digest = hashlib.blake2b(str(arg).encode(), digest_size=16).hexdigest()
+        key = REFERENCE_KEY.format(version, kind, digest)
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = load(arg)
+            cache.set(key, value, settings.REFERENCE_CACHE_TIMEOUT)
+        with self._lock:
+            self._local[local_key] = value
+        return value
+
+    def oilfield_id(self, name: str) -> Optional[int]:
+        """
+        Идентификатор месторождения по наименованию. None, если месторождение не найдено или их несколько.
+        """
+        return self._get('oilfield', name, _load_oilfield_id)
+
+    def wells(self, ident_number: str) -> Tuple[WellRef, ...]:
+        """
+        Скважины с идентификационным номером. Номер уникален только в пределах месторождения.
+        """
+        return self._get('wells', ident_number, _load_wells)
+
+    def well(self, ident_number: str, oilfield_id: Optional[int] = None) -> Optional[WellRef]:
+        """
+        Скважина по идентификационному номеру, при необходимости в пределах месторождения.
+        None, если скважина не найдена или неоднозначна.
+        """
+        wells = [well for well in self.wells(ident_number) if oilfield_id is None or well.oilfield_id == oilfield_id]
+        return wells[0] if len(wells) == 1 else None
+
+    def well_ids(self, oilfield_id: int) -> Tuple[int, ...]:
+        """
+        Идентификаторы скважин месторождения.
+        """
+        return self._get('well-ids', oilfield_id, _load_well_ids)
+
+
+def _load_oilfield_id(name: str) -> Optional[int]:
+    ids = list(OilField.objects.filter(name=name).values_list('pk', flat=True)[:2])
+    return ids[0] if len(ids) == 1 else None
+
+
+def _load_wells(ident_number: str) -> Tuple[WellRef, ...]:
+    return tuple(
+        WellRef(*values)
+        for values in Well.objects.filter(ident_number=ident_number).order_by('pk').values_list(*WellRef._fields)
+    )
+
+
+def _load_well_ids(oilfield_id: int) -> Tuple[int, ...]:
+    return tuple(Well.objects.filter(oilfield_id=oilfield_id).order_by('pk').values_list('pk', flat=True))
+
+
+reference_cache = ReferenceCache(settings.REFERENCE_CACHE_SIZE)
@@ -0,0 +1,220 @@
+import datetime
+from collections import namedtuple
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from info.models import GasDisposal, Mining, ProductionRollup, Urgg, Well, month_end, month_start
+
+Reading = namedtuple('Reading', ['metric', 'date_field', 'value_field'])
+
+READINGS = {
+    Mining: Reading(ProductionRollup.Metric.MINING, 'mining_date', 'mining_count'),
+    Urgg: Reading(ProductionRollup.Metric.URGG, 'urgg_date', 'urgg_count'),
+    GasDisposal: Reading(ProductionRollup.Metric.GAS_DISPOSAL, 'gas_disposal_date', 'gas_disposal_count'),
+}
+
+METRIC_MODELS = {reading.metric: model for model, reading in READINGS.items()}
+
+
+def get_reading_values(instance) -> tuple:
+    """
+    Возвращает (well_id, дата, значение) показателя.
+    """
+    reading = READINGS[type(instance)]
+    return instance.well_id, getattr(instance, reading.date_field), getattr(instance, reading.value_field)
+
+
+def get_saved_values(model, pk) -> Optional[tuple]:
+    """
+    Значения показателя, сохраненные в базе, до изменения экземпляра.
+    """
+    if pk is None:
+        return None
+    reading = READINGS[model]
+    return model.objects.filter(pk=pk).values_list('well_id', reading.date_field, reading.value_field).first()
+
+
+def _buckets(well_id: int, oilfield_id: int, date: datetime.date):
+    day = ProductionRollup.Period.DAY
+    month = ProductionRollup.Period.MONTH
+    for well in (well_id, None):
+        yield {'oilfield_id': oilfield_id, 'well_id': well, 'period': day, 'period_start': date}
+        yield {'oilfield_id': oilfield_id, 'well_id': well, 'period': month, 'period_start': month_start(date)}
+
+
+def _add(metric: str, bucket: dict, total: Decimal, readings: int, create: bool) -> None:
+    queryset = ProductionRollup.objects.filter(metric=metric, **bucket)
+    changes = {'total': F('total') + total, 'readings': F('readings') + readings}
+    if queryset.update(**changes):
+        if readings < 0:
+            # Агрегат без показателей удаляется: rebuild таких строк не создает.
+            queryset.filter(readings__lte=0).delete()
+        return
+    if not create:
+        return
+    try:
+        with transaction.atomic():
+            ProductionRollup.objects.create(metric=metric, total=total, readings=readings, **bucket)
+    except IntegrityError:
+        queryset.update(**changes)
+
+
+def apply_reading(model, well_id: int, oilfield_id: int, date: datetime.date, value: Decimal, sign: int = 1) -> None:
+    """
+    Добавляет показатель в агрегаты (sign=1) или вычитает из них (sign=-1).
+    При вычитании строки не создаются: их отсутствие означает, что агрегаты
+    уже удалены каскадно вместе со скважиной или месторождением.
+    """
+    metric = READINGS[model].metric
+    for bucket in _buckets(well_id, oilfield_id, date):
+        _add(metric, bucket, Decimal(value) * sign, sign, create=sign > 0)
+
+
+def apply_changes(model, changes: Iterable[tuple]) -> None:
+    """
+    Добавляет в агрегаты изменения показателей (well_id, oilfield_id, дата, изменение суммы,
+    изменение количества показаний) постоянным числом запросов, независимо от числа строк.
+    Строки агрегатов блокируются, поэтому изменения не теряются при параллельной записи,
+    а новые строки, созданные параллельно, приводят к IntegrityError.
+    Строки агрегатов не удаляются: функция рассчитана на добавление и замену показаний.
+    """
+    deltas = {}
+    for well_id, oilfield_id, date, total, readings in changes:
+        for bucket in _buckets(well_id, oilfield_id, date):
+            key = (bucket['oilfield_id'], bucket['well_id'], bucket['period'], bucket['period_start'])
+            current = deltas.get(key, (Decimal(0), 0))
+            deltas[key] = (current[0] + total, current[1] + readings)
+    if not deltas:
+        return
+    metric = READINGS[model].metric
+    with transaction.atomic():
+        existing = ProductionRollup.objects.select_for_update().filter(
+            metric=metric,
+            oilfield_id__in={oilfield_id for oilfield_id, _, _, _ in deltas},
+            period_start__in={period_start for _, _, _, period_start in deltas},
+        )
+        updated = []
+        for rollup in existing:
+            key = (rollup.oilfield_id, rollup.well_id, rollup.period, rollup.period_start)
+            if key in deltas:
+                total, readings = deltas.pop(key)
+                rollup.total += total
+                rollup.readings += readings
+                updated.append(rollup)
+        ProductionRollup.objects.bulk_update(updated, ['total', 'readings'], batch_size=1000)
+        ProductionRollup.objects.bulk_create(
+            [
+                ProductionRollup(
+                    metric=metric,
+                    oilfield_id=oilfield_id,
+                    well_id=well_id,
+                    period=period,
+                    period_start=period_start,
+                    total=total,
+                    readings=readings,
+                )
+                for (oilfield_id, well_id, period, period_start), (total, readings) in deltas.items()
+            ],
+            batch_size=1000,
+        )
+
+
+def refresh_for_readings(model, objs: Iterable) -> set:
+    """
+    Пересчитывает агрегаты месторождений и дат, затронутых массовой вставкой.
+    Возвращает идентификаторы месторождений.
+    """
+    reading = READINGS[model]
+    well_ids = set()
+    dates = []
+    for obj in objs:
+        well_ids.add(obj.well_id)
+        dates.append(getattr(obj, reading.date_field))
+    if not dates:
+        return set()
+    oilfield_ids = set(Well.objects.filter(pk__in=well_ids).values_list('oilfield_id', flat=True))
+    rebuild([reading.metric], oilfield_ids, min(dates), max(dates))
+    return oilfield_ids
+
+
+def rebuild(
+    metrics: Optional[Iterable[str]] = None,
+    oilfield_ids: Optional[Iterable[int]] = None,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+) -> int:
+    """
+    Полностью пересчитывает агрегаты по исходным показателям.
+    Границы периода расширяются до целых месяцев. Возвращает количество созданных строк.
+    """
+    metrics = list(metrics or METRIC_MODELS)
+    if oilfield_ids is not None:
+        oilfield_ids = list(oilfield_ids)
+    if start_date:
+        start_date = month_start(start_date)
+    if end_date:
+        end_date = month_end(end_date)
+    created = 0
+    with transaction.atomic():
+        for metric in metrics:
+            rollups = ProductionRollup.objects.filter(metric=metric)
+            if oilfield_ids is not None:
+                rollups = rollups.filter(oilfield_id__in=oilfield_ids)
+            if start_date:
+                rollups = rollups.filter(period_start__gte=start_date)
+            if end_date:
+                rollups = rollups.filter(period_start__lte=end_date)
+            rollups.delete()
+            created += _rebuild_metric(metric, oilfield_ids, start_date, end_date)
+    return created
+
+
+def _rebuild_metric(metric, oilfield_ids, start_date, end_date) -> int:
+    """
+    Агрегаты создаются запросами INSERT ... SELECT, без передачи строк в Python.
+    """
+    model = METRIC_MODELS[metric]
+    reading = READINGS[model]
+    readings = model.objects.all()
+    if oilfield_ids is not None:
+        readings = readings.filter(well__oilfield_id__in=oilfield_ids)
+    if start_date:
+        readings = readings.filter(**{f'{reading.date_field}__gte': start_date})
+    if end_date:
+        readings = readings.filter(**{f'{reading.date_field}__lte': end_date})
+    readings = readings.annotate(oilfield_id=F('well__oilfield_id'))
+    groupings = (
+        (ProductionRollup.Period.DAY, F(reading.date_field), True),
+        (ProductionRollup.Period.MONTH, TruncMonth(reading.date_field), True),
+        (ProductionRollup.Period.DAY, F(reading.date_field), False),
+        (ProductionRollup.Period.MONTH, TruncMonth(reading.date_field), False),
+    )
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(ProductionRollup._meta.get_field(name).column)
+        for name in ('metric', 'period', 'period_start', 'oilfield', 'well', 'total', 'readings')
+    )
+    created = 0
+    for period, period_start, per_well in groupings:
+        fields = ['oilfield_id', 'rollup_start'] + (['rollup_well'] if per_well else [])
+        rows = readings.annotate(
+            rollup_start=period_start,
+            **({'rollup_well': F('well_id')} if per_well else {}),
+        ).values(*fields).annotate(
+            rollup_total=Sum(reading.value_field),
+            rollup_readings=Count('pk'),
+        ).order_by()
+        sql, params = rows.query.sql_with_params()
+        well = 'rollup_well' if per_well else 'NULL'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(ProductionRollup._meta.db_table)} ({columns}) '  # noqa: S608
+                f'SELECT %s, %s, rollup_start, oilfield_id, {well}, rollup_total, rollup_readings FROM ({sql}) rollup_rows',
+                [metric, period, *params],
+            )
+            created += cursor.rowcount
+    return created
@@ -0,0 +1,51 @@
+import datetime
+import decimal
+import json
+from typing import Any
+
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+BACKEND = 'orjson' if orjson else 'json'
+
+
+def default(obj: Any) -> Any:
+    """
+    Типы, которые кодировщик не сериализует сам: Decimal - строкой, как DjangoJSONEncoder,
+    даты - в ISO 8601, прочие объекты (например, сообщения Chatbase) - словарем атрибутов.
+    """
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if hasattr(obj, '__dict__'):
+        return obj.__dict__
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Компактный JSON в UTF-8 без экранирования не-ASCII символов.
+    Используется orjson, если он установлен, иначе стандартный json.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=default)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default).encode()
+
+
+def dumps_str(obj: Any) -> str:
+    return dumps(obj).decode()
+
+
+class FastJsonResponse(HttpResponse):
+    """
+    Аналог JsonResponse, сериализующий данные через dumps.
+    """
+
+    def __init__(self, data: Any, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -1,8 +1,26 @@
+import inspect
+import logging
 from abc import ABC, abstractmethod
-from typing import Any
-from django.http import HttpRequest
+from typing import Any, Optional, Union
 
-from info.tools.dialogflow_webhook_t import WebhookRequest
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import autodiscover_modules
+
+from info.tools import metrics
+from info.tools.async_utils import database_sync_to_async
+from info.tools.cache import get_answer_key
+from info.tools.context import ConversationContext, reset_conversation, set_conversation
+from info.tools.dialogflow_webhook import WebhookResponse
+from info.tools.dialogflow_webhook_t import LazyWebhookRequest, WebhookRequest
+from info.tools.platforms import PlatformView, get_platform_view
+from info.tools.profiler import QueryProfiler
+
+logger = logging.getLogger(__name__)
+
+# Сущности, которые уточняющий вопрос ("а за прошлый месяц?", "а по скважине 123?") обычно не повторяет.
+CONTEXT_PARAMS = ('oilfield', 'well', 'date', 'date-period')
 
 
 class Parameter(ABC):
@@ -55,6 +73,96 @@ class BaseIntentHandler(ABC):
         this_name = self._intent_name
         return this_name == name
 
+    def handle(self, msg: WebhookRequest, view: Optional[PlatformView] = None) -> str:
+        """
+        Обрабатывает сообщение и возвращает текст ответа.
+        Параметры, не указанные в реплике, берутся из состояния диалога (см. _context_params),
+        само состояние доступно методам обработчика через context.get_conversation().
+        :param view: Представление запроса, если оно уже построено (webhook строит его один раз на запрос).
+        """
+        with metrics.stage('context'):
+            conversation = ConversationContext.load(view or get_platform_view(msg))
+        token = set_conversation(conversation)
+        try:
+            params = self._get_params(conversation.fill(msg.query_result.parameters or {}, self._context_params))
+            answer = self._get_answer(params)
+        finally:
+            reset_conversation(token)
+        with metrics.stage('context'):
+            conversation.save()
+        return answer
+
+    async def ahandle(self, msg: WebhookRequest, view: Optional[PlatformView] = None) -> str:
+        """
+        Асинхронный вариант handle. Обработка, включая запросы к базе и кэшу, выполняется в пуле потоков.
+        """
+        return await database_sync_to_async(self.handle)(msg, view)
+
+    @property
+    def _context_params(self) -> tuple:
+        """
+        Параметры Dialogflow, которые переносятся из предыдущих реплик диалога, если в реплике их нет.
+        """
+        return CONTEXT_PARAMS
+
+    def _get_answer(self, params: dict) -> str:
+        """
+        Возвращает ответ из кэша, либо выполняет запрос к базе и кэширует ответ.
+        Кэш устаревает при изменении данных месторождения, см. info.signals.
+        """
+        if not self._cacheable:
+            return self._answer_from_db(params)
+        key = get_answer_key(self._intent_name, params, self._get_cache_scope(params))
+        with metrics.stage('cache'):
+            answer = cache.get(key)
+        if answer is None:
+            answer = self._answer_from_db(params)
+            cache.set(key, answer, settings.ANSWER_CACHE_TIMEOUT)
+        return answer
+
+    def _answer_from_db(self, params: dict) -> str:
+        with metrics.stage('db'):
+            data = self._get_data(params)
+        with metrics.stage('response'):
+            return self._create_response(data)
+
+    def _get_data(self, params: dict) -> Any:
+        """
+        Выполняет запросы к базе. При QUERY_PROFILING записывает количество, время и планы запросов.
+        Превышение _query_budget, повторяющиеся запросы и полный перебор таблиц логируются как предупреждение.
+        """
+        if not settings.QUERY_PROFILING:
+            return self._get_query_to_db(params)
+        with QueryProfiler(explain=settings.QUERY_PROFILING_EXPLAIN) as profiler:
+            data = self._get_query_to_db(params)
+        budget = self._query_budget
+        if (budget is not None and profiler.count > budget) or profiler.duplicates() or profiler.sequential_scans():
+            logger.warning('Intent %s, budget %s: %s', self._intent_name, budget, profiler.report())
+        else:
+            logger.info('Intent %s: %s', self._intent_name, profiler.summary())
+        return data
+
+    @property
+    def _cacheable(self) -> bool:
+        """
+        Можно ли кэшировать ответы. Ответ должен зависеть только от параметров, текущей даты и данных в базе.
+        """
+        return True
+
+    @property
+    def _query_budget(self) -> Optional[int]:
+        """
+        Допустимое количество запросов к базе на один вызов _get_query_to_db. None - без ограничения.
+        """
+        return None
+
+    def _get_cache_scope(self, params: dict) -> Optional[int]: # noqa
+        """
+        Идентификатор месторождения, к данным которого относится ответ.
+        None - ответ зависит от данных всех месторождений, инцидентов и задач.
+        """
+        return None
+
     @property
     @abstractmethod
     def _intent_name(self) -> str:
@@ -64,6 +172,13 @@ class BaseIntentHandler(ABC):
         :rtype: str
         """
 
+    @property
+    def _action_name(self) -> Optional[str]:
+        """
+        Название действия (action) намерения. Используется, если намерение не найдено по названию.
+        """
+        return None
+
     @abstractmethod
     def _get_params(self, params: dict) -> dict: # noqa
         """
@@ -71,26 +186,141 @@ class BaseIntentHandler(ABC):
         """
 
     @abstractmethod
-    def _get_query_to_db(self) -> str:
+    def _get_query_to_db(self, params: dict) -> Any: # noqa
         """
         Метод должен реализовать выполнение запросов к базе.
+        Вызывается синхронно, в том числе из пула потоков асинхронного обработчика.
         """
 
     @abstractmethod
-    def _create_response(self) -> str:
+    def _create_response(self, data: Any) -> str: # noqa
         """
         Метод должен реализовать сборку ответа.
         """
 
 
-def detect_client(msg: dict) -> str:
-    detect_intent = msg['original_detect_intent_request']
-    if 'source' in detect_intent:
-        return detect_intent['source']
+def parse_request(body: Union[str, bytes]) -> Union[WebhookRequest, LazyWebhookRequest]:
+    """
+    Единственная точка разбора входящего запроса.
+    Тело декодируется и валидируется один раз, дальше по цепочке передается готовая модель.
+    При WEBHOOK_LAZY_VALIDATION сразу валидируются только поля, используемые обработчиками,
+    остальные - при первом обращении, см. LazyWebhookRequest.
+    :param body: Тело запроса от Dialogflow.
+    :raises pydantic.ValidationError: Если запрос не соответствует схеме.
+    """
+    if settings.WEBHOOK_LAZY_VALIDATION:
+        return LazyWebhookRequest.parse_raw(body)
+    return WebhookRequest.parse_raw(body)
+
+
+class IntentRegistry:
+    """
+    Реестр обработчиков намерений.
+    Обработчики создаются один раз при запуске и индексируются по названию намерения и действию.
+    """
+
+    def __init__(self):
+        self._by_intent = {}
+        self._by_action = {}
+
+    def register(self, handler: BaseIntentHandler) -> None:
+        """
+        Регистрирует обработчик.
+        :raises ImproperlyConfigured: Если намерение или действие уже обрабатывает другой обработчик.
+        """
+        intent = handler._intent_name
+        action = handler._action_name
+        if intent in self._by_intent:
+            raise ImproperlyConfigured(
+                f'Intent {intent!r} is handled by both {type(self._by_intent[intent]).__name__} '
+                f'and {type(handler).__name__}',
+            )
+        if action and action in self._by_action:
+            raise ImproperlyConfigured(
+                f'Action {action!r} is handled by both {type(self._by_action[action]).__name__} '
+                f'and {type(handler).__name__}',
+            )
+        self._by_intent[intent] = handler
+        if action:
+            self._by_action[action] = handler
+
+    def autodiscover(self) -> None:
+        """
+        Импортирует модули intents установленных приложений и регистрирует все конкретные подклассы BaseIntentHandler.
+        """
+        autodiscover_modules('intents')
+        self._by_intent.clear()
+        self._by_action.clear()
+        classes = BaseIntentHandler.__subclasses__()
+        seen = set()
+        while classes:
+            handler_class = classes.pop()
+            if handler_class in seen:
+                # При множественном наследовании класс встречается среди подклассов нескольких родителей.
+                continue
+            seen.add(handler_class)
+            classes.extend(handler_class.__subclasses__())
+            if not inspect.isabstract(handler_class):
+                self.register(handler_class())
+
+    def __contains__(self, intent_name: str) -> bool:
+        return intent_name in self._by_intent
+
+    def get(self, intent_name: str, action: Optional[str] = None) -> Optional[BaseIntentHandler]:
+        handler = self._by_intent.get(intent_name)
+        if handler is None and action:
+            handler = self._by_action.get(action)
+        return handler
+
+
+intent_registry = IntentRegistry()
+
+
+def detect_client(msg: WebhookRequest) -> str:
+    source = msg.original_detect_intent_request.source
+    if source:
+        return source
     return 'alice'
 
 
-def messages_handler(request: HttpRequest) -> dict:
-    msg = WebhookRequest.parse_raw(request.body).dict(skip_defaults=True)
-    detect_client(msg)
-    return {}
+def get_analytics_data(msg: WebhookRequest, view: Optional[PlatformView] = None) -> dict:
+    """
+    Извлекает из запроса данные для аналитики.
+    Результат сериализуем в JSON и помещается в буфер аналитики вместо исходного запроса.
+    """
+    view = view or get_platform_view(msg)
+    query_result = msg.query_result
+    return {
+        'platform': view.platform,
+        'user_id': view.uid,
+        'user_msg': view.text,
+        'agent_msg': query_result.fulfillment_text,
+        'intent': view.intent,
+        'session_id': view.session_id,
+        'not_handled': query_result.action == 'input.unknown',
+    }
+
+
+def get_handler(msg: WebhookRequest) -> Optional[BaseIntentHandler]:
+    query_result = msg.query_result
+    return intent_registry.get(query_result.intent.display_name, query_result.action)
+
+
+def create_response(text: str) -> dict:
+    response = WebhookResponse()
+    response.simple_response(text)
+    return response.create_final_response()
+
+
+def messages_handler(msg: WebhookRequest, view: Optional[PlatformView] = None) -> dict:
+    handler = get_handler(msg)
+    if handler is None:
+        return {}
+    return create_response(handler.handle(msg, view))
+
+
+async def amessages_handler(msg: WebhookRequest, view: Optional[PlatformView] = None) -> dict:
+    handler = get_handler(msg)
+    if handler is None:
+        return {}
+    return create_response(await handler.ahandle(msg, view))
@@ -1,4 +1,5 @@
 class TelegramHandler(object):
+    __slots__ = ('data',)
 
     def __init__(self, payload):
         self.data = payload['data']
@@ -0,0 +1,72 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.urls import get_resolver
+
+from info.tools.db import get_executor, release_connections
+from info.tools.reference import reference_cache
+
+logger = logging.getLogger(__name__)
+
+BARRIER_TIMEOUT = 10
+
+
+def preload() -> None:
+    """
+    Загружает в родительском процессе то, что иначе загружает первый запрос каждого процесса:
+    URLconf с представлениями, обработчиками намерений и моделями запросов.
+    Дочерние процессы после fork получают уже импортированные модули.
+    """
+    get_resolver().url_patterns
+
+
+def warm_current_thread(prime: bool = True) -> None:
+    """
+    Открывает соединение с базой текущего потока и, если prime, загружает справочники в кэш процесса.
+    """
+    if prime:
+        reference_cache.prime()
+    connection.ensure_connection()
+    release_connections()
+
+
+def warm_pool(threads: int) -> None:
+    """
+    Открывает соединения с базой в threads потоках пула database_sync_to_async.
+    Потоки ждут друг друга, поэтому каждое задание выполняется в своем потоке и открывает свое соединение.
+    """
+    threads = min(threads, settings.DATABASE_POOL_SIZE)
+    barrier = threading.Barrier(threads)
+
+    def warm(prime: bool) -> None:
+        try:
+            warm_current_thread(prime)
+        finally:
+            try:
+                barrier.wait(BARRIER_TIMEOUT)
+            except threading.BrokenBarrierError:
+                pass
+
+    executor = get_executor()
+    futures = [executor.submit(warm, number == 0) for number in range(threads)]
+    for future in futures:
+        future.result()
+
+
+def warmup(threads: int = 0) -> None:
+    """
+    Подготавливает новый процесс к первому запросу: справочники месторождений и скважин и соединения с базой.
+    Вызывается после fork: в gunicorn.conf.py для процессов web и по сигналу worker_process_init для Celery.
+    Ошибки только записываются в журнал: без разогрева процесс работает, первый запрос будет медленнее.
+    :param threads: Число потоков пула database_sync_to_async, в которых открыть соединения.
+        0 - соединение открывается в текущем потоке, в нем выполняются задачи Celery.
+    """
+    try:
+        if threads:
+            warm_pool(threads)
+        else:
+            warm_current_thread()
+    except Exception:
+        logger.warning('Warmup failed', exc_info=True)
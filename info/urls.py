@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import webhook, index_view
+from .views import webhook, index_view, export_view, metrics_view
 
 
 app_name = 'info'
@@ -8,4 +8,6 @@ app_name = 'info'
 urlpatterns = [
     path('', index_view, name='index_view'),
     path('info/webhook', webhook, name='webhook'),
+    path('info/export', export_view, name='export'),
+    path('metrics', metrics_view, name='metrics'),
 ]
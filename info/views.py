@@ -1,13 +1,28 @@
-import json
+import asyncio
+import logging
 
-from django.views.decorators.csrf import csrf_exempt
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import redirect
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+    StreamingHttpResponse,
+)
+from django.utils.crypto import constant_time_compare
 from datetime import datetime
+from pydantic import ValidationError
 
-from .tasks import chatbase_send
-from .tools.services import messages_handler
+from .models import ProductionRollup
+from .tools import analytics, capture, exporter, metrics
+from .tools.platforms import PLATFORMS, get_platform_view
+from .tools.serializers import FastJsonResponse
+from .tools.services import amessages_handler, parse_request, get_analytics_data, intent_registry
+
+logger = logging.getLogger(__name__)
 
 
 def convert_str_date(value):
@@ -22,11 +37,85 @@ def index_view(request): # noqa
     return redirect('https://console.dialogflow.com/api-client/demo/embedded/e150236a-3743-4bc5-9987-e85cbc58d00e')
 
 
-@csrf_exempt
-@require_http_methods('POST')
-def webhook(request):
-    data = json.loads(request.body)
-    chatbase_send.delay(data)
-    response = messages_handler(request)
-    print(request)
-    return JsonResponse(response, safe=False)
+@metrics.timed
+async def webhook(request):
+    # Декораторы csrf_exempt и require_http_methods в Django 3.2 не поддерживают async view.
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    capture.record(request.body)
+    try:
+        with metrics.stage('parse'):
+            msg = parse_request(request.body)
+    except ValidationError:
+        return HttpResponseBadRequest()
+    with metrics.stage('platform'):
+        # Одно представление запроса на аналитику и состояние диалога.
+        view = get_platform_view(msg)
+        try:
+            data = get_analytics_data(msg, view)
+        except Exception:
+            # Без данных аналитики теряется только запись аналитики, ответ отправляется.
+            logger.exception('Analytics data not extracted')
+            data = None
+    if data is None:
+        metrics.set_labels(intent=metrics.OTHER, platform=metrics.OTHER)
+        response = await metrics.astage('handler', amessages_handler(msg, view))
+    else:
+        metrics.set_labels(
+            intent=data['intent'] if data['intent'] in intent_registry else metrics.OTHER,
+            platform=data['platform'] if data['platform'] in PLATFORMS else metrics.OTHER,
+        )
+        _, response = await asyncio.gather(
+            metrics.astage('analytics_push', analytics.apush(data)),
+            metrics.astage('handler', amessages_handler(msg, view)),
+        )
+    with metrics.stage('serialize'):
+        return FastJsonResponse(response)
+
+
+webhook.csrf_exempt = True
+
+
+@require_http_methods(['GET'])
+def metrics_view(request):
+    """
+    Гистограммы времени этапов webhook в текстовом формате Prometheus.
+    Если задан METRICS_TOKEN, требуется заголовок Authorization: Bearer <токен>.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+@require_http_methods(['GET'])
+def export_view(request):
+    """
+    Потоковая выгрузка показателей скважин в CSV или NDJSON.
+    Параметры: format (csv, ndjson), metric, oilfield (идентификатор), well (идентификационный номер),
+    start, end (YYYY-MM-DD). metric, oilfield и well можно указывать несколько раз.
+    """
+    file_format = request.GET.get('format', 'csv')
+    metric_names = request.GET.getlist('metric')
+    if file_format not in exporter.ENCODERS or not set(metric_names) <= set(ProductionRollup.Metric.values):
+        return HttpResponseBadRequest()
+    try:
+        oilfield_ids = [int(value) for value in request.GET.getlist('oilfield')]
+        start_date = request.GET.get('start') and datetime.fromisoformat(request.GET['start']).date()
+        end_date = request.GET.get('end') and datetime.fromisoformat(request.GET['end']).date()
+    except ValueError:
+        return HttpResponseBadRequest()
+    rows = exporter.iter_readings(
+        metrics=metric_names,
+        oilfield_ids=oilfield_ids,
+        wells=request.GET.getlist('well'),
+        start_date=start_date,
+        end_date=end_date,
+    )
+    response = StreamingHttpResponse(
+        exporter.PrefetchIterator(exporter.ENCODERS[file_format](rows)),
+        content_type=exporter.CONTENT_TYPES[file_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="readings.{file_format}"'
+    return response